@@ -12,7 +12,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'a
 
 # Указание на app для импорта базы
 from app.database import Base
-from app.models import Question, User, UserProgress, AnswerHistory
+from app.models import (
+    Question, User, UserProgress, AnswerHistory, CatalogVersion, QuestionTombstone, UserDueHistogram,
+    QuestionStats, QuestionStatsWatermark, UserExamCounters,
+)
 
 # Получаем DATABASE_URL и преобразуем async → sync
 DATABASE_URL = os.getenv("DATABASE_URL").replace("postgresql+asyncpg://", "postgresql://")
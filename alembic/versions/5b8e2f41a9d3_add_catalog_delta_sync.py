@@ -0,0 +1,38 @@
+"""add questions.updated_version and question tombstones for delta sync
+
+Revision ID: 5b8e2f41a9d3
+Revises: c00793213def
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f41a9d3'
+down_revision: Union[str, None] = 'c00793213def'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('questions', sa.Column('updated_version', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+    op.create_index('ix_questions_exam_updated_version', 'questions', ['country', 'language', 'updated_version'])
+    op.create_table(
+        'question_tombstones',
+        sa.Column('question_id', sa.Integer(), primary_key=True),
+        sa.Column('country', sa.Text(), nullable=False),
+        sa.Column('language', sa.Text(), nullable=False),
+        sa.Column('deleted_version', sa.BigInteger(), nullable=False),
+    )
+    op.create_index('ix_question_tombstones_exam_version', 'question_tombstones', ['country', 'language', 'deleted_version'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_question_tombstones_exam_version', table_name='question_tombstones')
+    op.drop_table('question_tombstones')
+    op.drop_index('ix_questions_exam_updated_version', table_name='questions')
+    op.drop_column('questions', 'updated_version')
@@ -0,0 +1,41 @@
+"""add incrementally maintained question stats
+
+Revision ID: 9d2b6e8f3a17
+Revises: e4a7c9b2d615
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2b6e8f3a17'
+down_revision: Union[str, None] = 'e4a7c9b2d615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'question_stats',
+        sa.Column('question_id', sa.Integer(), primary_key=True),
+        sa.Column('attempts', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('correct', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+    )
+    op.create_table(
+        'question_stats_watermark',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('last_answer_id', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+    )
+    # Статистику догоняет cron-задача /cron/question-stats начиная с answer_history.id = 0
+    op.execute("INSERT INTO question_stats_watermark (id, last_answer_id) VALUES (1, 0)")
+
+
+def downgrade() -> None:
+    op.drop_table('question_stats_watermark')
+    op.drop_table('question_stats')
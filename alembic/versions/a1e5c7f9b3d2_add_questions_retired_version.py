@@ -0,0 +1,26 @@
+"""add questions.retired_version for questions dropped from the bank but still referenced
+
+Revision ID: a1e5c7f9b3d2
+Revises: f2c8a4d6e0b7
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1e5c7f9b3d2'
+down_revision: Union[str, None] = 'f2c8a4d6e0b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('questions', sa.Column('retired_version', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('questions', 'retired_version')
@@ -0,0 +1,43 @@
+"""add user exam counters
+
+Revision ID: b6d3f0a8c421
+Revises: 9d2b6e8f3a17
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d3f0a8c421'
+down_revision: Union[str, None] = '9d2b6e8f3a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_exam_counters',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('country', sa.Text(), primary_key=True),
+        sa.Column('language', sa.Text(), primary_key=True),
+        sa.Column('answered', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('correct', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+    )
+    # Начальное заполнение из существующего прогресса
+    op.execute("""
+        INSERT INTO user_exam_counters (user_id, country, language, answered, correct)
+        SELECT p.user_id, q.country, q.language, count(*), count(*) FILTER (WHERE p.is_correct)
+          FROM user_progress p
+          JOIN questions q ON q.id = p.question_id
+         GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_exam_counters')
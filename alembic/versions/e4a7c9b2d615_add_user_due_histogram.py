@@ -0,0 +1,44 @@
+"""add per-user due histogram
+
+Revision ID: e4a7c9b2d615
+Revises: 5b8e2f41a9d3
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c9b2d615'
+down_revision: Union[str, None] = '5b8e2f41a9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_due_histogram',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('country', sa.Text(), nullable=False),
+        sa.Column('language', sa.Text(), nullable=False),
+        sa.Column('due_day', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.PrimaryKeyConstraint('user_id', 'country', 'language', 'due_day'),
+    )
+    # Заполняем из текущего прогресса
+    op.execute("""
+        INSERT INTO user_due_histogram (user_id, country, language, due_day, count)
+        SELECT p.user_id, q.country, q.language, (p.next_due_at AT TIME ZONE 'UTC')::date, count(*)
+          FROM user_progress p
+          JOIN questions q ON q.id = p.question_id
+         WHERE p.next_due_at IS NOT NULL
+         GROUP BY 1, 2, 3, 4
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_due_histogram')
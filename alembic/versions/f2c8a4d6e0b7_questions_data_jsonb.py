@@ -0,0 +1,40 @@
+"""convert questions.data from json to jsonb
+
+Revision ID: f2c8a4d6e0b7
+Revises: b6d3f0a8c421
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a4d6e0b7'
+down_revision: Union[str, None] = 'b6d3f0a8c421'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Переписывает таблицу под ACCESS EXCLUSIVE; банк вопросов небольшой
+    op.alter_column(
+        'questions', 'data',
+        type_=postgresql.JSONB(),
+        existing_type=sa.JSON(),
+        existing_nullable=False,
+        postgresql_using='data::jsonb',
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'questions', 'data',
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(),
+        existing_nullable=False,
+        postgresql_using='data::json',
+    )
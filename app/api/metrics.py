@@ -0,0 +1,20 @@
+# app/api/metrics.py
+import os
+from fastapi import APIRouter, HTTPException, Query
+from starlette.responses import Response
+
+from .. import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(token: str | None = Query(None)):
+    """
+    Метрики процесса в текстовом формате Prometheus.
+    Если задан METRICS_TOKEN, требует его в параметре token.
+    """
+    expected = os.environ.get("METRICS_TOKEN")
+    if expected and token != expected:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
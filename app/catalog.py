@@ -0,0 +1,166 @@
+"""Question catalog version and the caches derived from it.
+
+The version lives in the single ``catalog_version`` row. Imports bump it with
+``BUMP_CATALOG_VERSION_SQL``, which also sends ``NOTIFY catalog_version`` so
+every worker (see ``app.pg_listener``) adopts the new version and drops its
+derived caches — totals, topic lists, per-topic counts, cached responses —
+at the same time. Cached reads stay plain dict lookups.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import invalidation
+from app.database import AsyncSessionLocal
+from app.models import CatalogVersion
+from app.pg_listener import listener
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = "catalog_version"
+
+# Один оператор: увеличить версию и разослать её всем воркерам (NOTIFY уходит при commit)
+BUMP_CATALOG_VERSION_SQL = f"""
+    WITH bumped AS (
+        UPDATE catalog_version
+           SET version = version + 1, updated_at = now()
+         WHERE id = 1
+     RETURNING version
+    )
+    SELECT version, pg_notify('{CATALOG_CHANNEL}', version::text) FROM bumped
+"""
+
+_catalog_version = 0
+_change_callbacks: List[Callable[[int], None]] = []
+_derived: Dict[Hashable, Any] = {}
+# Загрузки в процессе: (key, version) -> Future; остальные запросы ждут её, а не грузят сами
+_inflight: Dict[Tuple[Hashable, int], "asyncio.Future"] = {}
+_MISSING = object()
+
+
+class _LeaderCancelled(Exception):
+    """The request that was loading a value got cancelled; waiters load it themselves."""
+
+
+def get_catalog_version() -> int:
+    return _catalog_version
+
+
+def on_catalog_change(callback: Callable[[int], None]) -> None:
+    """Register a callback invoked with the new version whenever the catalog changes."""
+    _change_callbacks.append(callback)
+
+
+def set_catalog_version(version: int) -> None:
+    """Adopt a catalog version and flush derived caches if it differs from the current one."""
+    global _catalog_version
+    if version == _catalog_version:
+        return
+    logger.info(f"Catalog version {_catalog_version} -> {version}, flushing derived caches")
+    _catalog_version = version
+    _derived.clear()
+    _inflight.clear()
+    for callback in _change_callbacks:
+        try:
+            callback(version)
+        except Exception as e:
+            logger.warning(f"Catalog change callback failed: {e}")
+
+
+def _fail(flight: "asyncio.Future", error: BaseException) -> None:
+    flight.set_exception(error)
+    flight.exception()  # помечаем как полученное: без ожидающих asyncio не пишет «never retrieved»
+
+
+async def get_or_load(key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return a derived value for the current catalog version, computing it once.
+    Concurrent misses share one load (single-flight), so a version bump doesn't
+    send every request to the database at once. A value computed while the version
+    changed or the exam was invalidated underneath is returned but not stored.
+    """
+    while True:
+        value = _derived.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        version = _catalog_version
+        flight_key = (key, version)
+        flight = _inflight.get(flight_key)
+        if flight is None:
+            break
+        try:
+            return await asyncio.shield(flight)
+        except _LeaderCancelled:
+            continue
+
+    flight = asyncio.get_running_loop().create_future()
+    _inflight[flight_key] = flight
+    try:
+        value = await loader()
+    except asyncio.CancelledError:
+        _fail(flight, _LeaderCancelled())
+        raise
+    except Exception as e:
+        _fail(flight, e)
+        raise
+    else:
+        if version == _catalog_version and _inflight.get(flight_key) is flight:
+            _derived[key] = value
+        flight.set_result(value)
+        return value
+    finally:
+        if _inflight.get(flight_key) is flight:
+            del _inflight[flight_key]
+
+
+def invalidate_exam(country: str, language: str) -> None:
+    """Drop derived values of one exam (keys shaped like ``(name, country, language, ...)``)."""
+    for key in [k for k in _derived if isinstance(k, tuple) and k[1:3] == (country, language)]:
+        _derived.pop(key, None)
+    # Идущая загрузка могла прочитать старые данные — её результат не сохраняем
+    for flight_key in [k for k in _inflight if isinstance(k[0], tuple) and k[0][1:3] == (country, language)]:
+        _inflight.pop(flight_key, None)
+
+
+def flush_derived() -> None:
+    _derived.clear()
+    _inflight.clear()
+
+
+async def load_catalog_version(db: AsyncSession) -> int:
+    version = (await db.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1))).scalar()
+    return int(version or 0)
+
+
+async def refresh_catalog_version() -> None:
+    """Re-read the version from the database (startup and after LISTEN reconnects)."""
+    try:
+        async with AsyncSessionLocal() as db:
+            set_catalog_version(await load_catalog_version(db))
+    except Exception as e:
+        logger.warning(f"Failed to load catalog version: {e}")
+
+
+async def bump_catalog_version(db: AsyncSession) -> int:
+    """
+    Increment the catalog version and notify all workers. The caller commits;
+    the notification is delivered on commit.
+    """
+    version = (await db.execute(text(BUMP_CATALOG_VERSION_SQL))).scalar_one()
+    return int(version)
+
+
+def _on_catalog_notify(payload: str) -> None:
+    try:
+        set_catalog_version(int(payload))
+    except ValueError:
+        logger.warning(f"Bad catalog version payload: {payload!r}")
+
+
+listener.subscribe(CATALOG_CHANNEL, _on_catalog_notify)
+listener.on_reconnect(refresh_catalog_version)
+invalidation.subscribe("catalog", invalidate_exam)
+invalidation.on_flush(flush_derived)
@@ -0,0 +1,132 @@
+# app/config.py
+import json
+import os
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+# Загружаем .env файл из backend директории (как и app/database.py)
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv(os.path.join(backend_dir, '.env'))
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_json(name: str, default):
+    value = os.getenv(name)
+    return json.loads(value) if value not in (None, "") else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Настройки приложения, читаются из переменных окружения."""
+
+    database_url: str = ""
+    # Профиль подключения к БД:
+    #   pooler — через pgbouncer/Supavisor в transaction mode, без prepared statements
+    #   direct — прямое подключение к Postgres, с кэшем prepared statements
+    db_pool_profile: str = "pooler"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_command_timeout: float = 30.0
+    # Размеры кэшей prepared statements для профиля direct (asyncpg и SQLAlchemy)
+    db_statement_cache_size: int = 100
+    db_prepared_statement_cache_size: int = 100
+    # Необязательная реплика для чтения и политика ограниченной «устарелости»:
+    # после записи пользователя его чтения идут в primary ещё N секунд
+    read_database_url: str = ""
+    read_db_pool_profile: str = ""
+    read_after_write_primary_seconds: float = 10.0
+    # Отдельный URL для LISTEN/NOTIFY (transaction pooler его не поддерживает)
+    listen_database_url: str = ""
+
+    # max-age (сек) для кэшируемых каталожных ответов (/topics, /questions/countries, ...)
+    catalog_cache_max_age: int = 60
+
+    debug: bool = False
+    # Профилировщик запросов: сколько одинаковых SQL за запрос считается N+1
+    query_repeat_threshold: int = 5
+    # Лог медленных запросов: порог (0 = выключено), доля EXPLAIN, ротируемый JSONL
+    slow_query_threshold_ms: float = 200.0
+    slow_query_explain_sample_rate: float = 0.1
+    slow_query_log_path: str = "slow_queries.jsonl"
+    slow_query_log_max_bytes: int = 10 * 1024 * 1024
+    slow_query_log_backups: int = 5
+
+    # Планировщик интервальных повторений (app.scheduler): fibonacci | fsrs
+    scheduler: str = "fibonacci"
+    fsrs_desired_retention: float = 0.9
+
+    # Инкрементальная статистика вопросов: не трогать ответы моложе lag секунд
+    # (их транзакции могли ещё не закоммититься), не больше batch строк за проход
+    question_stats_lag_seconds: int = 60
+    question_stats_batch_rows: int = 100_000
+
+    # Секрет подписи stateless-токенов (билеты экзамена, курсоры сессий)
+    token_secret: str = ""
+    # Экзаменационный билет: размер, допустимые ошибки и квоты тем по стране, например
+    # {"am": {"size": 20, "max_errors": 2, "topics": {"Дорожные знаки": 4, ...}}};
+    # темы без квоты и страны без настроек — пропорционально размеру темы
+    exam_ticket_size: int = 20
+    exam_ticket_max_errors: int = 2
+    exam_ticket_ttl_seconds: int = 3 * 3600
+    exam_ticket_quotas: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=os.getenv("DATABASE_URL", ""),
+            db_pool_profile=os.getenv("DB_POOL_PROFILE", "pooler").strip().lower(),
+            db_pool_size=_env_int("DB_POOL_SIZE", 5),
+            db_max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+            db_pool_timeout=_env_float("DB_POOL_TIMEOUT", 30.0),
+            db_pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+            db_pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+            db_command_timeout=_env_float("DB_COMMAND_TIMEOUT", 30.0),
+            db_statement_cache_size=_env_int("DB_STATEMENT_CACHE_SIZE", 100),
+            db_prepared_statement_cache_size=_env_int("DB_PREPARED_STATEMENT_CACHE_SIZE", 100),
+            read_database_url=os.getenv("READ_DATABASE_URL", ""),
+            read_db_pool_profile=os.getenv("READ_DB_POOL_PROFILE", "").strip().lower(),
+            read_after_write_primary_seconds=_env_float("READ_AFTER_WRITE_PRIMARY_SECONDS", 10.0),
+            listen_database_url=os.getenv("LISTEN_DATABASE_URL", ""),
+            catalog_cache_max_age=_env_int("CATALOG_CACHE_MAX_AGE", 60),
+            debug=_env_bool("DEBUG"),
+            query_repeat_threshold=_env_int("QUERY_REPEAT_THRESHOLD", 5),
+            slow_query_threshold_ms=_env_float("SLOW_QUERY_THRESHOLD_MS", 200.0),
+            slow_query_explain_sample_rate=_env_float("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1),
+            slow_query_log_path=os.getenv("SLOW_QUERY_LOG_PATH", "slow_queries.jsonl"),
+            slow_query_log_max_bytes=_env_int("SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024),
+            slow_query_log_backups=_env_int("SLOW_QUERY_LOG_BACKUPS", 5),
+            scheduler=os.getenv("SCHEDULER", "fibonacci").strip().lower(),
+            fsrs_desired_retention=_env_float("FSRS_DESIRED_RETENTION", 0.9),
+            question_stats_lag_seconds=_env_int("QUESTION_STATS_LAG_SECONDS", 60),
+            question_stats_batch_rows=_env_int("QUESTION_STATS_BATCH_ROWS", 100_000),
+            token_secret=os.getenv("TOKEN_SECRET") or os.getenv("TELEGRAM_BOT_TOKEN", ""),
+            exam_ticket_size=_env_int("EXAM_TICKET_SIZE", 20),
+            exam_ticket_max_errors=_env_int("EXAM_TICKET_MAX_ERRORS", 2),
+            exam_ticket_ttl_seconds=_env_int("EXAM_TICKET_TTL_SECONDS", 3 * 3600),
+            exam_ticket_quotas={
+                country.lower(): rules for country, rules in _env_json("EXAM_TICKET_QUOTAS", {}).items()
+            },
+        )
+
+
+settings = Settings.from_env()
@@ -0,0 +1,233 @@
+# Файл: app/crud/adaptive.py
+# Адаптивный режим выбора вопросов: веса по просроченности, коробке пользователя,
+# глобальной сложности и балансу тем; взвешенная выборка без возвращения в памяти.
+# Из базы читаются только строки прогресса пользователя; банк вопросов и тела —
+# из кэша каталога, сложность — из question_stats с коротким TTL.
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import catalog, invalidation
+from app.models import Question, QuestionStats, UserProgress
+from app.scheduler import DAY, datetime_array, to_naive_utc
+from app.schemas import QuestionOut
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTY_TTL_SECONDS = 600
+# Априорная точность для вопросов с малым числом попыток (сглаживание Бета-приором)
+PRIOR_CORRECT, PRIOR_WRONG = 7.0, 3.0
+NEW_QUESTION_URGENCY = 1.0
+NOT_DUE_URGENCY = 0.05
+
+
+@dataclass
+class ExamBank:
+    ids: np.ndarray            # int64, по возрастанию
+    topic_idx: np.ndarray      # int32, индекс в topics
+    topics: List[str]
+    topic_ids: List[np.ndarray]  # id вопросов каждой темы, по возрастанию
+    encoded: Dict[int, bytes]  # id -> готовый JSON QuestionOut (UTF-8); dict-тела не храним
+
+
+_difficulty: Dict[Tuple[str, str], Tuple[float, np.ndarray]] = {}
+
+
+def encode_question(body: dict) -> bytes:
+    # Через QuestionOut: готовые байты проверены той же схемой, что объявлена у /questions/
+    body = QuestionOut.model_validate(body).model_dump(mode="json")
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def encode_question_list(
+    db: AsyncSession,
+    bank: ExamBank,
+    country: str,
+    language: str,
+    ids: List[int],
+) -> bytes:
+    """
+    JSON-массив вопросов склейкой готовых байтов. Id, которых нет в банке (вопрос добавлен
+    после загрузки кэша), дочитываются из БД; пропадают только удалённые из каталога.
+    """
+    missing = [qid for qid in ids if qid not in bank.encoded]
+    extra: Dict[int, bytes] = {}
+    if missing:
+        rows = (await db.execute(
+            select(Question.id, Question.topic, Question.data)
+            .where(Question.id.in_(missing))
+            .where(Question.country == country)
+            .where(Question.language == language)
+            .where(Question.retired_version.is_(None))
+        )).all()
+        extra = {
+            qid: encode_question({"id": qid, "data": data, "topic": topic, "country": country, "language": language})
+            for qid, topic, data in rows
+        }
+        if len(extra) < len(set(missing)):
+            logger.warning(f"Questions {sorted(set(missing) - set(extra))} are no longer in {country}/{language}")
+    encoded = (bank.encoded.get(qid) or extra.get(qid) for qid in ids)
+    return b"[" + b",".join(body for body in encoded if body is not None) + b"]"
+
+
+async def get_exam_bank(db: AsyncSession, country: str, language: str) -> ExamBank:
+    async def load() -> ExamBank:
+        rows = (await db.execute(
+            select(Question.id, Question.topic, Question.data)
+            .where(Question.country == country)
+            .where(Question.language == language)
+            .where(Question.retired_version.is_(None))
+            .order_by(Question.id)
+        )).all()
+        topics = sorted({topic for _, topic, _ in rows})
+        topic_pos = {topic: i for i, topic in enumerate(topics)}
+        ids = np.fromiter((qid for qid, _, _ in rows), dtype=np.int64, count=len(rows))
+        topic_idx = np.fromiter((topic_pos[t] for _, t, _ in rows), dtype=np.int32, count=len(rows))
+        return ExamBank(
+            ids=ids,
+            topic_idx=topic_idx,
+            topics=topics,
+            topic_ids=[ids[topic_idx == i] for i in range(len(topics))],
+            encoded={
+                qid: encode_question({"id": qid, "data": data, "topic": topic, "country": country, "language": language})
+                for qid, topic, data in rows
+            },
+        )
+
+    return await catalog.get_or_load(("exam_bank", country, language), load)
+
+
+async def get_difficulty(db: AsyncSession, country: str, language: str, bank: ExamBank) -> np.ndarray:
+    """Сложность 0..1 (1 - сглаженная доля правильных) в порядке bank.ids; обновляется раз в TTL."""
+    key = (country, language)
+    cached = _difficulty.get(key)
+    if cached is not None and cached[0] > time.monotonic() and len(cached[1]) == len(bank.ids):
+        return cached[1]
+
+    rows = (await db.execute(
+        select(QuestionStats.question_id, QuestionStats.attempts, QuestionStats.correct)
+        .join(Question, Question.id == QuestionStats.question_id)
+        .where(Question.country == country)
+        .where(Question.language == language)
+        .where(Question.retired_version.is_(None))
+    )).all()
+    attempts = np.zeros(len(bank.ids))
+    correct = np.zeros(len(bank.ids))
+    if rows:
+        stat_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        pos = np.searchsorted(bank.ids, stat_ids)
+        pos = np.clip(pos, 0, len(bank.ids) - 1)
+        found = bank.ids[pos] == stat_ids
+        attempts[pos[found]] = np.array([r[1] for r in rows], dtype=np.float64)[found]
+        correct[pos[found]] = np.array([r[2] for r in rows], dtype=np.float64)[found]
+    difficulty = 1.0 - (correct + PRIOR_CORRECT) / (attempts + PRIOR_CORRECT + PRIOR_WRONG)
+    _difficulty[key] = (time.monotonic() + DIFFICULTY_TTL_SECONDS, difficulty)
+    return difficulty
+
+
+def _clear_difficulty(_version: int) -> None:
+    _difficulty.clear()
+
+
+def _invalidate_difficulty(country: str, language: str) -> None:
+    # Как банк экзамена: после импорта сложность пересчитывается по новому набору id
+    _difficulty.pop((country, language), None)
+
+
+catalog.on_catalog_change(_clear_difficulty)
+invalidation.subscribe("catalog", _invalidate_difficulty)
+invalidation.on_flush(_difficulty.clear)
+
+
+def adaptive_weights(
+    bank: ExamBank,
+    difficulty: np.ndarray,
+    progress_pos: np.ndarray,
+    repetition_count: np.ndarray,
+    next_due_at: np.ndarray,
+    now: datetime,
+) -> np.ndarray:
+    """Вес каждого вопроса банка; progress_pos — позиции отвеченных вопросов в bank.ids."""
+    n = len(bank.ids)
+    now64 = np.datetime64(to_naive_utc(now), "us")
+
+    # Срочность: новые — базовый вес, просроченные растут логарифмически, будущие — почти ноль
+    urgency = np.full(n, NEW_QUESTION_URGENCY)
+    overdue_days = np.nan_to_num((now64 - next_due_at) / DAY, nan=0.0)
+    urgency[progress_pos] = np.where(overdue_days >= 0, 1.0 + np.log1p(overdue_days), NOT_DUE_URGENCY)
+
+    # Коробка пользователя: чем больше правильных повторений, тем реже
+    box = np.ones(n)
+    box[progress_pos] = 1.0 / (1.0 + np.maximum(repetition_count, 0))
+
+    # Баланс тем: темы, отвеченные меньше их доли в банке, поднимаются (в пределах x0.5..x2)
+    topic_total = np.bincount(bank.topic_idx, minlength=len(bank.topics)).astype(np.float64)
+    topic_answered = np.bincount(bank.topic_idx[progress_pos], minlength=len(bank.topics)).astype(np.float64)
+    bank_share = topic_total / max(topic_total.sum(), 1.0)
+    answered_share = (topic_answered + 1.0) / (topic_answered.sum() + len(bank.topics))
+    balance = np.clip(np.sqrt(bank_share / answered_share), 0.5, 2.0)[bank.topic_idx]
+
+    return urgency * box * (0.5 + difficulty) * balance
+
+
+def weighted_sample(weights: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Выборка без возвращения пропорционально весам (Efraimidis–Spirakis): top-k по log(u)/w."""
+    candidates = np.flatnonzero(weights > 0)
+    if len(candidates) <= k:
+        return candidates[rng.permutation(len(candidates))]
+    keys = np.log(rng.random(len(candidates))) / weights[candidates]
+    top = np.argpartition(-keys, k - 1)[:k]
+    return candidates[top[np.argsort(-keys[top])]]
+
+
+async def select_adaptive(
+    db: AsyncSession,
+    user_id: UUID,
+    country: str,
+    language: str,
+    batch_size: int,
+    topics: Optional[List[str]] = None,
+    exclude_ids: Optional[List[int]] = None,
+    ids_only: bool = False,
+    rng: Optional[np.random.Generator] = None,
+) -> list:
+    bank = await get_exam_bank(db, country, language)
+    if not len(bank.ids):
+        return []
+    difficulty = await get_difficulty(db, country, language, bank)
+
+    rows = (await db.execute(
+        select(UserProgress.question_id, UserProgress.repetition_count, UserProgress.next_due_at)
+        .join(Question, UserProgress.question_id == Question.id)
+        .where(UserProgress.user_id == user_id)
+        .where(Question.country == country)
+        .where(Question.language == language)
+        .where(Question.retired_version.is_(None))
+    )).all()
+    answered_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    pos = np.clip(np.searchsorted(bank.ids, answered_ids), 0, len(bank.ids) - 1)
+    in_exam = bank.ids[pos] == answered_ids
+    # Дубли прогресса (на всякий случай) — берём первую строку
+    progress_pos, first = np.unique(pos[in_exam], return_index=True)
+    reps = np.array([r[1] or 0 for r in rows], dtype=np.int64)[in_exam][first]
+    due = datetime_array([r[2] for r in rows])[in_exam][first]
+
+    weights = adaptive_weights(bank, difficulty, progress_pos, reps, due, datetime.utcnow())
+    if topics:
+        wanted = np.array([bank.topics.index(t) for t in topics if t in bank.topics], dtype=np.int32)
+        weights[~np.isin(bank.topic_idx, wanted)] = 0.0
+    if exclude_ids:
+        weights[np.isin(bank.ids, np.asarray(exclude_ids, dtype=np.int64))] = 0.0
+
+    chosen = bank.ids[weighted_sample(weights, batch_size, rng or np.random.default_rng())].tolist()
+    if ids_only:
+        return chosen
+    return [json.loads(bank.encoded[qid]) for qid in chosen]
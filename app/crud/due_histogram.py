@@ -0,0 +1,144 @@
+# Файл: app/crud/due_histogram.py
+# Гистограмма next_due_at по дням (UTC) на пользователя и экзамен: прогноз повторений
+# и счётчик «к повторению сейчас» без сканирования всего user_progress.
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Question, UserDueHistogram, UserProgress
+from app.scheduler import to_naive_utc
+
+# Снятые с каталога вопросы (retired_version) не учитываются — ни в дельтах, ни при пересборке
+APPLY_DELTAS_SQL = text("""
+    INSERT INTO user_due_histogram (user_id, country, language, due_day, count)
+    SELECT :user_id, q.country, q.language, d.due_day, sum(d.delta)
+      FROM unnest(CAST(:question_ids AS int[]), CAST(:due_days AS date[]), CAST(:deltas AS int[]))
+           AS d(question_id, due_day, delta)
+      JOIN questions q ON q.id = d.question_id AND q.retired_version IS NULL
+     GROUP BY q.country, q.language, d.due_day
+    ON CONFLICT (user_id, country, language, due_day)
+    DO UPDATE SET count = user_due_histogram.count + EXCLUDED.count
+""")
+
+REBUILD_SQL = """
+    INSERT INTO user_due_histogram (user_id, country, language, due_day, count)
+    SELECT p.user_id, q.country, q.language, (p.next_due_at AT TIME ZONE 'UTC')::date, count(*)
+      FROM user_progress p
+      JOIN questions q ON q.id = p.question_id AND q.retired_version IS NULL
+     WHERE p.next_due_at IS NOT NULL {where}
+     GROUP BY 1, 2, 3, 4
+"""
+
+
+def due_day(value: Optional[datetime]) -> Optional[date]:
+    value = to_naive_utc(value)
+    return value.date() if value is not None else None
+
+
+async def apply_due_changes(
+    db: AsyncSession,
+    user_id: UUID,
+    changes: Iterable[Tuple[int, Optional[datetime], Optional[datetime]]],
+) -> None:
+    """
+    Переносит вопросы между днями гистограммы: (question_id, старый next_due_at, новый).
+    Без commit — выполняется в транзакции записи ответов.
+    """
+    deltas = defaultdict(int)
+    for question_id, old_due, new_due in changes:
+        old_day, new_day = due_day(old_due), due_day(new_due)
+        if old_day == new_day:
+            continue
+        if old_day is not None:
+            deltas[(question_id, old_day)] -= 1
+        if new_day is not None:
+            deltas[(question_id, new_day)] += 1
+    if not deltas:
+        return
+    keys = list(deltas)
+    await db.execute(APPLY_DELTAS_SQL, {
+        "user_id": user_id,
+        "question_ids": [question_id for question_id, _ in keys],
+        "due_days": [day for _, day in keys],
+        "deltas": [deltas[key] for key in keys],
+    })
+    await db.execute(
+        text("DELETE FROM user_due_histogram WHERE user_id = :user_id AND count <= 0"),
+        {"user_id": user_id},
+    )
+
+
+async def rebuild_due_histogram(db: AsyncSession, user_id: Optional[UUID] = None) -> None:
+    """Пересчитывает гистограмму из user_progress (одного пользователя или всех). Без commit."""
+    if user_id is None:
+        await db.execute(text("DELETE FROM user_due_histogram"))
+        await db.execute(text(REBUILD_SQL.format(where="")))
+    else:
+        await db.execute(text("DELETE FROM user_due_histogram WHERE user_id = :user_id"), {"user_id": user_id})
+        await db.execute(text(REBUILD_SQL.format(where="AND p.user_id = :user_id")), {"user_id": user_id})
+
+
+async def get_due_forecast(
+    db: AsyncSession,
+    user_id: UUID,
+    country: str,
+    language: str,
+    days: int,
+) -> dict:
+    """Просроченные + сегодняшние повторения и по дням на ``days`` дней вперёд."""
+    today = datetime.utcnow().date()
+    rows = (await db.execute(
+        select(UserDueHistogram.due_day, UserDueHistogram.count)
+        .where(
+            UserDueHistogram.user_id == user_id,
+            UserDueHistogram.country == country,
+            UserDueHistogram.language == language,
+            UserDueHistogram.due_day < today + timedelta(days=days + 1),
+        )
+    )).all()
+    by_day = {day: count for day, count in rows}
+    forecast: List[dict] = []
+    for offset in range(1, days + 1):
+        day = today + timedelta(days=offset)
+        forecast.append({"date": day, "count": by_day.get(day, 0)})
+    return {
+        "due_now": sum(count for day, count in by_day.items() if day <= today),
+        "days": forecast,
+    }
+
+
+async def get_due_now_count(db: AsyncSession, user_id: UUID, country: str, language: str) -> int:
+    """
+    Сколько отвеченных вопросов к повторению прямо сейчас (next_due_at <= now) — та же граница,
+    что у режима interval_all. Прошлые дни — из гистограммы, сегодняшний — точным запросом по
+    прогрессу за сегодня. Новые вопросы interval_all тоже выдаёт, их добавляет вызывающий.
+    """
+    now = datetime.utcnow()
+    today = now.date()
+    overdue = (await db.execute(
+        select(func.coalesce(func.sum(UserDueHistogram.count), 0))
+        .where(
+            UserDueHistogram.user_id == user_id,
+            UserDueHistogram.country == country,
+            UserDueHistogram.language == language,
+            UserDueHistogram.due_day < today,
+        )
+    )).scalar()
+    due_today = (await db.execute(
+        select(func.count())
+        .select_from(UserProgress)
+        .join(Question, UserProgress.question_id == Question.id)
+        .where(
+            UserProgress.user_id == user_id,
+            UserProgress.next_due_at >= datetime.combine(today, datetime.min.time()),
+            UserProgress.next_due_at <= now,
+            Question.country == country,
+            Question.language == language,
+            Question.retired_version.is_(None),
+        )
+    )).scalar()
+    return int(overdue or 0) + int(due_today or 0)
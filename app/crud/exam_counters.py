@@ -0,0 +1,85 @@
+# Файл: app/crud/exam_counters.py
+# Счётчики прогресса по (пользователь, экзамен): сколько вопросов отвечено и сколько
+# сейчас отвечено верно. Ведутся дельтами при записи ответов, поэтому remaining
+# (всего в каталоге − верных) и рекомендуемая цель считаются без сканирования user_progress.
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import UserExamCounters
+
+# Снятые с каталога вопросы (retired_version) не учитываются — ни в дельтах, ни при пересборке
+APPLY_DELTAS_SQL = text("""
+    INSERT INTO user_exam_counters (user_id, country, language, answered, correct, updated_at)
+    SELECT :user_id, q.country, q.language, sum(d.answered), sum(d.correct), now()
+      FROM unnest(CAST(:question_ids AS int[]), CAST(:answered AS int[]), CAST(:correct AS int[]))
+           AS d(question_id, answered, correct)
+      JOIN questions q ON q.id = d.question_id AND q.retired_version IS NULL
+     GROUP BY q.country, q.language
+    ON CONFLICT (user_id, country, language)
+    DO UPDATE SET answered = user_exam_counters.answered + EXCLUDED.answered,
+                  correct = user_exam_counters.correct + EXCLUDED.correct,
+                  updated_at = EXCLUDED.updated_at
+""")
+
+REBUILD_SQL = """
+    INSERT INTO user_exam_counters (user_id, country, language, answered, correct, updated_at)
+    SELECT p.user_id, q.country, q.language, count(*), count(*) FILTER (WHERE p.is_correct), now()
+      FROM user_progress p
+      JOIN questions q ON q.id = p.question_id AND q.retired_version IS NULL
+     WHERE TRUE {where}
+     GROUP BY 1, 2, 3
+"""
+
+
+async def apply_progress_changes(
+    db: AsyncSession,
+    user_id: UUID,
+    changes: Iterable[Tuple[int, Optional[bool], bool]],
+) -> None:
+    """
+    Учитывает изменения прогресса: (question_id, is_correct до — None для нового вопроса, после).
+    Без commit — выполняется в транзакции записи ответов.
+    """
+    answered, correct = Counter(), Counter()
+    for question_id, before, after in changes:
+        if before is None:
+            answered[question_id] += 1
+        delta = int(bool(after)) - int(bool(before))
+        if delta:
+            correct[question_id] += delta
+    question_ids = list(answered.keys() | correct.keys())
+    if not question_ids:
+        return
+    await db.execute(APPLY_DELTAS_SQL, {
+        "user_id": user_id,
+        "question_ids": question_ids,
+        "answered": [answered[qid] for qid in question_ids],
+        "correct": [correct[qid] for qid in question_ids],
+    })
+
+
+async def rebuild_exam_counters(db: AsyncSession, user_id: Optional[UUID] = None) -> None:
+    """Пересчитывает счётчики из user_progress (одного пользователя или всех). Без commit."""
+    if user_id is None:
+        await db.execute(text("DELETE FROM user_exam_counters"))
+        await db.execute(text(REBUILD_SQL.format(where="")))
+    else:
+        await db.execute(text("DELETE FROM user_exam_counters WHERE user_id = :user_id"), {"user_id": user_id})
+        await db.execute(text(REBUILD_SQL.format(where="AND p.user_id = :user_id")), {"user_id": user_id})
+
+
+async def get_exam_counters(db: AsyncSession, user_id: UUID, country: str, language: str) -> Tuple[int, int]:
+    """(отвечено, верно) по экзамену — одна строка по первичному ключу."""
+    row = (await db.execute(
+        select(UserExamCounters.answered, UserExamCounters.correct)
+        .where(
+            UserExamCounters.user_id == user_id,
+            UserExamCounters.country == country,
+            UserExamCounters.language == language,
+        )
+    )).one_or_none()
+    return (row.answered, row.correct) if row else (0, 0)
@@ -0,0 +1,196 @@
+# Файл: app/crud/exam_ticket.py
+# Режим exam: билет фиксированного размера с квотами по темам (настройки страны),
+# собирается в памяти из массивов id по темам в кэше каталога — без ORDER BY random().
+# Билет не хранится: токен несёт id вопросов и версию каталога на момент выдачи.
+# Ответы проверяются на сервере по data["correct"] вопросов билета; импорт во время
+# экзамена билет не отменяет, если не задел его собственные вопросы.
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import catalog
+from app.config import settings
+from app.crud.adaptive import ExamBank, get_exam_bank
+from app.models import Question
+from app.tokens import InvalidToken, sign_token, verify_token
+
+TICKET_TOKEN_KIND = "exam_ticket"
+
+
+@dataclass
+class TicketPlan:
+    size: int
+    max_errors: int
+    quotas: List[Tuple[int, int]]   # (индекс темы в bank.topics, вопросов из темы)
+
+
+@dataclass
+class ExamTicket:
+    token: str
+    ids: List[int]
+    max_errors: int
+
+
+@dataclass
+class TicketQuestion:
+    topic: str
+    correct: Optional[int]   # индекс правильного варианта из data["correct"]
+
+    def is_correct(self, selected: int) -> bool:
+        # Вопрос без ключа ответа засчитывается как ошибка
+        return self.correct is not None and selected == self.correct
+
+
+def proportional_quotas(counts: Sequence[int], size: int) -> List[int]:
+    """Делит size между темами пропорционально их размеру (метод наибольших остатков)."""
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    if total <= 0 or size <= 0:
+        return [0] * len(counts)
+    exact = counts * min(size, total) / total
+    quotas = np.floor(exact).astype(np.int64)
+    rest = int(min(size, total) - quotas.sum())
+    if rest:
+        quotas[np.argsort(-(exact - quotas), kind="stable")[:rest]] += 1
+    return quotas.tolist()
+
+
+def build_plan(bank: ExamBank, rules: dict) -> TicketPlan:
+    """Квоты билета: заданные темы — как в настройках, остаток — пропорционально прочим темам."""
+    size = int(rules.get("size", settings.exam_ticket_size))
+    max_errors = int(rules.get("max_errors", settings.exam_ticket_max_errors))
+    available = [len(ids) for ids in bank.topic_ids]
+    quotas = [0] * len(bank.topics)
+    configured = set()
+    for topic, quota in (rules.get("topics") or {}).items():
+        if topic in bank.topics:
+            i = bank.topics.index(topic)
+            quotas[i] = min(int(quota), available[i])
+            configured.add(i)
+    free = [i for i in range(len(bank.topics)) if i not in configured]
+    rest = size - sum(quotas)
+    if rest > 0 and free:
+        for i, quota in zip(free, proportional_quotas([available[i] for i in free], rest)):
+            quotas[i] = quota
+    return TicketPlan(
+        size=min(max(size, sum(quotas)), sum(available)),
+        max_errors=max_errors,
+        quotas=[(i, quota) for i, quota in enumerate(quotas) if quota > 0],
+    )
+
+
+async def get_ticket_plan(db: AsyncSession, country: str, language: str) -> Tuple[ExamBank, TicketPlan]:
+    bank = await get_exam_bank(db, country, language)
+
+    async def load() -> TicketPlan:
+        return build_plan(bank, settings.exam_ticket_quotas.get(country, {}))
+
+    return bank, await catalog.get_or_load(("exam_ticket_plan", country, language), load)
+
+
+def draw_ticket(bank: ExamBank, plan: TicketPlan, seed: int) -> List[int]:
+    """Детерминированный билет по seed: квоты тем по порядку, недобор — из остальных вопросов."""
+    rng = np.random.default_rng(seed)
+    parts = [rng.choice(bank.topic_ids[i], size=quota, replace=False) for i, quota in plan.quotas]
+    chosen = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    shortfall = plan.size - len(chosen)
+    if shortfall > 0:
+        pool = np.setdiff1d(bank.ids, chosen, assume_unique=True)
+        extra = rng.choice(pool, size=min(shortfall, len(pool)), replace=False)
+        chosen = np.concatenate([chosen, np.sort(extra)])
+    return chosen.tolist()
+
+
+async def issue_ticket(db: AsyncSession, user_id: UUID, country: str, language: str) -> ExamTicket:
+    """Новый билет и подписанный токен для его сдачи."""
+    bank, plan = await get_ticket_plan(db, country, language)
+    ids = draw_ticket(bank, plan, secrets.randbits(63))
+    token = sign_token(TICKET_TOKEN_KIND, {
+        "u": str(user_id),
+        "c": country,
+        "l": language,
+        "q": ids,
+        "e": plan.max_errors,
+        "v": catalog.get_catalog_version(),
+        "t": int(time.time()),
+    })
+    return ExamTicket(token=token, ids=ids, max_errors=plan.max_errors)
+
+
+def restore_ticket(user_id: UUID, token: str) -> Tuple[List[int], int, int]:
+    """(id вопросов, допустимо ошибок, версия каталога при выдаче); InvalidToken — чужой или просроченный."""
+    payload = verify_token(TICKET_TOKEN_KIND, token)
+    if payload.get("u") != str(user_id):
+        raise InvalidToken("ticket was issued to another user")
+    if time.time() - payload.get("t", 0) > settings.exam_ticket_ttl_seconds:
+        raise InvalidToken("ticket expired")
+    ids = payload.get("q")
+    if not isinstance(ids, list) or not all(isinstance(qid, int) for qid in ids):
+        raise InvalidToken("ticket has no question list")
+    return ids, int(payload.get("e", settings.exam_ticket_max_errors)), int(payload.get("v", 0))
+
+
+async def load_ticket_questions(
+    db: AsyncSession,
+    ticket_ids: List[int],
+    issued_version: int,
+) -> Dict[int, TicketQuestion]:
+    """
+    Темы и правильные варианты вопросов билета одним запросом. InvalidToken — если вопрос
+    билета с момента выдачи удалён, снят с каталога или изменён (другие изменения каталога
+    билету не мешают).
+    """
+    rows = (await db.execute(
+        select(
+            Question.id,
+            Question.topic,
+            Question.data["correct"].as_integer(),
+            Question.updated_version,
+            Question.retired_version,
+        )
+        .where(Question.id.in_(ticket_ids))
+    )).all()
+    questions = {}
+    for qid, topic, correct, updated_version, retired_version in rows:
+        if retired_version is not None or (updated_version or 0) > issued_version:
+            raise InvalidToken(f"question {qid} changed since the ticket was issued")
+        questions[qid] = TicketQuestion(topic=topic, correct=correct)
+    missing = set(ticket_ids) - set(questions)
+    if missing:
+        raise InvalidToken(f"questions {sorted(missing)} were removed since the ticket was issued")
+    return questions
+
+
+def score_ticket(
+    questions: Dict[int, TicketQuestion],
+    ticket_ids: List[int],
+    max_errors: int,
+    answers: Dict[int, bool],
+) -> dict:
+    """Итог билета по последнему ответу на каждый вопрос; неотвеченные считаются ошибками."""
+    by_topic: Dict[str, Dict[str, int]] = {}
+    correct = 0
+    for qid in ticket_ids:
+        topic = questions[qid].topic
+        stats = by_topic.setdefault(topic, {"topic": topic, "total": 0, "correct": 0})
+        stats["total"] += 1
+        if answers.get(qid):
+            stats["correct"] += 1
+            correct += 1
+    errors = len(ticket_ids) - correct
+    return {
+        "total": len(ticket_ids),
+        "answered": sum(1 for qid in ticket_ids if qid in answers),
+        "correct": correct,
+        "errors": errors,
+        "max_errors": max_errors,
+        "passed": errors <= max_errors,
+        "by_topic": list(by_topic.values()),
+    }
+
@@ -1,14 +1,20 @@
+import json
 from sqlalchemy.future import select
-from sqlalchemy import func, distinct, case
+from sqlalchemy import func, distinct, case, cast, Text
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Union
 from uuid import UUID
 from fastapi import HTTPException
 
-from app.models import Question
+from app import catalog
+from app.crud.adaptive import select_adaptive
+from app.crud.exam_counters import get_exam_counters
+from app.models import Question, QuestionTombstone
 from app.models import UserProgress
 
+CATALOG_STREAM_CHUNK_ROWS = 500
+
 async def fetch_questions_for_user(
     db: AsyncSession,
     user_id: UUID,
@@ -17,16 +23,27 @@ async def fetch_questions_for_user(
     mode: str,
     batch_size: int,
     topics: Optional[List[str]] = None,
-) -> List[Question]:
+    ids_only: bool = False,
+    exclude_ids: Optional[List[int]] = None,
+) -> Union[List[Question], List[int]]:
     country = country.lower()
     language = language.lower()
     if mode == 'topics' and not topics:
         mode = 'interval_all'
+    if mode == 'adaptive':
+        # Взвешенная выборка в памяти по кэшу банка; тела вопросов тоже из кэша
+        return await select_adaptive(
+            db, user_id, country, language, batch_size,
+            topics=topics, exclude_ids=exclude_ids, ids_only=ids_only,
+        )
+
+    # Клиенту с локальной копией каталога достаточно id
+    entity = Question.id if ids_only else Question
 
     if mode == 'interval_all':
         # Интервальные вопросы
         stmt = (
-            select(Question)
+            select(entity)
             .outerjoin(
                 UserProgress,
                 (Question.id == UserProgress.question_id)
@@ -40,7 +57,7 @@ async def fetch_questions_for_user(
     elif mode == 'new_only':
         # Только новые
         stmt = (
-            select(Question)
+            select(entity)
             .outerjoin(
                 UserProgress,
                 (Question.id == UserProgress.question_id)
@@ -51,7 +68,7 @@ async def fetch_questions_for_user(
     elif mode == 'incorrect':
         # Только некорректно отвеченные
         stmt = (
-            select(Question)
+            select(entity)
             .join(
                 UserProgress,
                 (Question.id == UserProgress.question_id)
@@ -62,7 +79,7 @@ async def fetch_questions_for_user(
     elif mode == 'topics':
         # Любые вопросы из указанных тем, но с JOIN, чтобы можно было сортировать по профилю
         stmt = (
-            select(Question)
+            select(entity)
             .outerjoin(
                 UserProgress,
                 (Question.id == UserProgress.question_id)
@@ -75,8 +92,12 @@ async def fetch_questions_for_user(
     # Фильтрация по стране, языку и (опционально) темам
     stmt = stmt.where(Question.country == country)
     stmt = stmt.where(Question.language == language)
+    stmt = stmt.where(Question.retired_version.is_(None))
     if topics:
         stmt = stmt.where(Question.topic.in_(topics))
+    if exclude_ids:
+        # Только что отвеченные в этом же запросе
+        stmt = stmt.where(Question.id.notin_(exclude_ids))
 
     # Сортировка и LIMIT
     if mode in ('interval_all', 'topics'):
@@ -103,14 +124,26 @@ async def get_distinct_languages(db: AsyncSession) -> List[str]:
     result = await db.execute(q)
     return [row[0] for row in result.fetchall() if row[0] is not None]
 
+# Количество вопросов по темам экзамена — одним GROUP BY, кэш до смены версии каталога
+async def get_topic_question_counts(db: AsyncSession, country: str, language: str) -> Dict[str, int]:
+    async def load() -> Dict[str, int]:
+        result = await db.execute(
+            select(Question.topic, func.count())
+              .where(Question.country == country)
+              .where(Question.language == language)
+              .where(Question.retired_version.is_(None))
+              .group_by(Question.topic)
+        )
+        return {topic: count for topic, count in result.all()}
+
+    return await catalog.get_or_load(("topic_counts", country, language), load)
+
 # Получаем список тем для юзера
 async def fetch_topics(db: AsyncSession, country: str, language: str) -> list[str]:
-    q = await db.execute(
-        select(distinct(Question.topic))
-          .where(Question.country == country)
-          .where(Question.language == language)
-    )
-    return [row[0] for row in q.all()]
+    async def load() -> list[str]:
+        return list(await get_topic_question_counts(db, country, language))
+
+    return await catalog.get_or_load(("topics", country, language), load)
 
 async def get_remaining_questions_count(
     db: AsyncSession,
@@ -121,22 +154,62 @@ async def get_remaining_questions_count(
     """Get count of questions user still needs to answer correctly"""
     country = country.lower()
     language = language.lower()
-    
-    # Считаем вопросы, которые либо не решались, либо решались неправильно
+
+    # Не решались или решались неправильно: всего в каталоге (кэш) минус верно отвеченные (счётчик)
+    total = sum((await get_topic_question_counts(db, country, language)).values())
+    _, correct = await get_exam_counters(db, user_id, country, language)
+    return max(total - correct, 0)
+
+async def stream_catalog_ndjson(
+    db: AsyncSession,
+    country: str,
+    language: str,
+    since_version: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Question bank of one exam as NDJSON chunks, read with a server-side cursor.
+    First line is a header with the catalog version, then questions changed
+    after ``since_version`` (all of them without it), then deleted ids, then
+    a trailer with the row count so clients can detect a truncated download.
+    """
+    version = await catalog.load_catalog_version(db)
+    header = {"version": version, "country": country, "language": language,
+              "since_version": since_version, "full": since_version is None}
+    yield (json.dumps(header) + "\n").encode()
+
     stmt = (
-        select(func.count(Question.id))
-        .outerjoin(
-            UserProgress,
-            (Question.id == UserProgress.question_id)
-            & (UserProgress.user_id == user_id)
-        )
-        .where(Question.country == country)
-        .where(Question.language == language)
-        .where(
-            (UserProgress.is_correct.is_(None))  # Не решались
-            | (UserProgress.is_correct == False)  # Решались неправильно
-        )
+        select(Question.id, Question.topic, cast(Question.data, Text))
+          .where(Question.country == country)
+          .where(Question.language == language)
+          .where(Question.retired_version.is_(None))
+          .order_by(Question.id)
+          .execution_options(yield_per=CATALOG_STREAM_CHUNK_ROWS)
     )
-    
-    result = await db.execute(stmt)
-    return result.scalar() or 0
\ No newline at end of file
+    if since_version is not None:
+        stmt = stmt.where(Question.updated_version > since_version)
+
+    count = 0
+    result = await db.stream(stmt)
+    async for rows in result.partitions():
+        # data уже JSON-текст из базы — вставляем как есть, без разбора и повторной сериализации
+        yield "".join(
+            f'{{"id":{qid},"topic":{json.dumps(topic, ensure_ascii=False)},"data":{data}}}\n'
+            for qid, topic, data in rows
+        ).encode()
+        count += len(rows)
+
+    deleted = 0
+    if since_version is not None:
+        result = await db.stream(
+            select(QuestionTombstone.question_id)
+              .where(QuestionTombstone.country == country)
+              .where(QuestionTombstone.language == language)
+              .where(QuestionTombstone.deleted_version > since_version)
+              .order_by(QuestionTombstone.question_id)
+              .execution_options(yield_per=CATALOG_STREAM_CHUNK_ROWS)
+        )
+        async for rows in result.partitions():
+            yield "".join(f'{{"id":{qid},"deleted":true}}\n' for (qid,) in rows).encode()
+            deleted += len(rows)
+
+    yield (json.dumps({"done": True, "questions": count, "deleted": deleted}) + "\n").encode()
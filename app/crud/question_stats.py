@@ -0,0 +1,122 @@
+# Файл: app/crud/question_stats.py
+# Глобальная статистика вопросов (попытки / правильные), ведётся инкрементально
+# из answer_history от отметки question_stats_watermark — без полного сканирования истории.
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Question, QuestionStats
+
+# Один оператор: взять отметку (с блокировкой — параллельные запуски ждут друг друга),
+# агрегировать следующий диапазон id, прибавить к статистике и сдвинуть отметку.
+# Отметка не должна обогнать строку, которая закоммитится позже (иначе та выпадет навсегда),
+# поэтому порция обрывается перед первой «неустоявшейся» строкой:
+#   - её транзакция не старше самой старой ещё идущей (xmin строки не раньше pg_snapshot_xmin) —
+#     значит, рядом могут быть невидимые пока строки с меньшими id;
+#   - или ответ моложе lag секунд (дополнительный запас на случай долгих транзакций).
+# Сравнение xid — через age(), он корректно переживает переполнение 32-битного счётчика.
+REFRESH_SQL = text("""
+    WITH mark AS (
+        SELECT last_answer_id AS lo
+          FROM question_stats_watermark
+         WHERE id = 1
+           FOR UPDATE
+    ), horizon AS (
+        SELECT age((pg_snapshot_xmin(pg_current_snapshot())::text::bigint % 4294967296)::text::xid) AS xact_age,
+               (now() AT TIME ZONE 'UTC') - make_interval(secs => :lag_seconds) AS answered_before
+    ), batch AS (
+        SELECT h.id, h.answered_at, age(h.xmin) AS xact_age
+          FROM answer_history h, mark
+         WHERE h.id > mark.lo
+         ORDER BY h.id
+         LIMIT :batch_rows
+    ), bounds AS (
+        SELECT mark.lo,
+               coalesce((
+                   SELECT max(b.id)
+                     FROM batch b
+                    WHERE b.id < coalesce((
+                              SELECT min(x.id)
+                                FROM batch x, horizon z
+                               WHERE x.xact_age <= z.xact_age
+                                  OR x.answered_at >= z.answered_before
+                          ), 9223372036854775807)
+               ), mark.lo) AS hi
+          FROM mark
+    ), agg AS (
+        SELECT h.question_id,
+               count(*) AS attempts,
+               count(*) FILTER (WHERE h.is_correct) AS correct
+          FROM answer_history h, bounds b
+         WHERE h.id > b.lo AND h.id <= b.hi
+         GROUP BY h.question_id
+    ), upserted AS (
+        INSERT INTO question_stats (question_id, attempts, correct, updated_at)
+        SELECT question_id, attempts, correct, now() FROM agg
+        ON CONFLICT (question_id) DO UPDATE
+           SET attempts = question_stats.attempts + EXCLUDED.attempts,
+               correct = question_stats.correct + EXCLUDED.correct,
+               updated_at = EXCLUDED.updated_at
+        RETURNING 1
+    ), moved AS (
+        UPDATE question_stats_watermark w
+           SET last_answer_id = b.hi, updated_at = now()
+          FROM bounds b
+         WHERE w.id = 1 AND b.hi > b.lo
+        RETURNING w.last_answer_id
+    )
+    SELECT b.lo, b.hi, (SELECT count(*) FROM upserted) AS questions
+      FROM bounds b
+""")
+
+
+async def refresh_question_stats(
+    db: AsyncSession,
+    lag_seconds: Optional[int] = None,
+    batch_rows: Optional[int] = None,
+) -> dict:
+    """Учитывает следующую порцию answer_history. Без commit; from_id == to_id — догнали."""
+    row = (await db.execute(REFRESH_SQL, {
+        "lag_seconds": float(lag_seconds if lag_seconds is not None else settings.question_stats_lag_seconds),
+        "batch_rows": batch_rows or settings.question_stats_batch_rows,
+    })).one_or_none()
+    if row is None:
+        raise RuntimeError("question_stats_watermark row is missing, run migrations")
+    return {"from_id": row.lo, "to_id": row.hi, "questions": row.questions}
+
+
+async def get_hardest_questions(
+    db: AsyncSession,
+    country: str,
+    language: str,
+    topic: Optional[str] = None,
+    min_attempts: int = 20,
+    limit: int = 50,
+) -> list[dict]:
+    """Вопросы экзамена с наименьшей долей правильных ответов (при достаточном числе попыток)."""
+    accuracy = (QuestionStats.correct * 1.0 / QuestionStats.attempts).label("accuracy")
+    stmt = (
+        select(Question.id, Question.topic, QuestionStats.attempts, QuestionStats.correct, accuracy)
+        .join(QuestionStats, QuestionStats.question_id == Question.id)
+        .where(Question.country == country)
+        .where(Question.language == language)
+        .where(Question.retired_version.is_(None))
+        .where(QuestionStats.attempts >= max(1, min_attempts))
+        .order_by(accuracy, QuestionStats.attempts.desc())
+        .limit(limit)
+    )
+    if topic:
+        stmt = stmt.where(Question.topic == topic)
+    rows = (await db.execute(stmt)).all()
+    return [
+        {
+            "question_id": qid,
+            "topic": q_topic,
+            "attempts": attempts,
+            "correct": correct,
+            "accuracy": round(float(acc), 4),
+        }
+        for qid, q_topic, attempts, correct, acc in rows
+    ]
@@ -0,0 +1,135 @@
+# Файл: app/crud/session_cursor.py
+# Курсор сессии для режимов new_only и topics: кандидаты берутся из кэша банка экзамена,
+# перемешиваются один раз по seed, а пакеты листают эту перестановку по смещению.
+# Состояние не хранится — seed и смещение лежат в подписанном токене курсора,
+# поэтому вопросы внутри сессии не повторяются и не нужен ORDER BY random().
+# В режиме topics, как и раньше, сначала идут вопросы с неверным последним ответом:
+# их набор на момент начала сессии фиксируется в токене битовой маской по кандидатам.
+import base64
+import secrets
+from dataclasses import dataclass
+from typing import List, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import catalog
+from app.crud.adaptive import ExamBank, get_exam_bank
+from app.models import Question, UserProgress
+from app.tokens import sign_token, verify_token
+
+CURSOR_TOKEN_KIND = "session_cursor"
+CURSOR_MODES = ("new_only", "topics")
+# Сколько id перестановки проверять по прогрессу за один запрос (new_only)
+SCAN_WINDOW_MIN = 200
+
+
+@dataclass
+class CursorPage:
+    ids: List[int]
+    cursor: Optional[str]       # None — перестановка пройдена до конца
+
+
+def candidate_ids(bank: ExamBank, topics: List[str]) -> np.ndarray:
+    """Базовый набор сессии: весь банк или вопросы выбранных тем, по возрастанию id."""
+    if not topics:
+        return bank.ids
+    parts = [bank.topic_ids[bank.topics.index(t)] for t in topics if t in bank.topics]
+    return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+
+def pack_mask(mask: np.ndarray) -> str:
+    return base64.urlsafe_b64encode(np.packbits(mask).tobytes()).rstrip(b"=").decode("ascii")
+
+
+def unpack_mask(value: str, size: int) -> np.ndarray:
+    raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+    return np.unpackbits(np.frombuffer(raw, dtype=np.uint8), count=size).astype(bool)
+
+
+def session_order(bank: ExamBank, topics: List[str], seed: int, first: Optional[np.ndarray] = None) -> np.ndarray:
+    """Перестановка кандидатов по seed; отмеченные в first (маска по candidate_ids) — в начале."""
+    candidates = candidate_ids(bank, topics)
+    perm = np.random.default_rng(seed).permutation(len(candidates))
+    if first is not None:
+        flags = first[perm]
+        perm = np.concatenate([perm[flags], perm[~flags]])
+    return candidates[perm]
+
+
+def _restore_state(cursor: Optional[str], expected: dict) -> Optional[dict]:
+    """Состояние из токена, если курсор выдан для тех же пользователя, экзамена, режима и версии каталога."""
+    if not cursor:
+        return None
+    state = verify_token(CURSOR_TOKEN_KIND, cursor)
+    if any(state.get(key) != value for key, value in expected.items()):
+        return None
+    return state
+
+
+async def next_page(
+    db: AsyncSession,
+    user_id: UUID,
+    country: str,
+    language: str,
+    mode: str,
+    batch_size: int,
+    topics: Optional[List[str]] = None,
+    cursor: Optional[str] = None,
+) -> CursorPage:
+    """
+    Следующий пакет сессии. Без курсора (или с курсором от других параметров) начинает
+    новую сессию. InvalidToken — подделанный или битый курсор.
+    """
+    expected = {
+        "u": str(user_id),
+        "c": country,
+        "l": language,
+        "m": mode,
+        "tp": sorted(set(topics or [])),
+        "v": catalog.get_catalog_version(),
+    }
+    state = _restore_state(cursor, expected)
+    bank = await get_exam_bank(db, country, language)
+    if state is None:
+        state = {**expected, "s": secrets.randbits(63), "o": 0}
+        if mode == "topics":
+            # Только вопросы этого экзамена: у других экзаменов бывают темы с тем же названием
+            incorrect = (await db.execute(
+                select(UserProgress.question_id)
+                .join(Question, UserProgress.question_id == Question.id)
+                .where(UserProgress.user_id == user_id)
+                .where(UserProgress.is_correct == False)
+                .where(Question.country == country)
+                .where(Question.language == language)
+                .where(Question.retired_version.is_(None))
+            )).scalars().all()
+            mask = np.isin(candidate_ids(bank, state["tp"]), np.asarray(incorrect, dtype=np.int64))
+            if mask.any():
+                state["f"] = pack_mask(mask)
+
+    first = unpack_mask(state["f"], len(candidate_ids(bank, state["tp"]))) if state.get("f") else None
+    order = session_order(bank, state["tp"], state["s"], first)
+    offset = state["o"]
+    chosen: List[int] = []
+    while len(chosen) < batch_size and offset < len(order):
+        window = order[offset:offset + max(batch_size * 4, SCAN_WINDOW_MIN)].tolist()
+        answered = set()
+        if mode == "new_only":
+            # Отвеченные после начала сессии (в том числе в других вкладках) пропускаем
+            answered = set((await db.execute(
+                select(UserProgress.question_id)
+                .where(UserProgress.user_id == user_id)
+                .where(UserProgress.question_id.in_(window))
+            )).scalars())
+        for qid in window:
+            offset += 1
+            if qid not in answered:
+                chosen.append(qid)
+                if len(chosen) == batch_size:
+                    break
+
+    next_cursor = sign_token(CURSOR_TOKEN_KIND, {**state, "o": offset}) if offset < len(order) else None
+    return CursorPage(ids=chosen, cursor=next_cursor)
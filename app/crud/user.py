@@ -2,6 +2,10 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_, text, distinct
+from app import catalog, invalidation
+from app.crud.due_histogram import get_due_now_count
+from app.crud.exam_counters import get_exam_counters
+from app.crud.question import get_topic_question_counts
 from app.models import User, Question, UserProgress, AnswerHistory
 from app.schemas import UserCreate, UserSettingsUpdate
 from sqlalchemy.exc import NoResultFound
@@ -35,7 +39,9 @@ async def create_or_update_user(
     else:
         user = User(**user_data.dict(), created_at=datetime.utcnow())
         db.add(user)
+        await db.flush()
 
+    invalidation.publish(db, invalidation.user_event(user.id))
     await db.commit()
     await db.refresh(user)
     return user
@@ -54,6 +60,7 @@ async def update_user_settings(
     for field, value in settings.dict(exclude_unset=True, exclude_none=True).items():
         setattr(user, field, value)
 
+    invalidation.publish(db, invalidation.user_event(user_id))
     await db.commit()
     await db.refresh(user)
     return user
@@ -75,31 +82,18 @@ async def update_user(db: AsyncSession, user_id: UUID, **fields) -> Optional[Use
         if field in ALLOWED_FIELDS:
             setattr(user, field, value)
     
+    invalidation.publish(db, invalidation.user_event(user_id))
     await db.commit()
     await db.refresh(user)
     return user
 
-# Simple in-memory cache for total questions count
-_questions_count_cache = {}
-
 async def get_total_questions(db: AsyncSession, country: str, language: str) -> int:
-    # Check cache first
-    cache_key = f"{country}_{language}"
-    if cache_key in _questions_count_cache:
-        return _questions_count_cache[cache_key]
-    
-    # If not in cache, query database
-    stmt = (
-        select(func.count())
-        .select_from(Question)
-        .where(Question.country == country)
-        .where(Question.language == language)
-    )
-    count = (await db.execute(stmt)).scalar_one()
-    
-    # Cache the result
-    _questions_count_cache[cache_key] = count
-    return count
+    """Всего вопросов в экзамене; кэш сбрасывается при смене версии каталога."""
+    async def load() -> int:
+        counts = await get_topic_question_counts(db, country, language)
+        return sum(counts.values())
+
+    return await catalog.get_or_load(("total", country, language), load)
 
 async def get_user_stats(db: AsyncSession, user_id: UUID) -> dict:
     user = await get_user_by_id(db, user_id)
@@ -108,28 +102,8 @@ async def get_user_stats(db: AsyncSession, user_id: UUID) -> dict:
 
     total_questions = await get_total_questions(db, user.exam_country, user.exam_language)
 
-    # answered — с JOIN на Question
-    answered_stmt = (
-        select(func.count())
-        .select_from(UserProgress)
-        .join(Question, UserProgress.question_id == Question.id)
-        .where(UserProgress.user_id == user_id)
-        .where(Question.country == user.exam_country)
-        .where(Question.language == user.exam_language)
-    )
-    answered = (await db.execute(answered_stmt)).scalar_one()
-
-    # correct — то же самое, плюс is_correct=True
-    correct_stmt = (
-        select(func.count())
-        .select_from(UserProgress)
-        .join(Question, UserProgress.question_id == Question.id)
-        .where(UserProgress.user_id == user_id)
-        .where(UserProgress.is_correct.is_(True))
-        .where(Question.country == user.exam_country)
-        .where(Question.language == user.exam_language)
-    )
-    correct = (await db.execute(correct_stmt)).scalar_one()
+    # answered / correct — из счётчиков экзамена (user_exam_counters), без JOIN по прогрессу
+    answered, correct = await get_exam_counters(db, user_id, user.exam_country, user.exam_language)
 
     box_counts = [0] * 10
     box_stmt = (
@@ -139,6 +113,7 @@ async def get_user_stats(db: AsyncSession, user_id: UUID) -> dict:
         .where(UserProgress.user_id == user_id)
         .where(Question.country == user.exam_country)
         .where(Question.language == user.exam_language)
+        .where(Question.retired_version.is_(None))
         .group_by(UserProgress.repetition_count)
     )
     for repetition_count, count in (await db.execute(box_stmt)).all():
@@ -156,6 +131,66 @@ async def get_user_stats(db: AsyncSession, user_id: UUID) -> dict:
     }
 
 
+# Разбивка по темам экзамена: один GROUP BY (тема, коробка) + кэшированные размеры тем
+async def get_topic_stats(db: AsyncSession, user_id: UUID) -> list[dict]:
+    user = await get_user_by_id(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not (user.exam_country and user.exam_language):
+        return []
+    country, language = user.exam_country.lower(), user.exam_language.lower()
+
+    topic_counts = await get_topic_question_counts(db, country, language)
+    stats = {
+        topic: {"topic": topic, "total": total, "answered": 0, "correct": 0, "box_counts": [0] * 10}
+        for topic, total in topic_counts.items()
+    }
+
+    box = func.least(func.greatest(func.coalesce(UserProgress.repetition_count, 0), 0), 9).label("box")
+    rows = await db.execute(
+        select(
+            Question.topic,
+            box,
+            func.count(),
+            func.count().filter(UserProgress.is_correct.is_(True)),
+        )
+        .select_from(UserProgress)
+        .join(Question, UserProgress.question_id == Question.id)
+        .where(UserProgress.user_id == user_id)
+        .where(Question.country == country)
+        .where(Question.language == language)
+        .where(Question.retired_version.is_(None))
+        .group_by(Question.topic, "box")
+    )
+    for topic, box_idx, count, correct in rows.all():
+        entry = stats.setdefault(
+            topic, {"topic": topic, "total": 0, "answered": 0, "correct": 0, "box_counts": [0] * 10}
+        )
+        entry["answered"] += count
+        entry["correct"] += correct
+        entry["box_counts"][box_idx] += count
+
+    for entry in stats.values():
+        # Как в get_user_stats: неотвеченные вопросы — в первой коробке
+        entry["box_counts"][0] += max(entry["total"] - entry["answered"], 0)
+    return sorted(stats.values(), key=lambda e: e["topic"])
+
+
+# Лёгкие счётчики для учебного цикла: поддерживаемые счётчики вместо полной статистики
+async def get_study_counters(db: AsyncSession, user_id: UUID, country: str, language: str) -> dict:
+    total_questions = await get_total_questions(db, country, language)
+    answered, correct = await get_exam_counters(db, user_id, country, language)
+    unanswered = max(total_questions - answered, 0)
+    return {
+        "total_questions": total_questions,
+        "answered": answered,
+        "correct": correct,
+        "remaining": max(total_questions - correct, 0),
+        # Как выборка interval_all: срок повторения наступил или вопрос ещё не отвечен
+        "due_now": await get_due_now_count(db, user_id, country, language) + unanswered,
+    }
+
+
 async def get_daily_progress(
     db: AsyncSession, 
     user_id: UUID, 
@@ -1,24 +1,28 @@
 # Файл: app/crud/user_progress.py
+import uuid
+from dataclasses import dataclass, field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import insert, update, text
 from uuid import UUID
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Set
 
+import numpy as np
 from sqlalchemy.orm import joinedload
+from app import invalidation
+from app.crud.due_histogram import apply_due_changes
+from app.crud.exam_counters import apply_progress_changes
 from app.models import UserProgress, Question, AnswerHistory
-from app.schemas import AnswerSubmit
-
-# Предвычисленная последовательность Фибоначчи на 20 уровней (до ~18 лет)
-FIB_SEQUENCE = [
-    0, 1, 2, 3, 5, 8, 13, 21, 34,
-    55, 89, 144, 233, 377, 610, 987,
-    1597, 2584, 4181, 6765
-]
+from app.scheduler import ReviewStates, advance_repetitions, datetime_array, get_scheduler, schedule_one
+from app.schemas import AnswerSubmit, BatchAnswerItem
+from app.utils.fib import FIB_SEQUENCE
 
 
 def calculate_next_due_date(repetition_count: int) -> datetime:
     """
     Возвращает следующую дату повторения: текущее время + интервал по Фибоначчи.
+    Для записи ответов используется планировщик из app.scheduler.
     """
     idx = min(repetition_count, len(FIB_SEQUENCE) - 1)
     days = FIB_SEQUENCE[idx]
@@ -57,17 +61,21 @@ async def create_or_update_progress(
     prog = result.scalars().first()
 
     # 3. Обновляем или создаём прогресс
+    old_due = prog.next_due_at if prog else None
+    old_correct = prog.is_correct if prog else None
     if prog:
+        prog.next_due_at = schedule_one(
+            prog.repetition_count, prog.last_answered_at, prog.next_due_at, data.is_correct, now
+        )
         if data.is_correct:
             prog.repetition_count += 1
         else:
             prog.repetition_count = 0
         prog.is_correct = data.is_correct
         prog.last_answered_at = now
-        prog.next_due_at = calculate_next_due_date(prog.repetition_count)
     else:
         reps = 1 if data.is_correct else 0
-        next_due = calculate_next_due_date(reps)
+        next_due = schedule_one(0, None, None, data.is_correct, now)
         prog = UserProgress(
             user_id=data.user_id,
             question_id=data.question_id,
@@ -78,6 +86,9 @@ async def create_or_update_progress(
         )
         db.add(prog)
 
+    await apply_due_changes(db, data.user_id, [(data.question_id, old_due, prog.next_due_at)])
+    await apply_progress_changes(db, data.user_id, [(data.question_id, old_correct, data.is_correct)])
+    invalidation.publish(db, invalidation.user_event(data.user_id))
     await db.commit()
     await db.refresh(prog)
     return prog
@@ -116,17 +127,21 @@ async def create_or_update_progress_batch(
     prog = result.scalars().first()
 
     # 3. Обновляем или создаём прогресс
+    old_due = prog.next_due_at if prog else None
+    old_correct = prog.is_correct if prog else None
     if prog:
+        prog.next_due_at = schedule_one(
+            prog.repetition_count, prog.last_answered_at, prog.next_due_at, data.is_correct, now
+        )
         if data.is_correct:
             prog.repetition_count += 1
         else:
             prog.repetition_count = 0
         prog.is_correct = data.is_correct
         prog.last_answered_at = now
-        prog.next_due_at = calculate_next_due_date(prog.repetition_count)
     else:
         reps = 1 if data.is_correct else 0
-        next_due = calculate_next_due_date(reps)
+        next_due = schedule_one(0, None, None, data.is_correct, now)
         prog = UserProgress(
             user_id=data.user_id,
             question_id=data.question_id,
@@ -137,10 +152,200 @@ async def create_or_update_progress_batch(
         )
         db.add(prog)
 
-    # НЕ делаем commit здесь - это ответственность вызывающего кода
+    await apply_due_changes(db, data.user_id, [(data.question_id, old_due, prog.next_due_at)])
+    await apply_progress_changes(db, data.user_id, [(data.question_id, old_correct, data.is_correct)])
+    # НЕ делаем commit здесь - это ответственность вызывающего кода;
+    # событие инвалидации уйдёт вместе с этим commit
+    invalidation.publish(db, invalidation.user_event(data.user_id))
     return prog
 
 
+@dataclass
+class ProgressChange:
+    """Состояние вопроса до и после ингеста (before_* = None — вопрос отвечен впервые)."""
+    question_id: int
+    before_is_correct: Optional[bool]
+    before_next_due_at: Optional[datetime]
+    is_correct: bool
+    repetition_count: int
+    next_due_at: datetime
+
+
+@dataclass
+class IngestResult:
+    processed: int = 0
+    skipped: int = 0
+    # Итоговое изменение по каждому вопросу пакета, в порядке первых ответов
+    changes: Dict[int, ProgressChange] = field(default_factory=dict)
+
+    @property
+    def question_ids(self) -> List[int]:
+        return list(self.changes)
+
+
+async def _find_duplicate_answers(
+    db: AsyncSession,
+    user_id: UUID,
+    answers: Sequence[BatchAnswerItem],
+) -> Set[int]:
+    """Индексы ответов, уже записанных в answer_history (тот же вопрос, время ±1 секунда)."""
+    stamped = [(i, a) for i, a in enumerate(answers) if a.timestamp]
+    if not stamped:
+        return set()
+    result = await db.execute(
+        text("""
+            SELECT DISTINCT v.idx
+              FROM unnest(CAST(:idx AS int[]), CAST(:question_ids AS int[]), CAST(:answered_at AS timestamp[]))
+                   AS v(idx, question_id, answered_at)
+              JOIN answer_history h
+                ON h.user_id = :user_id
+               AND h.question_id = v.question_id
+               AND h.answered_at BETWEEN v.answered_at - interval '1 second'
+                                     AND v.answered_at + interval '1 second'
+        """),
+        {
+            "idx": [i for i, _ in stamped],
+            "question_ids": [a.question_id for _, a in stamped],
+            # timestamp приходит в миллисекундах
+            "answered_at": [datetime.fromtimestamp(a.timestamp / 1000) for _, a in stamped],
+            "user_id": user_id,
+        },
+    )
+    return set(result.scalars().all())
+
+
+async def ingest_answers(
+    db: AsyncSession,
+    user_id: UUID,
+    answers: Sequence[BatchAnswerItem],
+) -> IngestResult:
+    """
+    Записывает пакет ответов набором операций вместо запросов на каждый ответ:
+    одна проверка дублей, одно чтение прогресса, пакетные INSERT/UPDATE.
+    Повторный ответ на тот же вопрос в пакете применяется поверх предыдущего.
+    ВНИМАНИЕ: НЕ делает commit — событие инвалидации уйдёт вместе с commit вызывающего.
+    """
+    result = IngestResult()
+    if not answers:
+        return result
+    now = datetime.utcnow()
+
+    duplicates = await _find_duplicate_answers(db, user_id, answers)
+    fresh = []
+    seen = set()
+    for i, answer in enumerate(answers):
+        key = (answer.question_id, answer.timestamp)
+        if i in duplicates or (answer.timestamp and key in seen):
+            result.skipped += 1
+            continue
+        seen.add(key)
+        fresh.append(answer)
+    if not fresh:
+        return result
+
+    rows = (await db.execute(
+        select(
+            UserProgress.id, UserProgress.question_id, UserProgress.repetition_count,
+            UserProgress.is_correct, UserProgress.last_answered_at, UserProgress.next_due_at,
+        )
+        .where(
+            UserProgress.user_id == user_id,
+            UserProgress.question_id.in_({a.question_id for a in fresh}),
+        )
+        .with_for_update()
+    )).all()
+    state = {}
+    for row in rows:
+        state.setdefault(row.question_id, {
+            "id": row.id,
+            "repetition_count": row.repetition_count,
+            "is_correct": row.is_correct,
+            "last_answered_at": row.last_answered_at,
+            "next_due_at": row.next_due_at,
+        })
+    before = {qid: (s["is_correct"], s["next_due_at"]) for qid, s in state.items()}
+
+    history = []
+    answered = {}  # вопрос -> None, в порядке первых ответов
+    # Повторные ответы на вопрос в пакете идут следующими «раундами»; каждый раунд — один вызов планировщика
+    rounds = []
+    occurrence = {}
+    for answer in fresh:
+        history.append({
+            "user_id": user_id,
+            "question_id": answer.question_id,
+            "is_correct": answer.is_correct,
+            "answered_at": now,
+        })
+        n = occurrence.get(answer.question_id, 0)
+        occurrence[answer.question_id] = n + 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(answer)
+        answered.setdefault(answer.question_id, None)
+        result.processed += 1
+
+    scheduler = get_scheduler()
+    for round_answers in rounds:
+        progs = [state.setdefault(a.question_id, {"id": None}) for a in round_answers]
+        outcomes = np.array([a.is_correct for a in round_answers], dtype=bool)
+        states = ReviewStates.from_columns(
+            [p.get("repetition_count", 0) for p in progs],
+            datetime_array([p.get("last_answered_at") for p in progs]),
+            datetime_array([p.get("next_due_at") for p in progs]),
+            now,
+        )
+        due = scheduler.schedule(states, outcomes, now).tolist()
+        reps = advance_repetitions(states.repetition_count, outcomes).tolist()
+        for prog, answer, new_reps, next_due in zip(progs, round_answers, reps, due):
+            prog.update(
+                repetition_count=new_reps,
+                is_correct=answer.is_correct,
+                last_answered_at=now,
+                next_due_at=next_due,
+            )
+
+    new_rows, updated_rows = [], []
+    for qid in answered:
+        prog = state[qid]
+        was_correct, was_due = before.get(qid, (None, None))
+        result.changes[qid] = ProgressChange(
+            question_id=qid,
+            before_is_correct=was_correct,
+            before_next_due_at=was_due,
+            is_correct=prog["is_correct"],
+            repetition_count=prog["repetition_count"],
+            next_due_at=prog["next_due_at"],
+        )
+        values = {
+            "repetition_count": prog["repetition_count"],
+            "is_correct": prog["is_correct"],
+            "last_answered_at": now,
+            "next_due_at": prog["next_due_at"],
+        }
+        if prog["id"] is None:
+            new_rows.append({"id": uuid.uuid4(), "user_id": user_id, "question_id": qid, **values})
+        else:
+            updated_rows.append({"id": prog["id"], **values})
+
+    await db.execute(insert(AnswerHistory), history)
+    if new_rows:
+        await db.execute(insert(UserProgress), new_rows)
+    if updated_rows:
+        await db.execute(update(UserProgress), updated_rows)
+
+    # Производные агрегаты обновляются дельтами в той же транзакции
+    await apply_due_changes(db, user_id, [
+        (c.question_id, c.before_next_due_at, c.next_due_at) for c in result.changes.values()
+    ])
+    await apply_progress_changes(db, user_id, [
+        (c.question_id, c.before_is_correct, c.is_correct) for c in result.changes.values()
+    ])
+
+    invalidation.publish(db, invalidation.user_event(user_id))
+    return result
+
+
 async def get_progress_for_user(
     db: AsyncSession,
     user_id: UUID
@@ -1,56 +1,219 @@
 # app/database.py
-import os
 import logging
-from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import time
+import uuid
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import invalidation, metrics
+from app.config import Settings, settings
 
 logger = logging.getLogger(__name__)
 
-# Загружаем .env файл из backend директории
-backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-env_path = os.path.join(backend_dir, '.env')
-load_dotenv(env_path)
+POOL_PROFILES = ("pooler", "direct")
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is required")
 
-# Обеспечиваем использование asyncpg драйвера
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
-elif not DATABASE_URL.startswith("postgresql+asyncpg://"):
-    DATABASE_URL = "postgresql+asyncpg://" + DATABASE_URL
+def normalize_database_url(url: str) -> str:
+    """Приводит DATABASE_URL к драйверу asyncpg."""
+    if url.startswith("postgresql+asyncpg://"):
+        return url
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    return "postgresql+asyncpg://" + url
 
-# Добавляем параметры для отключения prepared statements в URL
-if "?" in DATABASE_URL:
-    DATABASE_URL += "&statement_cache_size=0"
-else:
-    DATABASE_URL += "?statement_cache_size=0"
-
-# Оптимальная настройка для Supabase Connection Pooler
-# Порт 5432 = Session Mode (persistent connections)
-# Порт 6543 = Transaction Mode (serverless/transient connections)
-# Supabase управляет server-side pooling в обоих режимах
-engine = create_async_engine(
-    DATABASE_URL,  # URL уже содержит statement_cache_size=0
-    # Для Supabase Pooler можно использовать минимальные настройки client-side
-    echo=False,
-    connect_args={
-        "statement_cache_size": 0,  # Обязательно для Supabase (любой режим)
-        "command_timeout": 30.0,    # Таймаут команд
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, который замеряет время ожидания соединения из пула."""
+
+    metrics_label = "primary"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.DB_POOL_CHECKOUT_WAIT.observe(
+                time.perf_counter() - start, engine=self.metrics_label
+            )
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_label = self.metrics_label
+        return pool
+
+
+def engine_options(profile: str, cfg: Settings = settings) -> dict:
+    """
+    Параметры create_async_engine для профиля подключения.
+
+    pooler: pgbouncer/Supavisor в transaction mode (Supabase порт 6543). Соединение
+        сервера меняется между транзакциями, поэтому prepared statements выключены
+        полностью, а имена statement'ов уникальны, чтобы не конфликтовать.
+    direct: прямое подключение к Postgres (или session mode). Включены кэши
+        prepared statements asyncpg и SQLAlchemy — повторные запросы не парсятся
+        и не планируются заново.
+    """
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"Unknown DB_POOL_PROFILE '{profile}', expected one of {POOL_PROFILES}")
+
+    connect_args = {
+        "command_timeout": cfg.db_command_timeout,
         "server_settings": {
             "application_name": "tgapp_backend",
-        }
+        },
     }
-)
+    if profile == "pooler":
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        })
+    else:
+        connect_args.update({
+            "statement_cache_size": cfg.db_statement_cache_size,
+            "prepared_statement_cache_size": cfg.db_prepared_statement_cache_size,
+        })
+
+    return {
+        "echo": False,
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": cfg.db_pool_size,
+        "max_overflow": cfg.db_max_overflow,
+        "pool_timeout": cfg.db_pool_timeout,
+        "pool_recycle": cfg.db_pool_recycle,
+        "pool_pre_ping": cfg.db_pool_pre_ping,
+        "connect_args": connect_args,
+    }
+
+
+def create_engine_for_profile(url: str, profile: str, label: str, cfg: Settings = settings) -> AsyncEngine:
+    """Создаёт инструментированный engine для указанного профиля пула."""
+    new_engine = create_async_engine(normalize_database_url(url), **engine_options(profile, cfg))
+    _instrument_engine(new_engine, label, profile)
+    return new_engine
+
+
+# Наблюдатели за выполненными SQL-выражениями: fn(engine_label, statement, parameters, elapsed)
+_statement_observers = []
+# Инструментированные engine по метке (нужно, например, для EXPLAIN медленных запросов)
+engines = {}
+engine_profiles = {}
+
+
+def add_statement_observer(observer) -> None:
+    """Регистрирует callback, который вызывается после каждого SQL-выражения."""
+    _statement_observers.append(observer)
+
+
+def _instrument_engine(async_engine, label: str, profile: str) -> None:
+    """Вешает на engine события SQLAlchemy для метрик по SQL-выражениям и пулу."""
+    sync_engine = async_engine.sync_engine
+    async_engine.pool.metrics_label = label
+    engines[label] = async_engine
+    engine_profiles[label] = profile
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = metrics.statement_operation(statement)
+        metrics.DB_STATEMENTS.inc(engine=label, operation=operation)
+        metrics.DB_STATEMENT_LATENCY.observe(elapsed, engine=label, operation=operation)
+        for observer in _statement_observers:
+            try:
+                observer(label, statement, parameters, elapsed)
+            except Exception as e:
+                logger.warning(f"Statement observer failed: {e}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            starts.pop()
+        operation = metrics.statement_operation(exception_context.statement or "")
+        metrics.DB_STATEMENT_ERRORS.inc(engine=label, operation=operation)
+
+    def _collect_pool_stats():
+        pool = async_engine.pool
+        for state in ("checkedin", "checkedout", "overflow"):
+            if hasattr(pool, state):
+                metrics.DB_POOL_CONNECTIONS.set(getattr(pool, state)(), engine=label, state=state)
+
+    metrics.REGISTRY.add_collect_hook(_collect_pool_stats)
+
+
+if not settings.database_url:
+    raise ValueError("DATABASE_URL environment variable is required")
+
+engine = create_engine_for_profile(settings.database_url, settings.db_pool_profile, "primary")
 
 AsyncSessionLocal = async_sessionmaker(
     engine, 
     expire_on_commit=False
 )
+
+# Реплика для чтения (если READ_DATABASE_URL не задан — тот же primary engine)
+if settings.read_database_url:
+    read_engine = create_engine_for_profile(
+        settings.read_database_url,
+        settings.read_db_pool_profile or settings.db_pool_profile,
+        "replica",
+    )
+    ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
+else:
+    read_engine = engine
+    ReadSessionLocal = AsyncSessionLocal
+
 Base = declarative_base()
 
+# Время последней записи пользователя (monotonic) для read-after-write на primary.
+# Локально для процесса; ограничено по размеру, старые записи вытесняются.
+# Воркер, выполнивший запись, отмечает её сразу после commit; остальные — когда до них
+# дойдёт NOTIFY шины инвалидации (обычно миллисекунды, но не мгновенно и не при обрыве
+# LISTEN). Поэтому гарантия такая: чтение в том же воркере после записи идёт в primary,
+# в другом — только после доставки NOTIFY; до этого возможна задержка репликации.
+# READ_AFTER_WRITE_PRIMARY_SECONDS должен превышать лаг реплики.
+MAX_TRACKED_WRITERS = 100_000
+_recent_writes: "OrderedDict[str, float]" = OrderedDict()
+
+
+def mark_user_write(user_id) -> None:
+    """Отмечает запись пользователя: его чтения пойдут в primary ещё N секунд."""
+    if read_engine is engine:
+        return
+    key = str(user_id)
+    _recent_writes[key] = time.monotonic()
+    _recent_writes.move_to_end(key)
+    horizon = time.monotonic() - settings.read_after_write_primary_seconds
+    while _recent_writes:
+        oldest_key, written_at = next(iter(_recent_writes.items()))
+        if written_at >= horizon and len(_recent_writes) <= MAX_TRACKED_WRITERS:
+            break
+        _recent_writes.popitem(last=False)
+
+
+# Запись пользователя в любом воркере продлевает окно чтения из primary во всех
+invalidation.subscribe("user", mark_user_write)
+
+
+def wrote_recently(user_id) -> bool:
+    written_at = _recent_writes.get(str(user_id))
+    if written_at is None:
+        return False
+    return time.monotonic() - written_at < settings.read_after_write_primary_seconds
+
 # Функция для мониторинга состояния connection pool (адаптирована для Supabase)
 def get_pool_status():
     """
@@ -70,6 +233,7 @@ def get_pool_status():
             
         stats = {
             "pool_class": pool.__class__.__name__,
+            "pool_profile": engine_profiles.get("primary"),
             "supabase_mode": supabase_mode,
             "note": f"Using Supabase Supavisor in {supabase_mode}. Server-side pooling is managed by Supabase."
         }
@@ -90,6 +254,7 @@ def get_pool_status():
         
         # Добавляем информацию о engine
         stats["engine_echo"] = engine.echo
+        stats["read_replica"] = read_engine is not engine
         
         return stats
         
@@ -109,4 +274,26 @@ async def get_db():
         except Exception as e:
             logger.error(f"Database session error: {e}")
             await session.rollback()
-            raise
\ No newline at end of file
+            raise
+
+
+def read_session_factory(user_id=None):
+    """
+    Фабрика сессий для чтения данных пользователя: реплика, кроме пользователей
+    с недавней записью. user_id передаётся явно в каждом месте чтения.
+    """
+    if user_id is not None and wrote_recently(user_id):
+        return AsyncSessionLocal
+    return ReadSessionLocal
+
+
+# Dependency для read-only эндпоинтов каталога (без данных пользователя) — всегда реплика;
+# чтения пользовательских данных открывают сессию через read_session_factory(user_id)
+async def get_read_db():
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        except Exception as e:
+            logger.error(f"Database session error: {e}")
+            await session.rollback()
+            raise
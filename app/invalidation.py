@@ -0,0 +1,106 @@
+"""Cross-worker cache invalidation bus over Postgres LISTEN/NOTIFY.
+
+CRUD write paths call ``publish(db, event)`` with a typed event such as
+``user:<id>`` or ``catalog:<country>:<lang>``. Events are queued on the
+session and sent with ``pg_notify`` right before the transaction commits, so
+they are delivered to every worker exactly when the write becomes visible
+(and never for rolled back writes). The committing worker also applies them
+locally, so it does not depend on its own LISTEN connection.
+
+When the LISTEN connection (``app.pg_listener``) reconnects, notifications
+may have been lost, so every cache is flushed completely.
+"""
+import logging
+from typing import Callable, Dict, List
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.pg_listener import listener
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache_invalidation"
+_PENDING_KEY = "pending_invalidations"
+
+_handlers: Dict[str, List[Callable[..., None]]] = {}
+_flush_callbacks: List[Callable[[], None]] = []
+
+_NOTIFY_SQL = text(
+    f"SELECT pg_notify('{INVALIDATION_CHANNEL}', payload) "
+    "FROM unnest(CAST(:payloads AS text[])) AS payload"
+)
+
+
+def user_event(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def catalog_event(country: str, language: str) -> str:
+    return f"catalog:{country}:{language}"
+
+
+def subscribe(kind: str, handler: Callable[..., None]) -> None:
+    """
+    Register a handler for an event kind. ``user`` handlers get ``(user_id)``,
+    ``catalog`` handlers get ``(country, language)``.
+    """
+    _handlers.setdefault(kind, []).append(handler)
+
+
+def on_flush(callback: Callable[[], None]) -> None:
+    """Register a callback that drops a whole cache (run after LISTEN reconnects)."""
+    _flush_callbacks.append(callback)
+
+
+def publish(db, event_name: str) -> None:
+    """Queue an invalidation event; it is broadcast when ``db`` commits."""
+    sync_session = getattr(db, "sync_session", db)
+    sync_session.info.setdefault(_PENDING_KEY, set()).add(event_name)
+
+
+def dispatch(event_name: str) -> None:
+    """Apply an invalidation event to the caches of this process."""
+    kind, _, rest = event_name.partition(":")
+    args = rest.split(":") if kind == "catalog" else [rest]
+    for handler in _handlers.get(kind, ()):
+        try:
+            handler(*args)
+        except Exception as e:
+            logger.warning(f"Invalidation handler for {event_name} failed: {e}")
+
+
+def flush_all() -> None:
+    for callback in _flush_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Cache flush callback failed: {e}")
+
+
+async def _flush_on_reconnect() -> None:
+    logger.info("Invalidation bus (re)connected, flushing all caches")
+    flush_all()
+
+
+@event.listens_for(Session, "before_commit")
+def _send_pending(session) -> None:
+    pending = session.info.get(_PENDING_KEY)
+    if pending:
+        session.execute(_NOTIFY_SQL, {"payloads": sorted(pending)})
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    for event_name in sorted(pending or ()):
+        dispatch(event_name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+listener.subscribe(INVALIDATION_CHANNEL, dispatch)
+listener.on_reconnect(_flush_on_reconnect)
@@ -3,6 +3,8 @@ import logging
 import os
 import time
 from datetime import date, datetime
+from typing import Optional
+from uuid import UUID
 from fastapi import Body, FastAPI, HTTPException, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import Response
@@ -15,10 +17,20 @@ from bot.wiring import get_bot_and_dispatcher
 from bot.locales import get_message
 from app.routers import users_router, questions_router, user_progress_router, topics_router
 from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
+from app import metrics
+from app.config import settings
+from app.query_profiler import format_offenders, profile_queries
+from app import slow_query_log
+from app.catalog import bump_catalog_version, refresh_catalog_version, set_catalog_version
+from app.pg_listener import listener as pg_listener
 from .tg_security import check_init_data, extract_user
 from app.database import get_db
 from app.models import User
 from app.crud import user as crud_user
+from app.crud.due_histogram import rebuild_due_histogram
+from app.crud.exam_counters import rebuild_exam_counters
+from app.crud import question_stats as crud_question_stats
 from app.schemas import MessageUserRequest, BroadcastRequest
 
 # Настройка логгера
@@ -40,17 +52,24 @@ def _require_admin_token(token: str) -> None:
 
 
 async def _send_bot_message(bot, user: User, text: str) -> bool:
+    start = time.perf_counter()
+    outcome = "error"
     try:
         await bot.send_message(user.telegram_id, text)
         user.is_bot_blocked = False
         user.last_bot_message_at = datetime.utcnow()
+        outcome = "sent"
         return True
     except TelegramForbiddenError:
         user.is_bot_blocked = True
+        outcome = "blocked"
         return False
     except Exception as exc:
         logger.warning("Failed to send message to %s: %s", user.telegram_id, exc)
         return False
+    finally:
+        metrics.TELEGRAM_SEND_LATENCY.observe(time.perf_counter() - start, outcome=outcome)
+        metrics.TELEGRAM_SENDS.inc(outcome=outcome)
 
 # CORS
 origins = [
@@ -69,6 +88,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Exam-Ticket", "X-Session-Cursor"],
 )
 
 
@@ -95,12 +115,49 @@ async def timing_middleware(request: Request, call_next):
     logger.info(f"{request.method} {request.url.path} took {process_time:.3f}s")
     return response
 
+# Middleware для метрик: шаблон маршрута (а не сырой путь), чтобы не плодить метки
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    method = request.method
+    metrics.HTTP_IN_FLIGHT.inc(method=method)
+    start_time = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start_time
+        metrics.HTTP_IN_FLIGHT.dec(method=method)
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        metrics.HTTP_REQUESTS.inc(method=method, route=route_path, status=str(status_code))
+        metrics.HTTP_LATENCY.observe(elapsed, method=method, route=route_path)
+
+# Middleware профилировщика SQL: число запросов и время БД на HTTP-запрос, поиск N+1
+@app.middleware("http")
+async def query_profiler_middleware(request: Request, call_next):
+    with profile_queries() as profile:
+        response = await call_next(request)
+    if profile.count:
+        if settings.debug:
+            response.headers["Server-Timing"] = profile.server_timing()
+        offenders = profile.repeated(settings.query_repeat_threshold)
+        if offenders:
+            logger.warning(
+                f"Possible N+1 in {request.method} {request.url.path}: "
+                f"{profile.count} queries, {profile.total_time * 1000:.1f}ms in DB; "
+                f"top: {format_offenders(offenders[:3])}"
+            )
+    return response
+
 @app.get("/")
 async def root():
     return {"message": "Backend is alive. Go to /docs for API info."}
 
 # Подключение роутеров
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(users_router)
 app.include_router(questions_router)
 app.include_router(user_progress_router)
@@ -122,6 +179,23 @@ async def init_bot():
     logger.info("🤖 Telegram bot initialized")
 
 
+@app.on_event("startup")
+async def start_catalog_sync():
+    """Load the catalog version and start listening for cross-worker notifications."""
+    await refresh_catalog_version()
+    await pg_listener.start()
+
+
+@app.on_event("shutdown")
+async def stop_catalog_sync():
+    await pg_listener.stop()
+
+
+@app.on_event("shutdown")
+async def flush_slow_query_log():
+    slow_query_log.stop()
+
+
 def _get_bot_state():
     bot = getattr(app.state, "bot", None)
     dp = getattr(app.state, "dp", None)
@@ -241,6 +315,32 @@ async def cron_send_reminders(
     return {"ok": True, "sent": sent, "blocked": blocked, "total": len(users)}
 
 
+@app.post("/cron/question-stats")
+async def cron_question_stats(
+    token: str = Query(...),
+    max_batches: int = Query(10, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Fold new answer_history rows into question_stats from the high-water mark (protected by token)."""
+    expected_token = os.environ.get("REMINDER_CRON_TOKEN")
+    if not expected_token or token != expected_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    first_id = last_id = None
+    questions = batches = 0
+    for _ in range(max_batches):
+        # Каждая порция — своя транзакция, чтобы не держать блокировку отметки долго
+        step = await crud_question_stats.refresh_question_stats(db)
+        await db.commit()
+        if step["to_id"] == step["from_id"]:
+            break
+        batches += 1
+        questions += step["questions"]
+        first_id = step["from_id"] if first_id is None else first_id
+        last_id = step["to_id"]
+    return {"ok": True, "batches": batches, "from_id": first_id, "to_id": last_id, "questions_touched": questions}
+
+
 @app.post("/auth/telegram")
 async def auth_telegram(payload: dict = Body(...)):
     """Verify initData payload received from Telegram Mini App."""
@@ -329,3 +429,78 @@ async def admin_broadcast(
         "failed": failed,
         "total": len(users),
     }
+
+
+@app.get("/admin/slow-queries")
+async def admin_slow_queries(
+    token: str = Query(...),
+    limit: int = Query(20, ge=1, le=200),
+    reset: bool = Query(False),
+):
+    """List the worst slow-statement fingerprints of this worker by total time."""
+    _require_admin_token(token)
+    worst = slow_query_log.worst_statements(limit)
+    if reset:
+        slow_query_log.reset()
+    return {
+        "threshold_ms": settings.slow_query_threshold_ms,
+        "statements": worst,
+    }
+
+
+@app.get("/admin/questions/hardest")
+async def admin_hardest_questions(
+    token: str = Query(...),
+    country: str = Query(...),
+    language: str = Query(...),
+    topic: Optional[str] = Query(None),
+    min_attempts: int = Query(20, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """Questions with the lowest share of correct answers, from question_stats."""
+    _require_admin_token(token)
+    return {
+        "questions": await crud_question_stats.get_hardest_questions(
+            db, country.lower(), language.lower(), topic, min_attempts, limit
+        ),
+    }
+
+
+@app.post("/admin/due-histogram/rebuild")
+async def admin_rebuild_due_histogram(
+    token: str = Query(...),
+    user_id: Optional[UUID] = Query(None, description="Rebuild one user; all users if omitted"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Rebuild due histograms from user_progress (after bulk edits or suspected drift)."""
+    _require_admin_token(token)
+    await rebuild_due_histogram(db, user_id)
+    await db.commit()
+    return {"ok": True, "user_id": user_id}
+
+
+@app.post("/admin/exam-counters/rebuild")
+async def admin_rebuild_exam_counters(
+    token: str = Query(...),
+    user_id: Optional[UUID] = Query(None, description="Rebuild one user; all users if omitted"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Rebuild answered/correct exam counters from user_progress (e.g. after moving questions between exams)."""
+    _require_admin_token(token)
+    await rebuild_exam_counters(db, user_id)
+    await db.commit()
+    return {"ok": True, "user_id": user_id}
+
+
+@app.post("/admin/catalog/bump")
+async def admin_bump_catalog(
+    token: str = Query(...),
+    db: AsyncSession = Depends(get_db),
+):
+    """Bump the catalog version after manual question edits so all workers refresh caches."""
+    _require_admin_token(token)
+    version = await bump_catalog_version(db)
+    await db.commit()
+    set_catalog_version(version)
+    return {"ok": True, "catalog_version": version}
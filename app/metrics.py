@@ -0,0 +1,237 @@
+"""In-process metrics registry rendered in the Prometheus text exposition format.
+
+Keeps everything in memory of the current worker process, so no external
+collector (or prometheus-client) is needed: scrape ``GET /metrics`` directly.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+DB_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        bucket_names = self.labelnames + ("le",)
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                labels = _format_labels(bucket_names, key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {_format_value(count)}"
+            labels = _format_labels(bucket_names, key + ("+Inf",))
+            yield f"{self.name}_bucket{labels} {_format_value(state[-1])}"
+            plain = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{plain} {_format_value(state[-2])}"
+            yield f"{self.name}_count{plain} {_format_value(state[-1])}"
+
+
+class Registry:
+    """Collection of metrics plus hooks that refresh gauges right before a scrape."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collect_hooks: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collect_hook(self, hook: Callable[[], None]) -> None:
+        self._collect_hooks.append(hook)
+
+    def render(self) -> str:
+        for hook in self._collect_hooks:
+            try:
+                hook()
+            except Exception:
+                # A broken hook must never take the whole scrape down
+                pass
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# HTTP
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status.",
+    ("method", "route", "status"),
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route"),
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed.",
+    ("method",),
+))
+
+# Database
+DB_STATEMENTS = REGISTRY.register(Counter(
+    "db_statements_total", "SQL statements executed, by engine and statement kind.",
+    ("engine", "operation"),
+))
+DB_STATEMENT_ERRORS = REGISTRY.register(Counter(
+    "db_statement_errors_total", "SQL statements that raised an error.",
+    ("engine", "operation"),
+))
+DB_STATEMENT_LATENCY = REGISTRY.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time.",
+    ("engine", "operation"), buckets=DB_LATENCY_BUCKETS,
+))
+DB_POOL_CHECKOUT_WAIT = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.",
+    ("engine",), buckets=DB_LATENCY_BUCKETS,
+))
+DB_POOL_CONNECTIONS = REGISTRY.register(Gauge(
+    "db_pool_connections", "Connections in the client-side pool by state.",
+    ("engine", "state"),
+))
+
+# Telegram
+TELEGRAM_SEND_LATENCY = REGISTRY.register(Histogram(
+    "telegram_send_duration_seconds", "Latency of bot.send_message calls.",
+    ("outcome",),
+))
+TELEGRAM_SENDS = REGISTRY.register(Counter(
+    "telegram_sends_total", "Bot messages by outcome (sent, blocked, error).",
+    ("outcome",),
+))
+
+
+def statement_operation(statement: str) -> str:
+    """Return a low-cardinality label for a SQL statement (SELECT, INSERT, ...)."""
+    head = statement.lstrip().split(None, 1)
+    verb = head[0].upper() if head else ""
+    if verb in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"):
+        return verb
+    return "OTHER"
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -1,5 +1,5 @@
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, Integer, Boolean, DateTime, Text, ForeignKey, JSON, BigInteger, Date
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy import Column, Integer, Boolean, DateTime, Text, ForeignKey, BigInteger, Date, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -22,13 +22,89 @@ class Question(Base):
     __tablename__ = "questions"
 
     id = Column(Integer, primary_key=True, index=True)
-    data = Column(JSON, nullable=False)
+    data = Column(JSONB, nullable=False)
     topic = Column(Text, nullable=False)
     country = Column(Text, nullable=False)
     language = Column(Text, nullable=False)
+    # Версия каталога, в которой вопрос добавлен или изменён (для дельта-синхронизации)
+    updated_version = Column(BigInteger, nullable=False, default=0)
+    # Версия каталога, в которой вопрос убран из банка; строка остаётся ради user_progress,
+    # но в выдачу, банк экзамена и каталог не попадает (NULL — действующий вопрос)
+    retired_version = Column(BigInteger, nullable=True)
 
     user_progress = relationship("UserProgress", back_populates="question")
 
+    __table_args__ = (
+        Index("ix_questions_exam_updated_version", "country", "language", "updated_version"),
+    )
+
+
+class QuestionTombstone(Base):
+    __tablename__ = "question_tombstones"
+
+    # Удалённые из каталога вопросы: клиенты с локальной копией банка удаляют их у себя
+    question_id = Column(Integer, primary_key=True)
+    country = Column(Text, nullable=False)
+    language = Column(Text, nullable=False)
+    deleted_version = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_question_tombstones_exam_version", "country", "language", "deleted_version"),
+    )
+
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    # Единственная строка id=1; version увеличивается при каждом импорте вопросов
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class QuestionStats(Base):
+    __tablename__ = "question_stats"
+
+    # Глобальная статистика ответов на вопрос; ведётся инкрементально из answer_history
+    question_id = Column(Integer, primary_key=True)
+    attempts = Column(BigInteger, nullable=False, default=0)
+    correct = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class QuestionStatsWatermark(Base):
+    __tablename__ = "question_stats_watermark"
+
+    # Единственная строка id=1: до какого answer_history.id статистика уже учтена
+    id = Column(Integer, primary_key=True)
+    last_answer_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class UserDueHistogram(Base):
+    __tablename__ = "user_due_histogram"
+
+    # Сколько вопросов экзамена у пользователя к повторению в каждый день (UTC);
+    # поддерживается дельтами при записи ответов, см. app/crud/due_histogram.py
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    country = Column(Text, primary_key=True)
+    language = Column(Text, primary_key=True)
+    due_day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class UserExamCounters(Base):
+    __tablename__ = "user_exam_counters"
+
+    # Отвечено / верно по экзамену пользователя; поддерживается дельтами при записи
+    # ответов, см. app/crud/exam_counters.py
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    country = Column(Text, primary_key=True)
+    language = Column(Text, primary_key=True)
+    answered = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
@@ -0,0 +1,108 @@
+"""One dedicated asyncpg LISTEN connection per process.
+
+Modules subscribe handlers to Postgres notification channels before startup;
+the listener keeps the connection alive, reconnects with backoff when it
+drops, and runs the registered reconnect callbacks after every (re)connect so
+subscribers can resynchronize whatever they might have missed meanwhile.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 30.0
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def asyncpg_dsn(url: str) -> str:
+    """DSN для прямого asyncpg.connect из SQLAlchemy-style URL."""
+    for prefix in ("postgresql+asyncpg://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql://" + url[len(prefix):]
+    return url
+
+
+class PgListener:
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._reconnect_callbacks: List[Callable[[], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[asyncpg.Connection] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Register ``handler(payload)`` for a channel (takes effect on the next connect)."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_reconnect(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine run after every successful (re)connect."""
+        self._reconnect_callbacks.append(callback)
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="pg-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _dispatch(self, connection, pid, channel, payload) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.warning(f"Handler for channel {channel} failed: {e}")
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                self._conn = await asyncpg.connect(self.dsn, statement_cache_size=0)
+                lost = asyncio.Event()
+                self._conn.add_termination_listener(lambda conn: lost.set())
+                for channel in self._handlers:
+                    await self._conn.add_listener(channel, self._dispatch)
+                logger.info(f"LISTEN connection established for {list(self._handlers)}")
+                for callback in self._reconnect_callbacks:
+                    await callback()
+                backoff = 1.0
+
+                # Тихий обрыв соединения termination listener может не заметить — пингуем
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        await self._conn.execute("SELECT 1", timeout=KEEPALIVE_SECONDS)
+                logger.warning("LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"LISTEN connection error: {e}; retrying in {backoff:.0f}s")
+            finally:
+                if self._conn is not None and not self._conn.is_closed():
+                    try:
+                        await self._conn.close(timeout=5)
+                    except Exception:
+                        self._conn.terminate()
+                self._conn = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+
+# LISTEN не работает через pgbouncer/Supavisor в transaction mode —
+# для него нужен прямой или session-mode URL (LISTEN_DATABASE_URL)
+listener = PgListener(asyncpg_dsn(settings.listen_database_url or settings.database_url))
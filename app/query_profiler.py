@@ -0,0 +1,119 @@
+"""Request-scoped SQL profiler with N+1 detection.
+
+Every statement executed through the instrumented engines is attributed to the
+``QueryProfile`` active in the current context (one per HTTP request, see the
+middleware in ``app/main.py``). Statements are grouped by *shape* — SQL text
+with literals and bind parameters collapsed — so a loop issuing the same query
+for different ids shows up as one shape with a high count.
+"""
+from __future__ import annotations
+
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.database import add_statement_observer
+
+_current_profile: ContextVar[Optional["QueryProfile"]] = ContextVar("query_profile", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"\$\d+|%\(\w+\)s|(?<![:\w]):\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize SQL so that calls differing only in parameters compare equal."""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _BIND_PARAM.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryProfile:
+    """Statement counters collected while the profile is active."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Dict[str, List[float]] = {}
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_time += elapsed
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """Shapes executed at least ``threshold`` times, worst first."""
+        offenders = [
+            (shape, int(count), total)
+            for shape, (count, total) in self.shapes.items()
+            if count >= threshold
+        ]
+        offenders.sort(key=lambda item: (item[1], item[2]), reverse=True)
+        return offenders
+
+    def top(self, limit: int = 3) -> List[Tuple[str, int, float]]:
+        """Most expensive shapes by total time."""
+        items = [(shape, int(count), total) for shape, (count, total) in self.shapes.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return items[:limit]
+
+    def server_timing(self) -> str:
+        """Value for the ``Server-Timing`` response header."""
+        return f'db;dur={self.total_time * 1000:.1f};desc="{self.count} queries"'
+
+
+def _observe_statement(engine_label, statement, parameters, elapsed) -> None:
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+
+
+add_statement_observer(_observe_statement)
+
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    """Collect every statement executed in the current context into a QueryProfile."""
+    profile = QueryProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def format_offenders(offenders: List[Tuple[str, int, float]]) -> str:
+    return "; ".join(
+        f"{count}x {total * 1000:.1f}ms {shape[:200]}" for shape, count, total in offenders
+    )
+
+
+@contextmanager
+def assert_max_queries(max_count: Optional[int] = None, repeat_threshold: Optional[int] = None) -> Iterator[QueryProfile]:
+    """
+    Assertion helper for tests: fails if the wrapped block runs more than
+    ``max_count`` statements or repeats one statement shape ``repeat_threshold``
+    or more times (the N+1 signature).
+    """
+    with profile_queries() as profile:
+        yield profile
+    if max_count is not None and profile.count > max_count:
+        raise AssertionError(
+            f"Expected at most {max_count} queries, got {profile.count}: "
+            f"{format_offenders(profile.top(5))}"
+        )
+    if repeat_threshold is not None:
+        offenders = profile.repeated(repeat_threshold)
+        if offenders:
+            raise AssertionError(f"Repeated statement shapes (N+1): {format_offenders(offenders)}")
@@ -0,0 +1,126 @@
+"""Pre-serialized response cache with strong ETags for catalog-like endpoints.
+
+Bodies are stored as the exact bytes sent to the client, keyed by route and
+parameters plus the catalog version, so a hit skips SQL and pydantic
+serialization entirely. ``If-None-Match`` is answered with ``304``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+from app import invalidation
+from app.catalog import get_catalog_version, on_catalog_change
+from app.config import settings
+
+MAX_ENTRIES = 10_000
+
+CATALOG_CACHE_CONTROL = f"public, max-age={settings.catalog_cache_max_age}"
+# Пользовательские данные: браузер хранит, но всегда перепроверяет по ETag
+USER_CACHE_CONTROL = "private, no-cache"
+
+_entries: "OrderedDict[Tuple[Hashable, ...], Tuple[bytes, str]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _encode(payload: Any) -> bytes:
+    # Те же параметры, что у fastapi.responses.JSONResponse
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Для If-None-Match используется слабое сравнение: W/"x" совпадает с "x"
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _get(key: Tuple[Hashable, ...]) -> Optional[Tuple[bytes, str]]:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+        return entry
+
+
+def _put(key: Tuple[Hashable, ...], entry: Tuple[bytes, str]) -> None:
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+async def cached_response(
+    request: Request,
+    key: Tuple[Hashable, ...],
+    build: Callable[[], Awaitable[Any]],
+    cache_control: str = CATALOG_CACHE_CONTROL,
+) -> Response:
+    """
+    Return the cached body for ``key`` (building and storing it on a miss),
+    or ``304 Not Modified`` when the client already holds the same ETag.
+    """
+    full_key = (get_catalog_version(),) + tuple(key)
+    entry = _get(full_key)
+    if entry is None:
+        body = _encode(await build())
+        entry = (body, _etag(body))
+        _put(full_key, entry)
+
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def invalidate(predicate: Callable[[Tuple[Hashable, ...]], bool]) -> None:
+    """Drop entries whose key (without the leading catalog version) matches."""
+    with _lock:
+        for full_key in [k for k in _entries if predicate(k[1:])]:
+            del _entries[full_key]
+
+
+def invalidate_user(user_id) -> None:
+    """Drop cached responses that embed the given user's data."""
+    user_key = str(user_id)
+    invalidate(lambda key: len(key) > 1 and key[1] == user_key)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def invalidate_exam(country: str, language: str) -> None:
+    """Drop cached responses derived from one exam's questions."""
+    invalidate(lambda key: key[0] == "topics" and key[1:3] == (country, language))
+    # Списки стран/языков зависят от всего каталога
+    invalidate(lambda key: key[0] in ("countries", "languages"))
+
+
+on_catalog_change(lambda version: clear())
+invalidation.subscribe("user", invalidate_user)
+invalidation.subscribe("catalog", invalidate_exam)
+invalidation.on_flush(clear)
@@ -1,23 +1,38 @@
+import json
 import logging
+import zlib
 from datetime import date, datetime, timedelta
 from sqlalchemy import text
-from fastapi import APIRouter, Depends, Query, HTTPException, status, Body
+from fastapi import APIRouter, Depends, Query, Header, HTTPException, Request, Response, status, Body
 from typing import List, Optional, Dict
 from uuid import UUID
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import ReadSessionLocal, get_db, get_read_db, read_session_factory
 from app.schemas import (
     QuestionOut, AnswerSubmit, BatchAnswersSubmit, BatchAnswerItem, UserProgressOut, UserCreate, UserOut, 
     TopicsOut, UserStatsOut, UserSettingsUpdate, ExamSettingsUpdate, ExamSettingsResponse,
-    DailyProgressOut
+    DailyProgressOut, BootstrapOut, SubmitAndNextRequest, SubmitAndNextOut, DueForecastOut,
+    TopicsStatsOut, ExamTicketSubmit, ExamTicketResultOut, UserBatchAnswersSubmit,
 )
-from app.crud.question import fetch_questions_for_user, get_distinct_countries, get_distinct_languages, fetch_topics
+from app.crud.question import (
+    fetch_questions_for_user, get_distinct_countries, get_distinct_languages, fetch_topics, stream_catalog_ndjson,
+)
+from app.crud.question import get_remaining_questions_count as count_remaining_questions
 from app.crud import user_progress as crud_progress
 from app.crud import user as crud_user
+from app.crud import due_histogram
+from app.crud import exam_ticket
+from app.crud.adaptive import encode_question_list, get_exam_bank
+from app.crud import session_cursor
+from app.tokens import InvalidToken
+from app import response_cache
 
 logger = logging.getLogger("api")
 PREFIX = ""
+EXAM_TICKET_HEADER = "X-Exam-Ticket"
+SESSION_CURSOR_HEADER = "X-Session-Cursor"
 
 users_router = APIRouter(
     prefix="/users",
@@ -28,41 +43,41 @@ users_router = APIRouter(
 async def get_answers_by_day(
     user_id: UUID,
     days: int = Query(7, ge=1, le=30, description="Сколько дней вернуть"),
-    db: AsyncSession = Depends(get_db),
 ):
     """Возвращает массив по последним N дням: дата, total, correct, incorrect"""
-    today = date.today()
-    days_list = [(today - timedelta(days=i)) for i in range(1, days+1)]
-    days_list.reverse()  # от старых к новым
-
-    # SQL: сгруппировать по дням
-    sql = text("""
-        SELECT DATE(answered_at) AS answer_date,
-               COUNT(*) AS total_answers,
-               COUNT(*) FILTER (WHERE is_correct) AS correct_answers,
-               COUNT(*) FILTER (WHERE NOT is_correct) AS incorrect_answers
-        FROM answer_history
-        WHERE user_id = :user_id
-          AND answered_at >= :start_date
-        GROUP BY answer_date
-    """)
-    result = await db.execute(sql, {"user_id": str(user_id), "start_date": days_list[0]})
-    rows = {str(row.answer_date): {
-        "total_answers": row.total_answers,
-        "correct_answers": row.correct_answers,
-        "incorrect_answers": row.incorrect_answers
-    } for row in result}
-
-    # Собираем массив с нулями для пропущенных дней
-    out = []
-    for d in days_list:
-        d_str = d.isoformat()
-        day_data = rows.get(d_str, {"total_answers": 0, "correct_answers": 0, "incorrect_answers": 0})
-        out.append({
-            "date": d_str,
-            **day_data
-        })
-    return out
+    async with read_session_factory(user_id)() as db:
+        today = date.today()
+        days_list = [(today - timedelta(days=i)) for i in range(1, days+1)]
+        days_list.reverse()  # от старых к новым
+
+        # SQL: сгруппировать по дням
+        sql = text("""
+            SELECT DATE(answered_at) AS answer_date,
+                   COUNT(*) AS total_answers,
+                   COUNT(*) FILTER (WHERE is_correct) AS correct_answers,
+                   COUNT(*) FILTER (WHERE NOT is_correct) AS incorrect_answers
+            FROM answer_history
+            WHERE user_id = :user_id
+              AND answered_at >= :start_date
+            GROUP BY answer_date
+        """)
+        result = await db.execute(sql, {"user_id": str(user_id), "start_date": days_list[0]})
+        rows = {str(row.answer_date): {
+            "total_answers": row.total_answers,
+            "correct_answers": row.correct_answers,
+            "incorrect_answers": row.incorrect_answers
+        } for row in result}
+
+        # Собираем массив с нулями для пропущенных дней
+        out = []
+        for d in days_list:
+            d_str = d.isoformat()
+            day_data = rows.get(d_str, {"total_answers": 0, "correct_answers": 0, "incorrect_answers": 0})
+            out.append({
+                "date": d_str,
+                **day_data
+            })
+        return out
 
 questions_router = APIRouter(
     prefix=f"{PREFIX}/questions",
@@ -74,63 +89,156 @@ user_progress_router = APIRouter(
 )
 
 @questions_router.get("/countries", response_model=List[str])
-async def list_countries(db: AsyncSession = Depends(get_db)):
-    return await get_distinct_countries(db)
+async def list_countries(request: Request, db: AsyncSession = Depends(get_read_db)):
+    return await response_cache.cached_response(
+        request, ("countries",), lambda: get_distinct_countries(db)
+    )
 
 @questions_router.get("/languages", response_model=List[str])
-async def list_languages(db: AsyncSession = Depends(get_db)):
-    return await get_distinct_languages(db)
+async def list_languages(request: Request, db: AsyncSession = Depends(get_read_db)):
+    return await response_cache.cached_response(
+        request, ("languages",), lambda: get_distinct_languages(db)
+    )
 
 @questions_router.get("/remaining-count")
 async def get_remaining_questions_count(
     user_id: UUID = Query(..., description="Internal user UUID"),
     country: str = Query(..., description="Exam country code"),
     language: str = Query(..., description="Exam language code"),
-    db: AsyncSession = Depends(get_db),
 ):
     """Get count of questions user still needs to answer correctly"""
-    try:
-        user = await crud_user.get_user_by_id(db, user_id)
-        if user is None:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        from app.crud.question import get_remaining_questions_count
-        remaining_count = await get_remaining_questions_count(
-            db=db,
-            user_id=user_id,
-            country=country,
-            language=language
-        )
+    async with read_session_factory(user_id)() as db:
+        try:
+            user = await crud_user.get_user_by_id(db, user_id)
+            if user is None:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            remaining_count = await count_remaining_questions(
+                db=db,
+                user_id=user_id,
+                country=country,
+                language=language
+            )
         
-        return {"remaining_count": remaining_count}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error getting remaining questions count: {e}")
-        raise HTTPException(status_code=500, detail="Error getting remaining questions count")
+            return {"remaining_count": remaining_count}
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting remaining questions count: {e}")
+            raise HTTPException(status_code=500, detail="Error getting remaining questions count")
+
+async def _next_question_ids(
+    db: AsyncSession,
+    user_id: UUID,
+    country: str,
+    language: str,
+    mode: str,
+    batch_size: int,
+    topics: Optional[List[str]],
+    cursor: Optional[str] = None,
+) -> tuple[list, dict]:
+    """Id следующего пакета и заголовки ответа (токен билета / курсор сессии); общий для /questions и bootstrap"""
+    if mode == "exam":
+        # Билет целиком (batch_size не используется); токен для сдачи — в заголовке
+        ticket = await exam_ticket.issue_ticket(db, user_id, country, language)
+        return ticket.ids, {EXAM_TICKET_HEADER: ticket.token, "Cache-Control": "no-store"}
+    if mode == "new_only" or (mode == "topics" and topics):
+        # Перемешанная один раз перестановка; следующий пакет — по курсору, без повторов
+        try:
+            page = await session_cursor.next_page(
+                db, user_id, country, language, mode, batch_size, topics=topics, cursor=cursor,
+            )
+        except InvalidToken:
+            raise HTTPException(status_code=400, detail="Invalid session cursor")
+        headers = {"Cache-Control": "no-store"}
+        if page.cursor:
+            headers[SESSION_CURSOR_HEADER] = page.cursor
+        return page.ids, headers
+    ids = await fetch_questions_for_user(
+        db=db,
+        user_id=user_id,
+        country=country,
+        language=language,
+        mode=mode,
+        batch_size=batch_size,
+        topics=topics,
+        ids_only=True,
+    )
+    return list(ids), {}
 
-@questions_router.get("/", response_model=List[QuestionOut])
+@questions_router.get(
+    "/",
+    response_model=List[QuestionOut],
+    responses={200: {
+        "description": "Questions (or their ids with ids_only=true)",
+        "headers": {
+            EXAM_TICKET_HEADER: {"description": "Ticket token to submit (mode=exam)", "schema": {"type": "string"}},
+            SESSION_CURSOR_HEADER: {
+                "description": "Cursor for the next batch (new_only, topics); absent when the session is over",
+                "schema": {"type": "string"},
+            },
+        },
+    }},
+)
 async def get_questions(
     user_id: UUID = Query(..., description="Internal user UUID"),
-    mode: str = Query(..., description="Mode: interval_all, new_only, incorrect, topics"),
+    mode: str = Query(..., description="Mode: interval_all, new_only, incorrect, topics, adaptive, exam"),
     country: str = Query(..., description="Exam country code"),
     language: str = Query(..., description="Exam language code"),
     topics: Optional[List[str]] = Query(None, alias="topic", description="Optional topic filter"),
     batch_size: int = Query(30, ge=1, le=50, description="Number of questions to fetch"),
-    db: AsyncSession = Depends(get_db),
+    ids_only: bool = Query(False, description="Return only question ids (client holds the catalog locally)"),
+    cursor: Optional[str] = Header(
+        None, alias=SESSION_CURSOR_HEADER,
+        description="Session cursor echoed back from the previous response's header (new_only, topics)",
+    ),
 ):
-    user = await crud_user.get_user_by_id(db, user_id)
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+    async with read_session_factory(user_id)() as db:
+        user = await crud_user.get_user_by_id(db, user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        country = (user.exam_country or country).lower()
+        language = (user.exam_language or language).lower()
 
-    return await fetch_questions_for_user(
-        db=db,
-        user_id=user_id,
-        country=user.exam_country or country,
-        language=user.exam_language or language,
-        mode=mode,
-        batch_size=batch_size,
-        topics=topics,
+        ids, headers = await _next_question_ids(db, user_id, country, language, mode, batch_size, topics, cursor)
+        if ids_only:
+            return JSONResponse(ids, headers=headers)
+        # Тела — склейкой заранее закодированных байтов из кэша банка: схема QuestionOut
+        # проверена при построении банка, а не на каждый запрос
+        bank = await get_exam_bank(db, country, language)
+        body = await encode_question_list(db, bank, country, language, ids)
+        return Response(body, media_type="application/json", headers=headers)
+
+async def _catalog_body(country: str, language: str, since_version: Optional[int], compress: bool):
+    # Своя сессия: зависимости с yield закрываются до отправки тела StreamingResponse
+    gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    async with ReadSessionLocal() as db:
+        async for chunk in stream_catalog_ndjson(db, country, language, since_version):
+            if gz is None:
+                yield chunk
+            else:
+                data = gz.compress(chunk)
+                if data:
+                    yield data
+    if gz is not None:
+        yield gz.flush()
+
+@questions_router.get("/catalog")
+async def get_question_catalog(
+    request: Request,
+    country: str = Query(..., description="Exam country code"),
+    language: str = Query(..., description="Exam language code"),
+    since_version: Optional[int] = Query(None, ge=0, description="Catalog version the client already has"),
+):
+    """Stream the question bank (or changes since a version) as NDJSON, gzip-compressed when accepted"""
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _catalog_body(country.lower(), language.lower(), since_version, compress),
+        media_type="application/x-ndjson",
+        headers=headers,
     )
 
 @user_progress_router.post("/submit_answer", response_model=UserProgressOut, status_code=status.HTTP_201_CREATED)
@@ -150,49 +258,52 @@ async def save_user_progress(
 
 @user_progress_router.post("/submit_answers", response_model=UserStatsOut, status_code=status.HTTP_201_CREATED)
 async def save_user_answers_batch(
-    batch_data: BatchAnswersSubmit,
+    batch_data: UserBatchAnswersSubmit,
     db: AsyncSession = Depends(get_db),
 ):
+    user_id = batch_data.user_id
     try:
-        # Обрабатываем все ответы в батче
-        processed_count = 0
-        for answer_data in batch_data.answers:
-            # Создаем полный объект AnswerSubmit 
-            full_answer = AnswerSubmit(
-                user_id=batch_data.user_id,
-                question_id=answer_data.question_id,
-                is_correct=answer_data.is_correct,
-                timestamp=answer_data.timestamp
-            )
-            
-            # Проверяем дедупликацию по timestamp (если есть)
-            if answer_data.timestamp:
-                # Можно добавить проверку на дубли в БД, пока пропускаем
-                pass
-                
-            await crud_progress.create_or_update_progress(db, full_answer)
-            processed_count += 1
-            
+        # Все ответы — набором запросов в одной транзакции, с дедупликацией по timestamp
+        ingested = await crud_progress.ingest_answers(db, user_id, batch_data.answers)
+        await db.commit()
+        logger.info(f"Processed {ingested.processed} answers for user {user_id}, {ingested.skipped} duplicates skipped")
+
         # Возвращаем обновленную статистику пользователя
-        stats = await crud_user.get_user_stats(db, batch_data.user_id)
-        logger.info(f"Processed {processed_count} answers for user {batch_data.user_id}")
-        return stats
-        
+        return await crud_user.get_user_stats(db, user_id)
+
+    except HTTPException:
+        raise
     except Exception as e:
+        await db.rollback()
         import traceback
         tb = "".join(traceback.format_exception(type(e), e, e.__traceback__))
-        logger.error(f"[save_user_answers_batch] Unhandled exception:\n{tb}")
+        logger.error(f"[save_user_answers_batch] Unhandled exception, rolling back:\n{tb}")
         raise HTTPException(status_code=500, detail="Internal server error, see logs for details")
 
 
 @users_router.get("/{user_id}/stats", response_model=UserStatsOut, status_code=status.HTTP_200_OK)
-async def user_stats_endpoint(user_id: UUID, db: AsyncSession = Depends(get_db)):
-    try:
-        stats = await crud_user.get_user_stats(db, user_id)
-        return stats
-    except Exception as e:
-        logger.error(f"Error getting user stats: {e}")
-        raise HTTPException(status_code=404, detail="User not found or error getting stats")
+async def user_stats_endpoint(user_id: UUID):
+    async with read_session_factory(user_id)() as db:
+        try:
+            stats = await crud_user.get_user_stats(db, user_id)
+            return stats
+        except Exception as e:
+            logger.error(f"Error getting user stats: {e}")
+            raise HTTPException(status_code=404, detail="User not found or error getting stats")
+
+@users_router.get("/{user_id}/topics/stats", response_model=TopicsStatsOut)
+async def user_topic_stats_endpoint(
+    user_id: UUID,
+    request: Request,
+):
+    """Per-topic mastery for the user's exam; cached until the user's next write"""
+    async with read_session_factory(user_id)() as db:
+        async def build():
+            return TopicsStatsOut(topics=await crud_user.get_topic_stats(db, user_id))
+
+        return await response_cache.cached_response(
+            request, ("topic_stats", str(user_id)), build, cache_control=response_cache.USER_CACHE_CONTROL,
+        )
 
 @users_router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED)
 async def upsert_user_endpoint(user: UserCreate, db: AsyncSession = Depends(get_db)):
@@ -269,15 +380,15 @@ async def set_exam_settings(
         if final_exam_date is not None:
             days_until_exam = (final_exam_date - date.today()).days
 
-            # Рассчитываем recommended_daily_goal только если обновляется exam_date
-            # Если меняется только daily_goal, пропускаем медленный запрос
-            if settings.exam_date is not None and updated_user.exam_country and updated_user.exam_language:
-                total_questions = await crud_user.get_total_questions(
+            # Рекомендуемая цель — оставшиеся вопросы на оставшиеся дни (счётчики, без сканирования)
+            if updated_user.exam_country and updated_user.exam_language:
+                remaining = await count_remaining_questions(
                     db,
+                    user_id,
                     updated_user.exam_country,
                     updated_user.exam_language
                 )
-                recommended_daily_goal = max(1, total_questions // max(1, days_until_exam))
+                recommended_daily_goal = max(1, remaining // max(1, days_until_exam))
         
         return ExamSettingsResponse(
             exam_date=final_exam_date,
@@ -294,9 +405,20 @@ async def set_exam_settings(
 @users_router.get("/{user_id}/exam-settings", response_model=ExamSettingsResponse)
 async def get_exam_settings(
     user_id: UUID,
+    request: Request,
     db: AsyncSession = Depends(get_db),
 ):
     """Get user's exam settings"""
+    # days_until_exam зависит от текущей даты, поэтому она входит в ключ кэша
+    return await response_cache.cached_response(
+        request,
+        ("exam_settings", str(user_id), date.today().isoformat()),
+        lambda: _build_exam_settings(db, user_id),
+        cache_control=response_cache.USER_CACHE_CONTROL,
+    )
+
+
+async def _build_exam_settings(db: AsyncSession, user_id: UUID) -> ExamSettingsResponse:
     try:
         user = await crud_user.get_user_by_id(db, user_id)
         if not user:
@@ -308,12 +430,13 @@ async def get_exam_settings(
         if user.exam_date:
             days_until_exam = (user.exam_date - date.today()).days
             if user.exam_country and user.exam_language:
-                total_questions = await crud_user.get_total_questions(
+                remaining = await count_remaining_questions(
                     db,
+                    user_id,
                     user.exam_country,
                     user.exam_language
                 )
-                recommended_daily_goal = max(1, total_questions // max(1, days_until_exam))
+                recommended_daily_goal = max(1, remaining // max(1, days_until_exam))
         
         return ExamSettingsResponse(
             exam_date=user.exam_date,
@@ -342,17 +465,86 @@ async def get_daily_progress_endpoint(
         logger.error(f"Error getting daily progress for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Error getting daily progress")
 
+@users_router.get("/{user_id}/due-forecast", response_model=DueForecastOut)
+async def get_due_forecast_endpoint(
+    user_id: UUID,
+    days: int = Query(7, ge=1, le=60, description="Сколько дней вперёд"),
+):
+    """Upcoming reviews per day for the user's exam, from the per-user due histogram"""
+    async with read_session_factory(user_id)() as db:
+        user = await crud_user.get_user_by_id(db, user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if not (user.exam_country and user.exam_language):
+            return {"due_now": 0, "days": []}
+        return await due_histogram.get_due_forecast(
+            db, user_id, user.exam_country.lower(), user.exam_language.lower(), days
+        )
+
+@users_router.get("/{user_id}/bootstrap", response_model=BootstrapOut)
+async def bootstrap_endpoint(
+    user_id: UUID,
+    response: Response,
+    mode: str = Query("interval_all", description="Mode of the first question batch"),
+    topics: Optional[List[str]] = Query(None, alias="topic", description="Optional topic filter"),
+    batch_size: int = Query(30, ge=1, le=50, description="Number of questions to fetch"),
+    ids_only: bool = Query(False, description="Return only question ids (client holds the catalog locally)"),
+):
+    """Everything the Mini App needs on launch in one round trip; a failed part is reported in errors"""
+    async with read_session_factory(user_id)() as db:
+        user = await crud_user.get_user_by_id(db, user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        async def first_batch(db):
+            country, language = user.exam_country.lower(), user.exam_language.lower()
+            ids, headers = await _next_question_ids(db, user_id, country, language, mode, batch_size, topics)
+            response.headers.update(headers)
+            if ids_only:
+                return ids
+            bank = await get_exam_bank(db, country, language)
+            return json.loads(await encode_question_list(db, bank, country, language, ids))
+
+        parts = {
+            "stats": lambda db: crud_user.get_user_stats(db, user_id),
+            "daily_progress": lambda db: crud_user.get_daily_progress(db, user_id),
+            "exam_settings": lambda db: _build_exam_settings(db, user_id),
+        }
+        if user.exam_country and user.exam_language:
+            parts["topics"] = lambda db: fetch_topics(db, user.exam_country.lower(), user.exam_language.lower())
+            # Первый пакет — тем же путём, что и /questions/ (курсор сессии, билет exam)
+            parts["question_ids" if ids_only else "questions"] = first_batch
+
+        # Части — по очереди на одном соединении: параллельный запуск занимал по соединению
+        # пула на часть и под нагрузкой исчерпывал пул. Каждая часть — в своей точке сохранения,
+        # чтобы ошибка одной не ломала транзакцию остальным.
+        out = {"user": user, "errors": {}}
+        for name, part in parts.items():
+            try:
+                async with db.begin_nested():
+                    out[name] = await part(db)
+            except Exception as e:
+                logger.error(f"Bootstrap part '{name}' failed for user {user_id}: {e}")
+                out["errors"][name] = e.detail if isinstance(e, HTTPException) else "unavailable"
+        return out
+
 
 topics_router = APIRouter(tags=["topics"])
 
 @topics_router.get("/topics", response_model=TopicsOut)
 async def get_topics(
+    request: Request,
     country: str = Query(..., description="Country code, e.g. AM"),
     language: str = Query(..., description="Language code, e.g. ru"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    topics = await fetch_topics(db, country, language)
-    return TopicsOut(topics=topics)
+    # Ключ в нижнем регистре — как в событиях инвалидации экзамена от импорта
+    country, language = country.lower(), language.lower()
+
+    async def build():
+        return TopicsOut(topics=await fetch_topics(db, country, language))
+
+    return await response_cache.cached_response(request, ("topics", country, language), build)
 
 @users_router.post("/{user_id}/submit_answers", response_model=UserStatsOut, status_code=status.HTTP_201_CREATED)
 async def submit_answers(
@@ -362,57 +554,108 @@ async def submit_answers(
 ):
     """Submit multiple answers at once with deduplication support"""
     try:
-        processed_answers = 0
-        skipped_answers = 0
-        
         logger.info(f"🚀 Starting batch submission for user {user_id}, {len(answers_data.answers)} answers received")
-        
-        # Обрабатываем все ответы в одной транзакции
-        for i, answer_data in enumerate(answers_data.answers):
-            logger.info(f"📝 Processing answer {i+1}/{len(answers_data.answers)}: question_id={answer_data.question_id}, is_correct={answer_data.is_correct}, timestamp={answer_data.timestamp}")
-            
-            # Обеспечиваем что timestamp не None (если None, используем текущее время)
-            timestamp = answer_data.timestamp or int(datetime.now().timestamp() * 1000)
-            
-            # Проверяем дедупликацию по question_id + timestamp
-            if timestamp:
-                # Проверяем, не был ли уже записан этот ответ
-                existing = await crud_progress.check_answer_exists(
-                    db, user_id, answer_data.question_id, timestamp
-                )
-                if existing:
-                    logger.info(f"⏭️ Skipping duplicate answer for question {answer_data.question_id}, timestamp {timestamp}")
-                    skipped_answers += 1
-                    continue
-            
-            # Создаем объект AnswerSubmit для совместимости с существующей логикой
-            # user_id берем из URL параметра /{user_id}/submit_answers
-            answer_submit = AnswerSubmit(
-                user_id=user_id,  # user_id из URL параметра
-                question_id=answer_data.question_id,
-                is_correct=answer_data.is_correct,
-                timestamp=timestamp  # Гарантированно int, не None
-            )
-            
-            # Используем batch версию без commit внутри
-            logger.info(f"💾 Calling create_or_update_progress_batch for question {answer_data.question_id}")
-            await crud_progress.create_or_update_progress_batch(db, answer_submit)
-            processed_answers += 1
-        
-        # Делаем общий commit для всех ответов
-        logger.info(f"🔄 Committing transaction: {processed_answers} processed, {skipped_answers} skipped")
+
+        # Все ответы — набором запросов в одной транзакции
+        ingested = await crud_progress.ingest_answers(db, user_id, answers_data.answers)
         await db.commit()
-        logger.info(f"✅ Successfully committed {processed_answers} answers for user {user_id}")
-        
+        logger.info(f"✅ Committed {ingested.processed} answers for user {user_id}, {ingested.skipped} duplicates skipped")
+
         # Возвращаем обновленную статистику
-        stats = await crud_user.get_user_stats(db, user_id)
-        logger.info(f"📊 Returning stats: {stats}")
-        return stats
-        
+        return await crud_user.get_user_stats(db, user_id)
+
+    except HTTPException:
+        raise
     except Exception as e:
         # Откатываем транзакцию при ошибке
         await db.rollback()
         import traceback
         tb = "".join(traceback.format_exception(type(e), e, e.__traceback__))
         logger.error(f"[submit_answers] Unhandled exception, rolling back:\n{tb}")
-        raise HTTPException(status_code=500, detail="Internal server error, see logs for details")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error, see logs for details")
+
+@users_router.post("/{user_id}/submit_and_next", response_model=SubmitAndNextOut, status_code=status.HTTP_201_CREATED)
+async def submit_and_next(
+    user_id: UUID,
+    payload: SubmitAndNextRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Submit a batch of answers and get the next batch in the same transaction"""
+    user = await crud_user.get_user_by_id(db, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not (user.exam_country and user.exam_language):
+        raise HTTPException(status_code=400, detail="User has no exam selected")
+    country, language = user.exam_country.lower(), user.exam_language.lower()
+
+    try:
+        ingested = await crud_progress.ingest_answers(db, user_id, payload.answers)
+        # Выборка видит только что записанный прогресс; отвеченные в этом пакете исключаем
+        questions = await fetch_questions_for_user(
+            db=db,
+            user_id=user_id,
+            country=country,
+            language=language,
+            mode=payload.mode,
+            batch_size=payload.batch_size,
+            topics=payload.topics,
+            ids_only=payload.ids_only,
+            exclude_ids=[a.question_id for a in payload.answers],
+        )
+        counters = await crud_user.get_study_counters(db, user_id, country, language)
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        import traceback
+        tb = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+        logger.error(f"[submit_and_next] Unhandled exception, rolling back:\n{tb}")
+        raise HTTPException(status_code=500, detail="Internal server error, see logs for details")
+
+    out = {"processed": ingested.processed, "skipped": ingested.skipped, "counters": counters}
+    out["question_ids" if payload.ids_only else "questions"] = questions
+    return out
+
+@users_router.post("/{user_id}/exam-ticket/submit", response_model=ExamTicketResultOut, status_code=status.HTTP_201_CREATED)
+async def submit_exam_ticket(
+    user_id: UUID,
+    payload: ExamTicketSubmit,
+    db: AsyncSession = Depends(get_db),
+):
+    """Grade an exam ticket (mode=exam) on the server and record its answers in one transaction"""
+    try:
+        ticket_ids, max_errors, issued_version = exam_ticket.restore_ticket(user_id, payload.ticket)
+    except InvalidToken as e:
+        raise HTTPException(status_code=409, detail=f"Invalid exam ticket: {e}")
+    foreign = sorted({a.question_id for a in payload.answers} - set(ticket_ids))
+    if foreign:
+        raise HTTPException(status_code=400, detail=f"Questions not in the ticket: {foreign}")
+    try:
+        questions = await exam_ticket.load_ticket_questions(db, ticket_ids, issued_version)
+    except InvalidToken as e:
+        raise HTTPException(status_code=409, detail=f"Invalid exam ticket: {e}")
+
+    # Правильность — по ключу ответа вопроса, а не по флагу клиента; засчитывается последний ответ
+    graded = [
+        BatchAnswerItem(
+            question_id=a.question_id,
+            is_correct=questions[a.question_id].is_correct(a.selected),
+            timestamp=a.timestamp,
+        )
+        for a in payload.answers
+    ]
+    last_answers = {a.question_id: a.is_correct for a in graded}
+    try:
+        ingested = await crud_progress.ingest_answers(db, user_id, graded)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        import traceback
+        tb = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+        logger.error(f"[submit_exam_ticket] Unhandled exception, rolling back:\n{tb}")
+        raise HTTPException(status_code=500, detail="Internal server error, see logs for details")
+
+    result = exam_ticket.score_ticket(questions, ticket_ids, max_errors, last_answers)
+    return {**result, "processed": ingested.processed, "skipped": ingested.skipped}
@@ -0,0 +1,159 @@
+"""Spaced-repetition schedulers working on whole batches of answers.
+
+A scheduler maps review states and answer outcomes to due dates with NumPy,
+so ingesting 30 answers or re-scheduling millions of ``user_progress`` rows
+costs a handful of array operations instead of a Python call per row.
+
+* ``fibonacci`` — the original scheme: interval ``FIB_SEQUENCE[repetition_count]`` days;
+* ``fsrs`` — FSRS-style memory model (stability / retrievability). We don't
+  store stability or difficulty, so stability is estimated from the previous
+  interval and difficulty is the model's default.
+
+The active scheduler comes from the ``SCHEDULER`` setting (``get_scheduler()``).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence, Type
+
+import numpy as np
+
+from app.config import settings
+from app.utils.fib import fib_interval_days
+
+DAY = np.timedelta64(86_400_000_000, "us")
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def datetime_array(values: Sequence[Optional[datetime]]) -> np.ndarray:
+    """Python datetimes (naive UTC или aware) -> datetime64[us], None -> NaT."""
+    return np.array([to_naive_utc(v) if v is not None else None for v in values], dtype="datetime64[us]")
+
+
+@dataclass
+class ReviewStates:
+    """Состояние прогресса до ответа, по строке на ответ."""
+    repetition_count: np.ndarray      # int, 0 для новых вопросов
+    last_interval_days: np.ndarray    # float, next_due_at - last_answered_at; 0 для новых
+    elapsed_days: np.ndarray          # float, сколько прошло с last_answered_at; 0 для новых
+
+    @classmethod
+    def from_columns(cls, repetition_count, last_answered_at, next_due_at, now: datetime) -> "ReviewStates":
+        """Собирает состояния из колонок user_progress (списки или массивы datetime64)."""
+        last = np.asarray(last_answered_at, dtype="datetime64[us]")
+        due = np.asarray(next_due_at, dtype="datetime64[us]")
+        now64 = np.datetime64(to_naive_utc(now), "us")
+        interval = np.nan_to_num((due - last) / DAY, nan=0.0)
+        elapsed = np.nan_to_num((now64 - last) / DAY, nan=0.0)
+        return cls(
+            repetition_count=np.asarray(repetition_count, dtype=np.int64),
+            last_interval_days=np.maximum(interval, 0.0),
+            elapsed_days=np.maximum(elapsed, 0.0),
+        )
+
+
+def advance_repetitions(repetition_count: np.ndarray, outcomes: np.ndarray) -> np.ndarray:
+    """Правильный ответ — следующий уровень, ошибка — сброс в 0 (для всех планировщиков)."""
+    return np.where(outcomes, np.asarray(repetition_count, dtype=np.int64) + 1, 0)
+
+
+class Scheduler:
+    name = ""
+
+    def interval_days(self, states: ReviewStates, outcomes: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def schedule(self, states: ReviewStates, outcomes: np.ndarray, now: datetime) -> np.ndarray:
+        """Даты следующего повторения (datetime64[us], naive UTC) для пакета ответов."""
+        outcomes = np.asarray(outcomes, dtype=bool)
+        interval_us = np.rint(self.interval_days(states, outcomes) * 86_400_000_000).astype(np.int64)
+        return np.datetime64(to_naive_utc(now), "us") + interval_us.astype("timedelta64[us]")
+
+
+class FibonacciScheduler(Scheduler):
+    name = "fibonacci"
+
+    def interval_days(self, states: ReviewStates, outcomes: np.ndarray) -> np.ndarray:
+        return fib_interval_days(advance_repetitions(states.repetition_count, outcomes)).astype(np.float64)
+
+
+class FsrsScheduler(Scheduler):
+    """
+    FSRS-4.5 stability update for binary grades (again / good) with default
+    weights. Stability before the answer is approximated by the previous interval.
+    """
+    name = "fsrs"
+
+    WEIGHTS = (
+        0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+        0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+    )
+    DECAY = -0.5
+    FACTOR = 19 / 81
+
+    def __init__(self, desired_retention: float = 0.9, max_interval_days: float = 36500.0):
+        self.desired_retention = desired_retention
+        self.max_interval_days = max_interval_days
+
+    def interval_days(self, states: ReviewStates, outcomes: np.ndarray) -> np.ndarray:
+        w = self.WEIGHTS
+        is_new = (states.repetition_count == 0) & (states.last_interval_days <= 0)
+        difficulty = w[4]
+        stability = np.maximum(states.last_interval_days, w[0])
+        retrievability = (1 + self.FACTOR * states.elapsed_days / stability) ** self.DECAY
+
+        recall = stability * (
+            1 + np.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+            * (np.exp(w[10] * (1 - retrievability)) - 1)
+        )
+        forget = (
+            w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1)
+            * np.exp(w[14] * (1 - retrievability))
+        )
+        new_stability = np.where(outcomes, recall, np.minimum(forget, stability))
+        # Первый ответ: начальная стабильность для оценки again / good
+        new_stability = np.where(is_new, np.where(outcomes, w[2], w[0]), new_stability)
+
+        interval = new_stability / self.FACTOR * (self.desired_retention ** (1 / self.DECAY) - 1)
+        return np.clip(interval, 0.0, self.max_interval_days)
+
+
+SCHEDULERS: Dict[str, Type[Scheduler]] = {
+    FibonacciScheduler.name: FibonacciScheduler,
+    FsrsScheduler.name: FsrsScheduler,
+}
+
+_scheduler: Optional[Scheduler] = None
+
+
+def make_scheduler(name: str) -> Scheduler:
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler '{name}', expected one of {sorted(SCHEDULERS)}")
+    if name == FsrsScheduler.name:
+        return FsrsScheduler(desired_retention=settings.fsrs_desired_retention)
+    return SCHEDULERS[name]()
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = make_scheduler(settings.scheduler)
+    return _scheduler
+
+
+def schedule_one(
+    repetition_count: int,
+    last_answered_at: Optional[datetime],
+    next_due_at: Optional[datetime],
+    is_correct: bool,
+    now: datetime,
+) -> datetime:
+    """Следующая дата повторения для одного ответа (пакет из одной строки)."""
+    states = ReviewStates.from_columns(
+        [repetition_count], datetime_array([last_answered_at]), datetime_array([next_due_at]), now,
+    )
+    return get_scheduler().schedule(states, np.array([is_correct]), now)[0].item()
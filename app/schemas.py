@@ -1,6 +1,6 @@
 # app/schemas.py - Fixed version
 from pydantic import BaseModel, Field, constr
-from typing import Any, Optional, List
+from typing import Any, Dict, Optional, List
 from uuid import UUID
 from datetime import datetime, date
 
@@ -34,6 +34,10 @@ class BatchAnswersSubmit(BaseModel):
             }
         }
 
+class UserBatchAnswersSubmit(BatchAnswersSubmit):
+    """Batch запрос для /user_progress/submit_answers - user_id в теле"""
+    user_id: UUID
+
 class QuestionOut(BaseModel):
     id: int
     data: Any
@@ -50,6 +54,16 @@ class UserStatsOut(BaseModel):
     correct: int
     box_counts: List[int] = []
 
+class TopicStatsOut(BaseModel):
+    topic: str
+    total: int
+    answered: int
+    correct: int
+    box_counts: List[int] = []
+
+class TopicsStatsOut(BaseModel):
+    topics: List[TopicStatsOut]
+
 class UserProgressOut(BaseModel):
     id: UUID
     user_id: UUID
@@ -136,6 +150,82 @@ class DailyProgressOut(BaseModel):
         }
 
 
+class SubmitAndNextRequest(BaseModel):
+    """Пакет ответов и параметры следующей порции вопросов"""
+    answers: List[BatchAnswerItem]
+    mode: str = "interval_all"
+    topics: Optional[List[str]] = None
+    batch_size: int = Field(30, ge=1, le=50)
+    ids_only: bool = False
+
+class StudyCountersOut(BaseModel):
+    total_questions: int
+    answered: int
+    correct: int
+    remaining: int
+    due_now: int = 0
+
+class SubmitAndNextOut(BaseModel):
+    processed: int
+    skipped: int
+    counters: StudyCountersOut
+    questions: Optional[List[QuestionOut]] = None
+    question_ids: Optional[List[int]] = None
+
+
+class DueDayOut(BaseModel):
+    date: date
+    count: int
+
+class DueForecastOut(BaseModel):
+    """Повторения к сегодняшнему дню (включая просроченные) и по дням вперёд, даты в UTC"""
+    due_now: int
+    days: List[DueDayOut]
+
+
+class BootstrapOut(BaseModel):
+    """Всё, что нужно Mini App при запуске; части, которые не удалось получить, перечислены в errors"""
+    user: UserOut
+    stats: Optional[UserStatsOut] = None
+    daily_progress: Optional[DailyProgressOut] = None
+    exam_settings: Optional[ExamSettingsResponse] = None
+    topics: Optional[List[str]] = None
+    questions: Optional[List[QuestionOut]] = None
+    question_ids: Optional[List[int]] = None
+    errors: Dict[str, str] = {}
+
+
+class ExamTicketAnswer(BaseModel):
+    """Ответ на вопрос билета: индекс выбранного варианта, правильность проверяет сервер"""
+    question_id: int
+    selected: int
+    timestamp: Optional[int] = None
+
+
+class ExamTicketSubmit(BaseModel):
+    """Сдача билета режима exam: токен из заголовка X-Exam-Ticket и все ответы разом"""
+    ticket: str
+    answers: List[ExamTicketAnswer]
+
+
+class ExamTopicScoreOut(BaseModel):
+    topic: str
+    total: int
+    correct: int
+
+
+class ExamTicketResultOut(BaseModel):
+    total: int
+    answered: int
+    correct: int
+    errors: int
+    max_errors: int
+    passed: bool
+    by_topic: List[ExamTopicScoreOut]
+    processed: int
+    skipped: int
+
+
 class MessageUserRequest(BaseModel):
     user_id: Optional[UUID] = None
     telegram_id: Optional[int] = None
@@ -0,0 +1,208 @@
+"""Slow-statement log with sampled EXPLAIN (ANALYZE, BUFFERS) capture.
+
+Statements slower than ``SLOW_QUERY_THRESHOLD_MS`` are aggregated per
+fingerprint (normalized statement shape) in memory and appended, with their
+parameters, to a rotating JSONL file. For a sampled share of slow read-only
+statements the plan is captured on a separate pooled connection and written
+to the same file. File writes and rotation run on a listener thread behind a
+queue, so a slow disk never blocks the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import queue
+import random
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.database import add_statement_observer, engines
+from app.query_profiler import statement_shape
+
+logger = logging.getLogger(__name__)
+
+MAX_FINGERPRINTS = 500
+MAX_CONCURRENT_EXPLAINS = 2
+
+_stats: Dict[str, dict] = {}
+_stats_lock = threading.Lock()
+_explain_tasks: set = set()
+_file_logger: Optional[logging.Logger] = None
+_listener: Optional[QueueListener] = None
+_file_logger_lock = threading.Lock()
+
+
+def _get_file_logger() -> logging.Logger:
+    global _file_logger, _listener
+    with _file_logger_lock:
+        if _file_logger is None:
+            # В потоке запроса — только постановка в очередь; запись и ротация — в потоке listener
+            handler = RotatingFileHandler(
+                settings.slow_query_log_path,
+                maxBytes=settings.slow_query_log_max_bytes,
+                backupCount=settings.slow_query_log_backups,
+                encoding="utf-8",
+                delay=True,
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            _listener = QueueListener(records, handler)
+            _listener.start()
+            file_logger = logging.getLogger("slow_queries")
+            file_logger.propagate = False
+            file_logger.setLevel(logging.INFO)
+            file_logger.addHandler(QueueHandler(records))
+            _file_logger = file_logger
+    return _file_logger
+
+
+def stop() -> None:
+    """Flush queued records and stop the writer thread (application shutdown)."""
+    global _file_logger, _listener
+    with _file_logger_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        if _file_logger is not None:
+            for handler in list(_file_logger.handlers):
+                _file_logger.removeHandler(handler)
+        _file_logger = _listener = None
+
+
+def _write(record: dict) -> None:
+    try:
+        _get_file_logger().info(json.dumps(record, default=str, ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"Failed to write slow query record: {e}")
+
+
+def fingerprint(shape: str) -> str:
+    return hashlib.md5(shape.encode("utf-8")).hexdigest()[:16]
+
+
+def _is_explainable(statement: str, parameters) -> bool:
+    head = statement.lstrip()[:10].upper()
+    if not (head.startswith("SELECT") or head.startswith("WITH")):
+        # EXPLAIN ANALYZE реально выполняет запрос — только чтение
+        return False
+    # executemany: список наборов параметров, план одного набора мало что скажет
+    if isinstance(parameters, list) and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        return False
+    return True
+
+
+def _record(engine_label: str, statement: str, parameters, elapsed: float) -> str:
+    shape = statement_shape(statement)
+    fp = fingerprint(shape)
+    elapsed_ms = elapsed * 1000
+    with _stats_lock:
+        entry = _stats.get(fp)
+        if entry is None:
+            if len(_stats) >= MAX_FINGERPRINTS:
+                # Вытесняем самый «дешёвый» отпечаток, чтобы память не росла
+                cheapest = min(_stats, key=lambda k: _stats[k]["total_ms"])
+                del _stats[cheapest]
+            entry = _stats[fp] = {
+                "fingerprint": fp,
+                "engine": engine_label,
+                "shape": shape,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "last_seen": None,
+                "last_parameters": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        entry["last_seen"] = datetime.utcnow().isoformat()
+        entry["last_parameters"] = repr(parameters)[:1000]
+    _write({
+        "type": "slow_query",
+        "at": datetime.utcnow().isoformat(),
+        "engine": engine_label,
+        "fingerprint": fp,
+        "duration_ms": round(elapsed_ms, 3),
+        "statement": statement,
+        "parameters": parameters,
+    })
+    return fp
+
+
+async def _capture_explain(engine_label: str, fp: str, statement: str, parameters) -> None:
+    engine = engines.get(engine_label)
+    if engine is None:
+        return
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement,
+                tuple(parameters or ()),
+            )
+            plan = result.scalar()
+            await conn.rollback()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        _write({
+            "type": "explain",
+            "at": datetime.utcnow().isoformat(),
+            "engine": engine_label,
+            "fingerprint": fp,
+            "statement": statement,
+            "parameters": parameters,
+            "plan": plan,
+        })
+    except Exception as e:
+        logger.warning(f"EXPLAIN capture failed for {fp}: {e}")
+
+
+def _maybe_schedule_explain(engine_label: str, fp: str, statement: str, parameters) -> None:
+    if settings.slow_query_explain_sample_rate <= 0 or len(_explain_tasks) >= MAX_CONCURRENT_EXPLAINS:
+        return
+    if random.random() >= settings.slow_query_explain_sample_rate:
+        return
+    if not _is_explainable(statement, parameters):
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(_capture_explain(engine_label, fp, statement, parameters))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+def _observe_statement(engine_label, statement, parameters, elapsed) -> None:
+    threshold_ms = settings.slow_query_threshold_ms
+    if threshold_ms <= 0 or elapsed * 1000 < threshold_ms:
+        return
+    if statement.lstrip()[:7].upper() == "EXPLAIN":
+        return
+    fp = _record(engine_label, statement, parameters, elapsed)
+    _maybe_schedule_explain(engine_label, fp, statement, parameters)
+
+
+add_statement_observer(_observe_statement)
+
+
+def worst_statements(limit: int = 20) -> List[dict]:
+    """Slow statement fingerprints of this process ordered by total time."""
+    with _stats_lock:
+        entries = [dict(entry) for entry in _stats.values()]
+    entries.sort(key=lambda e: e["total_ms"], reverse=True)
+    for entry in entries:
+        entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 3)
+        entry["total_ms"] = round(entry["total_ms"], 3)
+        entry["max_ms"] = round(entry["max_ms"], 3)
+    return entries[:limit]
+
+
+def reset() -> None:
+    with _stats_lock:
+        _stats.clear()
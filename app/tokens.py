@@ -0,0 +1,55 @@
+"""Stateless signed tokens (exam tickets, session cursors).
+
+A token is ``base64url(json payload) + "." + base64url(hmac)``. The payload is
+readable by the client but cannot be changed without the server secret.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+from typing import Any, Dict
+
+from app.config import settings
+
+
+class InvalidToken(ValueError):
+    """Token is malformed, forged or issued for another purpose."""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _signature(kind: str, body: str) -> bytes:
+    if not settings.token_secret:
+        raise RuntimeError("TOKEN_SECRET (or TELEGRAM_BOT_TOKEN) is not set")
+    key = hashlib.sha256(f"{kind}:{settings.token_secret}".encode("utf-8")).digest()
+    return hmac.new(key, body.encode("ascii"), hashlib.sha256).digest()[:16]
+
+
+def sign_token(kind: str, payload: Dict[str, Any]) -> str:
+    """Sign a payload; ``kind`` separates token types so one can't be passed as another."""
+    body = _b64encode(json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    return f"{body}.{_b64encode(_signature(kind, body))}"
+
+
+def verify_token(kind: str, token: str) -> Dict[str, Any]:
+    """Return the payload of a valid token, raise InvalidToken otherwise."""
+    try:
+        body, signature = token.split(".", 1)
+        if not hmac.compare_digest(_b64decode(signature), _signature(kind, body)):
+            raise InvalidToken("bad signature")
+        payload = json.loads(_b64decode(body))
+    except InvalidToken:
+        raise
+    except (ValueError, TypeError) as e:
+        raise InvalidToken(str(e)) from e
+    if not isinstance(payload, dict):
+        raise InvalidToken("bad payload")
+    return payload
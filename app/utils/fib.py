@@ -0,0 +1,16 @@
+# Интервалы повторения по Фибоначчи (в днях) на 20 уровней (до ~18 лет)
+import numpy as np
+
+FIB_SEQUENCE = [
+    0, 1, 2, 3, 5, 8, 13, 21, 34,
+    55, 89, 144, 233, 377, 610, 987,
+    1597, 2584, 4181, 6765
+]
+
+FIB_INTERVALS = np.asarray(FIB_SEQUENCE, dtype=np.int64)
+
+
+def fib_interval_days(repetition_count: np.ndarray) -> np.ndarray:
+    """Интервалы в днях для массива repetition_count (уровни выше таблицы — последний интервал)."""
+    idx = np.clip(np.asarray(repetition_count, dtype=np.int64), 0, len(FIB_INTERVALS) - 1)
+    return FIB_INTERVALS[idx]
@@ -0,0 +1,237 @@
+"""Micro-benchmarks for the crud layer against a seeded database.
+
+Times every function of ``app/crud/question.py``, ``app/crud/user.py`` and
+``app/crud/user_progress.py`` that sits on a hot path, pytest-benchmark style:
+warmup rounds, then N timed rounds rotating over real users of one exam.
+Writes run inside an outer transaction that is rolled back (commits inside
+crud become savepoints), so the dataset is left untouched.
+
+Seed first with ``scripts/gen_dataset.py``, then:
+
+    python scripts/bench_crud.py --country am --language ru --save-baseline benchmarks/crud.json
+    python scripts/bench_crud.py --country am --language ru --compare benchmarks/crud.json --threshold 15
+
+With ``--compare`` the run exits with status 1 if any benchmark's median got
+more than ``--threshold`` percent slower than the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app.crud import question as crud_question  # noqa: E402
+from app.crud import user as crud_user  # noqa: E402
+from app.crud import user_progress as crud_progress  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.models import Question, User  # noqa: E402
+from app.schemas import AnswerSubmit, BatchAnswerItem  # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def _fetch_questions_bench(mode):
+    async def run(db, ctx, user_id):
+        topics = ctx["topics"][:2] if mode == "topics" else None
+        await crud_question.fetch_questions_for_user(
+            db, user_id, ctx["country"], ctx["language"], mode, 30, topics
+        )
+    return run
+
+
+for _mode in ("interval_all", "new_only", "incorrect", "topics"):
+    benchmark(f"fetch_questions_for_user[{_mode}]")(_fetch_questions_bench(_mode))
+
+
+@benchmark("get_user_stats")
+async def bench_user_stats(db, ctx, user_id):
+    await crud_user.get_user_stats(db, user_id)
+
+
+@benchmark("get_daily_progress")
+async def bench_daily_progress(db, ctx, user_id):
+    await crud_user.get_daily_progress(db, user_id)
+
+
+@benchmark("get_remaining_questions_count")
+async def bench_remaining(db, ctx, user_id):
+    await crud_question.get_remaining_questions_count(db, user_id, ctx["country"], ctx["language"])
+
+
+@benchmark("get_user_by_id")
+async def bench_user_by_id(db, ctx, user_id):
+    await crud_user.get_user_by_id(db, user_id)
+
+
+@benchmark("get_distinct_countries")
+async def bench_countries(db, ctx, user_id):
+    await crud_question.get_distinct_countries(db)
+
+
+@benchmark("get_progress_for_user")
+async def bench_progress_for_user(db, ctx, user_id):
+    await crud_progress.get_progress_for_user(db, user_id)
+
+
+@benchmark("create_or_update_progress")
+async def bench_single_answer(db, ctx, user_id):
+    await crud_progress.create_or_update_progress(db, AnswerSubmit(
+        user_id=user_id,
+        question_id=ctx["rng"].choice(ctx["question_ids"]),
+        is_correct=ctx["rng"].random() < 0.7,
+    ))
+
+
+@benchmark("create_or_update_progress_batch[30]")
+async def bench_batch_answers(db, ctx, user_id):
+    for question_id in ctx["rng"].sample(ctx["question_ids"], 30):
+        await crud_progress.create_or_update_progress_batch(db, AnswerSubmit(
+            user_id=user_id, question_id=question_id, is_correct=ctx["rng"].random() < 0.7,
+        ))
+    await db.flush()
+
+
+@benchmark("ingest_answers[30]")
+async def bench_ingest_answers(db, ctx, user_id):
+    await crud_progress.ingest_answers(db, user_id, [
+        BatchAnswerItem(question_id=question_id, is_correct=ctx["rng"].random() < 0.7)
+        for question_id in ctx["rng"].sample(ctx["question_ids"], 30)
+    ])
+    await db.flush()
+
+
+async def _run_one(func, ctx, user_id):
+    async with engine.connect() as conn:
+        outer = await conn.begin()
+        db = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        try:
+            start = time.perf_counter()
+            await func(db, ctx, user_id)
+            return time.perf_counter() - start
+        finally:
+            await db.close()
+            await outer.rollback()
+
+
+def _percentile(ordered, q):
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+async def _context(args):
+    async with AsyncSession(engine) as db:
+        users = (await db.execute(
+            select(User.id)
+            .where(User.exam_country == args.country, User.exam_language == args.language)
+            .order_by(User.id)
+            .limit(args.users)
+        )).scalars().all()
+        question_ids = (await db.execute(
+            select(Question.id).where(Question.country == args.country, Question.language == args.language)
+        )).scalars().all()
+        topics = await crud_question.fetch_topics(db, args.country, args.language)
+        server_version = (await db.execute(text("SHOW server_version"))).scalar()
+    if not users or not question_ids:
+        raise SystemExit(f"No users/questions for {args.country}/{args.language}: seed with scripts/gen_dataset.py")
+    return {
+        "country": args.country,
+        "language": args.language,
+        "users": list(users),
+        "question_ids": list(question_ids),
+        "topics": sorted(topics),
+        "rng": random.Random(args.seed),
+        "server_version": server_version,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--country", required=True)
+    parser.add_argument("--language", required=True)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--users", type=int, default=200, help="How many seeded users to rotate over")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", help="Substring filter on benchmark names")
+    parser.add_argument("--save-baseline", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON to compare medians against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed median slowdown, percent")
+    args = parser.parse_args()
+
+    ctx = await _context(args)
+    results = {}
+    for name, func in BENCHMARKS.items():
+        if args.only and args.only not in name:
+            continue
+        for i in range(args.warmup):
+            await _run_one(func, ctx, ctx["users"][i % len(ctx["users"])])
+        samples = []
+        for i in range(args.rounds):
+            user_id = ctx["users"][(i * 7919) % len(ctx["users"])]
+            samples.append(await _run_one(func, ctx, user_id))
+        samples.sort()
+        results[name] = {
+            "rounds": len(samples),
+            "min_ms": round(samples[0] * 1000, 3),
+            "median_ms": round(statistics.median(samples) * 1000, 3),
+            "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+            "stddev_ms": round(statistics.pstdev(samples) * 1000, 3),
+        }
+    await engine.dispose()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh).get("results", {})
+
+    regressions = []
+    print(f"{'benchmark':42} {'min':>9} {'median':>9} {'p95':>9} {'max':>9}  vs baseline")
+    for name, row in results.items():
+        delta = ""
+        if baseline and name in baseline and baseline[name]["median_ms"]:
+            change = (row["median_ms"] - baseline[name]["median_ms"]) / baseline[name]["median_ms"] * 100
+            delta = f"{change:+.1f}%"
+            if change > args.threshold:
+                regressions.append((name, change))
+                delta += "  REGRESSION"
+        print(f"{name:42} {row['min_ms']:8.2f}ms {row['median_ms']:8.2f}ms "
+              f"{row['p95_ms']:8.2f}ms {row['max_ms']:8.2f}ms  {delta}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump({
+                "created_at": datetime.utcnow().isoformat(),
+                "exam": [args.country, args.language],
+                "rounds": args.rounds,
+                "server_version": ctx["server_version"],
+                "results": results,
+            }, fh, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold}%:")
+        for name, change in regressions:
+            print(f"  {name}: {change:+.1f}%")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
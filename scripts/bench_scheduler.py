@@ -0,0 +1,85 @@
+"""Per-answer cost of the spaced-repetition schedulers at 1, 100 and 1M rows.
+
+Compares every scheduler in ``app.scheduler.SCHEDULERS`` (vectorized with
+NumPy) against the legacy per-answer ``calculate_next_due_date`` loop, on
+random but realistic review states. No database needed.
+
+    python scripts/bench_scheduler.py [--sizes 1,100,1000000] [--rounds 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.crud.user_progress import calculate_next_due_date  # noqa: E402
+from app.scheduler import SCHEDULERS, ReviewStates, advance_repetitions, make_scheduler  # noqa: E402
+from app.utils.fib import fib_interval_days  # noqa: E402
+
+
+def make_batch(n, rng, now):
+    reps = rng.integers(0, 12, size=n)
+    interval = fib_interval_days(reps).astype(np.float64)
+    elapsed = interval * rng.uniform(0.5, 1.5, size=n)
+    last = np.datetime64(now, "us") - (elapsed * 86_400_000_000).astype("timedelta64[us]")
+    due = last + (interval * 86_400_000_000).astype("timedelta64[us]")
+    outcomes = rng.random(n) < 0.8
+    return ReviewStates.from_columns(reps, last, due, now), outcomes
+
+
+def time_rounds(func, rounds, budget_seconds):
+    samples = []
+    deadline = time.perf_counter() + budget_seconds
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,100,1000000")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=10.0, help="Max seconds per (scheduler, size)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    now = datetime(2026, 1, 1)
+    rng = np.random.default_rng(args.seed)
+    print(f"{'scheduler':18} {'rows':>9} {'batch':>12} {'per answer':>12}")
+    for n in sizes:
+        states, outcomes = make_batch(n, rng, now)
+        reps = states.repetition_count.tolist()
+        flags = outcomes.tolist()
+
+        def legacy():
+            for r, ok in zip(reps, flags):
+                calculate_next_due_date(r + 1 if ok else 0)
+
+        rows = [("legacy loop", legacy)]
+        for name in SCHEDULERS:
+            scheduler = make_scheduler(name)
+
+            def vectorized(scheduler=scheduler):
+                scheduler.schedule(states, outcomes, now)
+                advance_repetitions(states.repetition_count, outcomes)
+
+            rows.append((name, vectorized))
+
+        for name, func in rows:
+            func()  # прогрев
+            median = time_rounds(func, args.rounds, args.budget)
+            print(f"{name:18} {n:9d} {median * 1000:10.3f}ms {median / n * 1e6:10.3f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Deterministic synthetic dataset for scale testing indexes and query plans.
+
+Generates production-shaped data into the schema from ``app/models.py`` and
+bulk-loads it with COPY:
+
+* a question bank per (country, language) exam, spread over topics;
+* users with a heavy-tailed activity distribution;
+* ``user_progress`` rows with a realistic ``repetition_count`` distribution
+  and ``next_due_at`` on the Fibonacci schedule;
+* ``answer_history`` rows consistent with that progress.
+
+The same ``--seed`` and ``--scale`` always produce the same rows. At
+``--scale 1`` you get ~24k questions, 100k users, ~17M progress rows and ~50M
+history rows; use e.g. ``--scale 0.01`` on a laptop.
+
+    python scripts/gen_dataset.py --dsn postgresql://localhost/tgapp_bench --scale 0.05 --truncate
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.catalog import BUMP_CATALOG_VERSION_SQL  # noqa: E402
+from app.crud.due_histogram import REBUILD_SQL as REBUILD_DUE_HISTOGRAM_SQL  # noqa: E402
+from app.crud.exam_counters import REBUILD_SQL as REBUILD_EXAM_COUNTERS_SQL  # noqa: E402
+from app.models import AnswerHistory, Question, User, UserProgress  # noqa: E402
+from app.utils.fib import FIB_SEQUENCE  # noqa: E402
+
+# Доля прогресса по repetition_count (0 = последний ответ неверный)
+REPETITION_WEIGHTS = [18, 24, 17, 12, 9, 7, 5, 3.5, 2.2, 1.3, 0.7, 0.3]
+TOPICS_PER_EXAM = 12
+CHUNK_ROWS = 50_000
+
+
+def _columns(model, skip=()):
+    return [c.name for c in model.__table__.columns if c.name not in skip]
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _question_payload(rng, qid, topic, language):
+    options = [f"Option {i + 1} ({language})" for i in range(rng.choice((3, 4, 4, 5)))]
+    payload = {
+        "question": f"Question {qid} about {topic} " + "lorem ipsum " * rng.randint(3, 20),
+        "options": options,
+        "correct": rng.randrange(len(options)),
+    }
+    if rng.random() < 0.4:
+        payload["image"] = f"https://cdn.example.invalid/q/{qid}.png"
+    return json.dumps(payload, ensure_ascii=False)
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.now = datetime(2025, 9, 1, tzinfo=timezone.utc)
+        self.exams = [(c, l) for c in args.countries for l in args.languages]
+        self.questions_per_exam = max(50, int(round(2000 * args.scale ** 0.5)))
+        self.users = max(10, int(round(100_000 * args.scale)))
+        self.exam_questions = {}
+
+    def questions(self):
+        rng = random.Random(f"{self.args.seed}:questions")
+        qid = 0
+        for country, language in self.exams:
+            ids = []
+            topics = [f"topic_{t:02d}" for t in range(TOPICS_PER_EXAM)]
+            # Неравные размеры тем, как в реальных билетах
+            weights = [rng.uniform(0.4, 2.0) for _ in topics]
+            for _ in range(self.questions_per_exam):
+                qid += 1
+                topic = rng.choices(topics, weights=weights)[0]
+                ids.append(qid)
+                yield (qid, _question_payload(rng, qid, topic, language), topic, country, language)
+            self.exam_questions[(country, language)] = ids
+
+    def users_and_progress(self):
+        """Yield ("users" | "user_progress" | "answer_history", record) in a deterministic order."""
+        rng = random.Random(f"{self.args.seed}:users")
+        exam_weights = [1.0 / (i + 1) for i in range(len(self.exams))]
+        for i in range(self.users):
+            user_id = _uuid(rng)
+            country, language = rng.choices(self.exams, weights=exam_weights)[0]
+            created_at = self.now - timedelta(days=rng.uniform(0, 365))
+            has_goal = rng.random() < 0.6
+            yield "users", {
+                "id": user_id,
+                "telegram_id": 7_000_000_000 + i,
+                "username": f"user{i}",
+                "first_name": f"First{i}",
+                "created_at": created_at.replace(tzinfo=None),
+                "exam_country": country,
+                "exam_language": language,
+                "ui_language": language,
+                "exam_date": (self.now + timedelta(days=rng.randint(5, 120))).date() if has_goal else None,
+                "daily_goal": rng.choice((10, 20, 30, 50)) if has_goal else None,
+                "remind_morning": rng.random() < 0.3,
+                "remind_day": rng.random() < 0.2,
+                "remind_evening": rng.random() < 0.3,
+                "is_bot_blocked": rng.random() < 0.05,
+            }
+
+            bank = self.exam_questions[(country, language)]
+            # Активность с тяжёлым хвостом: большинство ответило на десятки вопросов
+            answered = min(len(bank), int(rng.paretovariate(1.3) * 40))
+            for question_id in rng.sample(bank, answered):
+                reps = rng.choices(range(len(REPETITION_WEIGHTS)), weights=REPETITION_WEIGHTS)[0]
+                last_answered = min(self.now, created_at + timedelta(days=rng.uniform(0, 365)))
+                next_due = last_answered + timedelta(days=FIB_SEQUENCE[reps])
+                yield "user_progress", (
+                    _uuid(rng), user_id, question_id, reps, reps > 0, last_answered, next_due,
+                )
+                # История: правильные ответы по числу повторений плюс случайные ошибки
+                lapses = int(rng.expovariate(1.5)) + (1 if reps == 0 else 0)
+                attempts = max(1, reps + lapses)
+                span = (last_answered - created_at).total_seconds()
+                for a in range(attempts):
+                    at = last_answered if a == attempts - 1 else created_at + timedelta(seconds=rng.uniform(0, span))
+                    is_correct = (reps > 0) if a == attempts - 1 else rng.random() < 0.6
+                    yield "answer_history", (user_id, question_id, is_correct, at.replace(tzinfo=None))
+
+
+async def _copy(conn, table, columns, records):
+    if records:
+        if isinstance(records[0], dict):
+            # Отсутствующие ключи — NULL, чтобы новые nullable-колонки модели не ломали генератор
+            records = [tuple(r.get(c) for c in columns) for r in records]
+        await conn.copy_records_to_table(table, records=records, columns=columns)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL", "").replace("+asyncpg", ""))
+    parser.add_argument("--scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--countries", default="am,ge,ru,kz")
+    parser.add_argument("--languages", default="ru,en,hy")
+    parser.add_argument("--truncate", action="store_true", help="TRUNCATE the tables before loading")
+    args = parser.parse_args()
+    args.countries = [c.strip() for c in args.countries.split(",") if c.strip()]
+    args.languages = [l.strip() for l in args.languages.split(",") if l.strip()]
+
+    gen = Generator(args)
+    columns = {
+        "questions": _columns(Question, skip=("updated_version", "retired_version")),
+        "users": _columns(User),
+        "user_progress": _columns(UserProgress),
+        "answer_history": _columns(AnswerHistory, skip=("id",)),
+    }
+    conn = await asyncpg.connect(args.dsn)
+    started = time.perf_counter()
+    try:
+        if args.truncate:
+            await conn.execute("TRUNCATE answer_history, user_progress, user_due_histogram, user_exam_counters, users, questions, question_tombstones RESTART IDENTITY CASCADE")
+
+        counts = {table: 0 for table in columns}
+        records = list(gen.questions())
+        await _copy(conn, "questions", columns["questions"], records)
+        counts["questions"] = len(records)
+        print(f"questions: {len(records)} ({len(gen.exams)} exams x {gen.questions_per_exam})")
+
+        buffers = {"users": [], "user_progress": [], "answer_history": []}
+
+        async def flush(tables):
+            for table in tables:
+                await _copy(conn, table, columns[table], buffers[table])
+                counts[table] += len(buffers[table])
+                buffers[table] = []
+
+        for table, record in gen.users_and_progress():
+            buffers[table].append(record)
+            if len(buffers[table]) >= CHUNK_ROWS:
+                # Пользователи раньше прогресса — иначе FK не пройдёт
+                await flush(["users", "user_progress", "answer_history"])
+                elapsed = time.perf_counter() - started
+                print(f"  users={counts['users']} progress={counts['user_progress']} "
+                      f"history={counts['answer_history']} ({elapsed:.0f}s)")
+        await flush(["users", "user_progress", "answer_history"])
+
+        # Гистограмма прогноза и счётчики экзамена обычно ведутся при записи ответов — здесь строим их из прогресса
+        await conn.execute("DELETE FROM user_due_histogram")
+        await conn.execute(REBUILD_DUE_HISTOGRAM_SQL.format(where=""))
+        await conn.execute("DELETE FROM user_exam_counters")
+        await conn.execute(REBUILD_EXAM_COUNTERS_SQL.format(where=""))
+        await conn.execute("ANALYZE questions, users, user_progress, answer_history, user_due_histogram, user_exam_counters")
+        # Кэши каталога во всех воркерах должны увидеть новый банк вопросов
+        await conn.fetchval(BUMP_CATALOG_VERSION_SQL)
+    finally:
+        await conn.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"done: {counts} in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
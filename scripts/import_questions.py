@@ -0,0 +1,266 @@
+"""Bulk question bank importer: diff, COPY into staging, one merge statement.
+
+Reads a JSON array or NDJSON file of questions::
+
+    {"id": 101, "country": "am", "language": "ru", "topic": "signs", "data": {...}}
+
+and makes each (country, language) bank present in the file match it:
+
+1. existing rows of those banks are fetched and compared by id and content
+   hash (canonical JSON of topic + data, so formatting differences don't count);
+2. only new and changed rows are COPY'd into a temporary staging table;
+3. a single statement upserts them and deletes rows that are gone from the
+   file. Questions still referenced by ``user_progress`` keep their row (the
+   progress foreign key points at it) but are retired: ``retired_version`` is
+   set and every catalog query skips them. A retired question that shows up in
+   the file again is revived. A question whose country/language changed is
+   moved: for its old exam it counts as deleted. Changed rows are stamped with
+   the new catalog version, deleted, retired and moved ones leave a tombstone
+   in the exam they left, which is what ``GET /questions/catalog`` delta sync
+   serves. Per-user aggregates of users with progress on retired, revived or
+   moved questions are rebuilt, since those aggregates are kept per exam and
+   only count live questions;
+4. in the same transaction the catalog version is bumped and
+   ``catalog:<country>:<lang>`` invalidations are broadcast, so every worker
+   refreshes its caches on commit.
+
+    python scripts/import_questions.py bank_am_ru.ndjson [--dry-run]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+
+import asyncpg
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.catalog import BUMP_CATALOG_VERSION_SQL  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.crud.due_histogram import REBUILD_SQL as REBUILD_DUE_HISTOGRAM_SQL  # noqa: E402
+from app.crud.exam_counters import REBUILD_SQL as REBUILD_EXAM_COUNTERS_SQL  # noqa: E402
+from app.invalidation import INVALIDATION_CHANNEL, catalog_event  # noqa: E402
+from app.pg_listener import asyncpg_dsn  # noqa: E402
+
+REQUIRED_FIELDS = ("id", "country", "language", "topic", "data")
+
+MERGE_SQL = """
+    WITH moved AS (
+        -- Снимок до оператора: старые страна/язык вопросов, переехавших в другой экзамен
+        SELECT q.id, q.country, q.language
+          FROM questions q
+          JOIN _import_questions s ON s.id = q.id
+         WHERE (q.country, q.language) <> (s.country, s.language)
+           AND q.retired_version IS NULL
+    ), upserted AS (
+        INSERT INTO questions (id, data, topic, country, language, updated_version)
+        SELECT id, data::jsonb, topic, country, language, $2 FROM _import_questions
+        ON CONFLICT (id) DO UPDATE
+           SET data = EXCLUDED.data,
+               topic = EXCLUDED.topic,
+               country = EXCLUDED.country,
+               language = EXCLUDED.language,
+               updated_version = EXCLUDED.updated_version,
+               retired_version = NULL
+        RETURNING id, (xmax = 0) AS inserted
+    ), gone AS (
+        SELECT q.id, EXISTS (SELECT 1 FROM user_progress p WHERE p.question_id = q.id) AS referenced
+          FROM questions q
+          JOIN unnest($1::int[]) AS g(id) ON g.id = q.id
+    ), deleted AS (
+        DELETE FROM questions q
+         USING gone g
+         WHERE q.id = g.id AND NOT g.referenced
+     RETURNING q.id, q.country, q.language
+    ), retired AS (
+        UPDATE questions q
+           SET retired_version = $2
+          FROM gone g
+         WHERE q.id = g.id AND g.referenced
+     RETURNING q.id, q.country, q.language
+    ), tombstoned AS (
+        INSERT INTO question_tombstones (question_id, country, language, deleted_version)
+        SELECT id, country, language, $2 FROM deleted
+        UNION ALL
+        SELECT id, country, language, $2 FROM retired
+        UNION ALL
+        SELECT id, country, language, $2 FROM moved
+        ON CONFLICT (question_id) DO UPDATE
+           SET country = EXCLUDED.country,
+               language = EXCLUDED.language,
+               deleted_version = EXCLUDED.deleted_version
+    ), revived AS (
+        -- Надгробие снимается, только если вопрос вернулся в тот же экзамен;
+        -- у переехавших его перезаписывает tombstoned (одна строка — одна операция)
+        DELETE FROM question_tombstones t
+         USING upserted u, _import_questions s
+         WHERE t.question_id = u.id
+           AND s.id = u.id
+           AND (t.country, t.language) = (s.country, s.language)
+           AND u.id NOT IN (SELECT id FROM moved)
+    )
+    SELECT (SELECT count(*) FROM upserted WHERE inserted)     AS inserted,
+           (SELECT count(*) FROM upserted WHERE NOT inserted) AS updated,
+           (SELECT count(*) FROM deleted)                     AS deleted,
+           (SELECT count(*) FROM retired)                     AS retired,
+           (SELECT array_agg(id) FROM moved)                  AS moved
+"""
+
+# Агрегаты прогресса считают только действующие вопросы своего экзамена — пересобираем их
+# у пользователей, задетых снятием, возвратом или переездом вопросов
+AFFECTED_USERS_SQL = """
+    SELECT array_agg(DISTINCT user_id) FROM user_progress WHERE question_id = ANY($1::int[])
+"""
+
+
+def canonical_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def content_hash(topic, country, language, data_json: str) -> str:
+    digest = hashlib.sha1()
+    for part in (topic, country, language, data_json):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def load_bank(path):
+    with open(path, encoding="utf-8") as fh:
+        text = fh.read()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        items = json.loads(stripped)
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    bank = {}
+    for n, item in enumerate(items, 1):
+        missing = [f for f in REQUIRED_FIELDS if f not in item]
+        if missing:
+            raise SystemExit(f"Item #{n}: missing fields {missing}")
+        qid = int(item["id"])
+        if qid in bank:
+            raise SystemExit(f"Item #{n}: duplicate id {qid}")
+        country = str(item["country"]).lower()
+        language = str(item["language"]).lower()
+        data_json = canonical_json(item["data"])
+        bank[qid] = (str(item["topic"]), country, language, data_json,
+                     content_hash(str(item["topic"]), country, language, data_json))
+    return bank
+
+
+async def fetch_existing(conn, exams, ids):
+    rows = await conn.fetch(
+        """
+        SELECT id, topic, country, language, data::text AS data, retired_version IS NOT NULL AS retired
+          FROM questions
+         WHERE (country, language) IN (SELECT * FROM unnest($1::text[], $2::text[]))
+            OR id = ANY($3::int[])
+        """,
+        [c for c, _ in exams], [l for _, l in exams], list(ids),
+    )
+    existing = {}
+    for row in rows:
+        data_json = canonical_json(json.loads(row["data"]))
+        existing[row["id"]] = (
+            row["country"], row["language"],
+            content_hash(row["topic"], row["country"], row["language"], data_json),
+            row["retired"],
+        )
+    return existing
+
+
+def diff(bank, existing, exams):
+    inserts = [qid for qid in bank if qid not in existing]
+    # Снятый ранее вопрос снова в файле — обновляем, даже если содержимое не менялось
+    updates = [
+        qid for qid, row in bank.items()
+        if qid in existing and (existing[qid][2] != row[4] or existing[qid][3])
+    ]
+    deletes = [
+        qid for qid, (country, language, _, retired) in existing.items()
+        if qid not in bank and (country, language) in exams and not retired
+    ]
+    return inserts, updates, deletes
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSON array or NDJSON question bank")
+    parser.add_argument("--dsn", default=asyncpg_dsn(settings.listen_database_url or settings.database_url))
+    parser.add_argument("--no-delete", action="store_true", help="Only insert/update, never delete")
+    parser.add_argument("--dry-run", action="store_true", help="Print the diff and roll back")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bank = load_bank(args.path)
+    exams = sorted({(row[1], row[2]) for row in bank.values()})
+    print(f"loaded {len(bank)} questions for {', '.join(f'{c}/{l}' for c, l in exams)} "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    conn = await asyncpg.connect(args.dsn, statement_cache_size=0)
+    try:
+        async with conn.transaction():
+            existing = await fetch_existing(conn, exams, bank.keys())
+            inserts, updates, deletes = diff(bank, existing, set(exams))
+            if args.no_delete:
+                deletes = []
+            print(f"diff: {len(inserts)} new, {len(updates)} changed, {len(deletes)} gone, "
+                  f"{len(bank) - len(inserts) - len(updates)} unchanged")
+            if args.dry_run or not (inserts or updates or deletes):
+                print("nothing to apply" if not args.dry_run else "dry run, rolling back")
+                return
+
+            await conn.execute("""
+                CREATE TEMP TABLE _import_questions (
+                    id integer PRIMARY KEY,
+                    topic text NOT NULL,
+                    country text NOT NULL,
+                    language text NOT NULL,
+                    data text NOT NULL
+                ) ON COMMIT DROP
+            """)
+            changed = inserts + updates
+            await conn.copy_records_to_table(
+                "_import_questions",
+                records=[(qid, bank[qid][0], bank[qid][1], bank[qid][2], bank[qid][3]) for qid in changed],
+                columns=["id", "topic", "country", "language", "data"],
+            )
+            # Сначала версия: ею помечаются изменённые строки и надгробия удалённых
+            version = await conn.fetchval(BUMP_CATALOG_VERSION_SQL)
+            result = await conn.fetchrow(MERGE_SQL, deletes, version)
+            revived = [qid for qid in updates if existing[qid][3]]
+            moved = list(result["moved"] or [])
+            users = await conn.fetchval(AFFECTED_USERS_SQL, deletes + revived + moved)
+            if users:
+                for table, rebuild_sql in (("user_due_histogram", REBUILD_DUE_HISTOGRAM_SQL),
+                                           ("user_exam_counters", REBUILD_EXAM_COUNTERS_SQL)):
+                    await conn.execute(f"DELETE FROM {table} WHERE user_id = ANY($1::uuid[])", users)
+                    await conn.execute(rebuild_sql.format(where="AND p.user_id = ANY($1::uuid[])"), users)
+            await conn.execute(
+                "SELECT setval(pg_get_serial_sequence('questions', 'id'), "
+                "GREATEST((SELECT max(id) FROM questions), 1))"
+            )
+
+            touched_exams = set(exams) if deletes else {bank[qid][1:3] for qid in changed}
+            touched_exams |= {existing[qid][:2] for qid in updates}
+            await conn.execute(
+                f"SELECT pg_notify('{INVALIDATION_CHANNEL}', e) FROM unnest($1::text[]) AS e",
+                [catalog_event(c, l) for c, l in sorted(touched_exams)],
+            )
+    finally:
+        await conn.close()
+
+    print(f"applied: {result['inserted']} inserted, {result['updated']} updated "
+          f"({len(revived)} revived, {len(moved)} moved to another exam), {result['deleted']} deleted, "
+          f"{result['retired']} retired (referenced by user_progress), "
+          f"aggregates rebuilt for {len(users or [])} users; "
+          f"catalog version {version}; {time.perf_counter() - started:.2f}s total")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,216 @@
+"""End-to-end load generator replaying Mini App study sessions.
+
+Every virtual user registers (``POST /users/``) and then loops: fetch a batch
+of questions, "answer" them after a think time, submit the batch, and check
+stats and answers-by-day, like the Mini App does. Latency is recorded per
+route template; the run ends with a p50/p95/p99 table and an optional JSON
+result file (tagged with the current git commit) for comparing runs.
+
+    python scripts/loadtest.py --base-url http://127.0.0.1:8000 --country am --language ru \
+        --users 50 --duration 120 --output results/loadtest.json
+
+Needs only aiohttp, which aiogram already depends on.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import aiohttp
+
+
+class RouteStats:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route, elapsed, status):
+        self.samples[route].append(elapsed)
+        self.statuses[route][str(status)] += 1
+        if status is None or status >= 400:
+            self.errors[route] += 1
+
+    def summary(self, wall_seconds):
+        out = {}
+        for route in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples[route])
+            if not samples:
+                continue
+            out[route] = {
+                "requests": len(samples),
+                "errors": self.errors[route],
+                "throughput_per_s": round(len(samples) / wall_seconds, 2),
+                "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+                "p50_ms": round(_percentile(samples, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(samples, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(samples, 0.99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+                "statuses": dict(self.statuses[route]),
+            }
+        return out
+
+
+def _percentile(ordered, q):
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def _call(http, stats, method, route, url, **kwargs):
+    start = time.perf_counter()
+    status = None
+    try:
+        async with http.request(method, url, **kwargs) as resp:
+            status = resp.status
+            body = await resp.read()
+            return status, (json.loads(body) if body and resp.content_type == "application/json" else None)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None, None
+    finally:
+        stats.record(route, time.perf_counter() - start, status)
+
+
+async def _think(rng, mean_seconds):
+    if mean_seconds > 0:
+        await asyncio.sleep(rng.expovariate(1.0 / mean_seconds))
+
+
+async def virtual_user(idx, http, stats, args, deadline):
+    rng = random.Random(args.seed * 1_000_003 + idx)
+    base = args.base_url.rstrip("/")
+    telegram_id = args.telegram_id_base + idx
+
+    status, user = await _call(http, stats, "POST", "POST /users/", f"{base}/users/", json={
+        "telegram_id": telegram_id,
+        "username": f"loadtest_{idx}",
+        "exam_country": args.country,
+        "exam_language": args.language,
+        "ui_language": args.language,
+    })
+    if not user or "id" not in user:
+        return
+    user_id = user["id"]
+
+    while time.monotonic() < deadline:
+        mode = rng.choices(["interval_all", "new_only", "incorrect"], weights=[6, 3, 1])[0]
+        status, questions = await _call(
+            http, stats, "GET", "GET /questions/", f"{base}/questions/",
+            params={
+                "user_id": user_id, "mode": mode, "country": args.country,
+                "language": args.language, "batch_size": args.batch_size,
+            },
+        )
+        if not questions:
+            await _think(rng, args.think_time)
+            continue
+
+        answers = []
+        for question in questions:
+            # Время на ответ: в среднем think_time / 3 на вопрос
+            await _think(rng, args.think_time / 3)
+            answers.append({
+                "question_id": question["id"],
+                "is_correct": rng.random() < args.correct_rate,
+                "timestamp": int(time.time() * 1000),
+            })
+            if time.monotonic() >= deadline:
+                break
+
+        await _call(
+            http, stats, "POST", "POST /users/{user_id}/submit_answers",
+            f"{base}/users/{user_id}/submit_answers", json={"answers": answers},
+        )
+        await _call(http, stats, "GET", "GET /users/{user_id}/stats", f"{base}/users/{user_id}/stats")
+        await _call(
+            http, stats, "GET", "GET /users/{user_id}/answers-by-day",
+            f"{base}/users/{user_id}/answers-by-day", params={"days": 7},
+        )
+        await _think(rng, args.think_time)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--country", required=True)
+    parser.add_argument("--language", required=True)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of steady load")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds to start all users")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean think time between screens, s")
+    parser.add_argument("--batch-size", type=int, default=30)
+    parser.add_argument("--correct-rate", type=float, default=0.7)
+    parser.add_argument("--telegram-id-base", type=int, default=9_000_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Write the JSON result file here")
+    parser.add_argument("--compare", help="Previous JSON result file to diff p50/p95 against")
+    args = parser.parse_args()
+
+    stats = RouteStats()
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+    started_at = datetime.utcnow()
+    started = time.monotonic()
+    deadline = started + args.ramp_up + args.duration
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+        async def delayed(idx):
+            await asyncio.sleep(args.ramp_up * idx / max(1, args.users))
+            await virtual_user(idx, http, stats, args, deadline)
+
+        await asyncio.gather(*(delayed(i) for i in range(args.users)))
+
+    wall = time.monotonic() - started
+    routes = stats.summary(wall)
+    total = sum(r["requests"] for r in routes.values())
+    errors = sum(r["errors"] for r in routes.values())
+
+    print(f"{'route':42} {'req':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, row in routes.items():
+        print(f"{route:42} {row['requests']:7d} {row['errors']:5d} {row['throughput_per_s']:8.2f} "
+              f"{row['p50_ms']:8.1f}ms {row['p95_ms']:8.1f}ms {row['p99_ms']:8.1f}ms")
+    print(f"total: {total} requests, {errors} errors, {total / wall:.1f} req/s over {wall:.1f}s")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            previous = json.load(fh)
+        print(f"\ncompared with {args.compare} (commit {previous.get('git_commit')}):")
+        for route, row in routes.items():
+            old = previous.get("routes", {}).get(route)
+            if not old:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                change = (row[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                deltas.append(f"{key[:-3]} {old[key]:.1f}->{row[key]:.1f}ms ({change:+.1f}%)")
+            print(f"  {route:42} " + "  ".join(deltas))
+
+    if args.output:
+        result = {
+            "started_at": started_at.isoformat(),
+            "git_commit": _git_commit(),
+            "config": vars(args),
+            "wall_seconds": round(wall, 2),
+            "total_requests": total,
+            "total_errors": errors,
+            "throughput_per_s": round(total / wall, 2),
+            "routes": routes,
+        }
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
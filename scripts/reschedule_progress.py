@@ -0,0 +1,200 @@
+"""Recompute ``user_progress.next_due_at`` after the scheduling algorithm changed.
+
+Walks ``user_progress`` in primary-key order (keyset pagination, no OFFSET),
+recomputes each row's due date with the vectorized scheduler as if its last
+answer had just been given at ``last_answered_at``, and writes back only the
+rows that changed with one ``UPDATE ... FROM (VALUES ...)`` per chunk. Every
+chunk commits on its own. A row whose ``last_answered_at`` changed after the
+chunk was read (a new answer landed in between) is left alone. The last id is saved to a checkpoint file, so an
+interrupted run continues with ``--resume``. At the end ``user_due_histogram``
+is rebuilt, since it is otherwise only maintained by answer ingestion.
+
+The state before the last answer is not stored. It is reconstructed as
+``repetition_count - 1`` for correct answers, and the previous interval is
+taken as that level's Fibonacci interval.
+
+    python scripts/reschedule_progress.py --scheduler fsrs --chunk 5000 --rate 20000 --resume
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import asyncpg
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings  # noqa: E402
+from app.crud.due_histogram import REBUILD_SQL as REBUILD_DUE_HISTOGRAM_SQL  # noqa: E402
+from app.pg_listener import asyncpg_dsn  # noqa: E402
+from app.scheduler import SCHEDULERS, ReviewStates, datetime_array, make_scheduler  # noqa: E402
+from app.utils.fib import fib_interval_days  # noqa: E402
+
+ZERO_UUID = "00000000-0000-0000-0000-000000000000"
+DAY_US = 86_400_000_000
+
+SELECT_CHUNK_SQL = """
+    SELECT id, repetition_count, is_correct, last_answered_at, next_due_at
+      FROM user_progress
+     WHERE id > $1::uuid
+     ORDER BY id
+     LIMIT $2
+"""
+
+
+def update_sql(rows: int) -> str:
+    # next_due_at — наивное UTC, как пишет ORM (сессия в UTC, см. connect); last_answered_at —
+    # значение из снимка: строку, на которую успел прийти новый ответ, не перезаписываем
+    values = ", ".join(
+        f"(${3 * i + 1}::uuid, ${3 * i + 2}::timestamp, ${3 * i + 3}::timestamptz)" for i in range(rows)
+    )
+    return f"""
+        UPDATE user_progress p
+           SET next_due_at = v.next_due_at
+          FROM (VALUES {values}) AS v(id, next_due_at, last_answered_at)
+         WHERE p.id = v.id
+           AND p.last_answered_at IS NOT DISTINCT FROM v.last_answered_at
+    """
+
+
+def recompute(scheduler, rows):
+    """Новые next_due_at (datetime64[us], UTC) и маска строк, где дата изменилась."""
+    reps = np.array([r["repetition_count"] for r in rows], dtype=np.int64)
+    outcomes = np.array([r["is_correct"] for r in rows], dtype=bool)
+    last = datetime_array([r["last_answered_at"] for r in rows])
+    old_due = datetime_array([r["next_due_at"] for r in rows])
+
+    reps_before = np.where(outcomes, np.maximum(reps - 1, 0), reps)
+    previous_interval = fib_interval_days(reps_before).astype(np.float64)
+    states = ReviewStates(
+        repetition_count=reps_before,
+        last_interval_days=previous_interval,
+        elapsed_days=previous_interval,
+    )
+    interval_us = np.rint(scheduler.interval_days(states, outcomes) * DAY_US).astype(np.int64)
+    new_due = last + interval_us.astype("timedelta64[us]")
+
+    known = ~np.isnat(last)
+    drift = np.abs((new_due - old_due).astype(np.int64))
+    changed = known & (np.isnat(old_due) | (drift > 1_000_000))
+    return new_due, changed
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    return None
+
+
+def save_checkpoint(path, state):
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(state, fh, indent=2)
+    os.replace(tmp, path)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=asyncpg_dsn(settings.listen_database_url or settings.database_url))
+    parser.add_argument("--scheduler", choices=sorted(SCHEDULERS), default=settings.scheduler)
+    parser.add_argument("--chunk", type=int, default=5000, help="Rows per chunk (max 10000)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Max rows/s scanned, 0 = unlimited")
+    parser.add_argument("--pause", type=float, default=0.0, help="Extra sleep between chunks, s")
+    parser.add_argument("--checkpoint", default="reschedule_progress.checkpoint.json")
+    parser.add_argument("--resume", action="store_true", help="Continue after the id in --checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Count changes without writing")
+    parser.add_argument("--skip-histogram", action="store_true",
+                        help="Don't rebuild user_due_histogram at the end (run it later via the admin endpoint)")
+    args = parser.parse_args()
+    # Три параметра на строку, у Postgres предел 32767 параметров
+    chunk_size = max(1, min(args.chunk, 10000))
+
+    state = {
+        "scheduler": args.scheduler,
+        "last_id": ZERO_UUID,
+        "scanned": 0,
+        "updated": 0,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if args.resume:
+        saved = load_checkpoint(args.checkpoint)
+        if saved:
+            if saved.get("scheduler") != args.scheduler:
+                raise SystemExit(f"Checkpoint is for scheduler '{saved.get('scheduler')}', not '{args.scheduler}'")
+            state = saved
+            print(f"resuming after id {state['last_id']} ({state['scanned']} rows already scanned)")
+
+    scheduler = make_scheduler(args.scheduler)
+    # Сессия в UTC: приведение наивных дат к timestamptz не зависит от TimeZone сервера
+    conn = await asyncpg.connect(args.dsn, statement_cache_size=0, server_settings={"timezone": "UTC"})
+    started = time.perf_counter()
+    scanned = updated = 0
+    try:
+        while True:
+            chunk_started = time.perf_counter()
+            rows = await conn.fetch(SELECT_CHUNK_SQL, state["last_id"], chunk_size)
+            if not rows:
+                break
+
+            new_due, changed = recompute(scheduler, rows)
+            idx = np.flatnonzero(changed)
+            applied = len(idx)
+            if len(idx) and not args.dry_run:
+                params = []
+                for i in idx.tolist():
+                    params.append(rows[i]["id"])
+                    params.append(new_due[i].item())
+                    params.append(rows[i]["last_answered_at"])
+                status = await conn.execute(update_sql(len(idx)), *params)
+                # Строки, изменённые ответом между SELECT и UPDATE, пропущены — их даты уже свежие
+                applied = int(status.split()[-1])
+                raced = len(idx) - applied
+                if raced:
+                    print(f"  {raced} rows changed concurrently, left as answered")
+
+            scanned += len(rows)
+            updated += applied
+            state["last_id"] = str(rows[-1]["id"])
+            state["scanned"] += len(rows)
+            state["updated"] += applied
+            if not args.dry_run:
+                save_checkpoint(args.checkpoint, state)
+
+            elapsed = time.perf_counter() - started
+            print(f"  {state['scanned']} scanned, {state['updated']} updated, "
+                  f"chunk {time.perf_counter() - chunk_started:.2f}s, {scanned / elapsed:.0f} rows/s")
+
+            # Ограничение скорости: не быстрее --rate строк в секунду
+            if args.rate > 0:
+                ahead = scanned / args.rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+            if args.pause > 0:
+                await asyncio.sleep(args.pause)
+            if len(rows) < chunk_size:
+                break
+
+        if updated and not args.dry_run and not args.skip_histogram:
+            # Даты сдвинулись мимо ingest_answers — гистограмму прогноза пересобираем целиком
+            async with conn.transaction():
+                await conn.execute("DELETE FROM user_due_histogram")
+                await conn.execute(REBUILD_DUE_HISTOGRAM_SQL.format(where=""))
+            print("user_due_histogram rebuilt")
+    finally:
+        await conn.close()
+
+    elapsed = time.perf_counter() - started
+    mode = "would update" if args.dry_run else "updated"
+    print(f"done: {scanned} scanned, {updated} {mode} in {elapsed:.1f}s "
+          f"({scanned / elapsed if elapsed else 0:.0f} rows/s) with scheduler '{args.scheduler}'")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
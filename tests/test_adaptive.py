@@ -0,0 +1,75 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pydantic
+import pytest
+
+from app.crud.adaptive import ExamBank, encode_question, encode_question_list, weighted_sample
+
+
+def test_weighted_sample_without_replacement():
+    rng = np.random.default_rng(0)
+    weights = np.array([0.0, 1.0, 2.0, 0.0, 5.0, 1.0])
+    for k in (1, 3, 4, 10):
+        picked = weighted_sample(weights, k, rng).tolist()
+        assert len(picked) == len(set(picked)) == min(k, 4)
+        assert set(picked) <= {1, 2, 4, 5}
+
+
+def test_weighted_sample_follows_weights():
+    rng = np.random.default_rng(1)
+    weights = np.array([1.0, 2.0, 7.0])
+    first = np.bincount([weighted_sample(weights, 1, rng)[0] for _ in range(20000)], minlength=3) / 20000
+    assert np.allclose(first, weights / weights.sum(), atol=0.02)
+
+
+def test_weighted_sample_all_zero():
+    assert len(weighted_sample(np.zeros(5), 3, np.random.default_rng())) == 0
+
+
+def _body(qid, topic="signs"):
+    return {"id": qid, "data": {"q": f"Q{qid}", "correct": 0}, "topic": topic, "country": "am", "language": "ru"}
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+def _bank(ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    return ExamBank(
+        ids=ids,
+        topic_idx=np.zeros(len(ids), dtype=np.int32),
+        topics=["signs"],
+        topic_ids=[ids],
+        encoded={int(qid): encode_question(_body(int(qid))) for qid in ids},
+    )
+
+
+def test_encode_question_checks_schema():
+    assert encode_question(_body(1)).startswith(b'{"id":1,')
+    with pytest.raises(pydantic.ValidationError):
+        encode_question({"id": 1, "data": {}})
+
+
+def test_encode_question_list_from_bank():
+    db = FakeSession([])
+    body = asyncio.run(encode_question_list(db, _bank([1, 2, 3]), "am", "ru", [3, 1]))
+    assert [q["id"] for q in json.loads(body)] == [3, 1]
+    assert db.queries == 0
+
+
+def test_encode_question_list_loads_ids_missing_from_bank():
+    # Вопрос 7 добавлен после загрузки банка, 9 удалён из каталога
+    db = FakeSession([(7, "signs", {"q": "Q7", "correct": 1})])
+    body = asyncio.run(encode_question_list(db, _bank([1, 2]), "am", "ru", [2, 7, 9, 1]))
+    assert [q["id"] for q in json.loads(body)] == [2, 7, 1]
+    assert db.queries == 1
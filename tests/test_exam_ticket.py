@@ -0,0 +1,123 @@
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from app.crud.adaptive import ExamBank
+from app.crud.exam_ticket import (
+    TICKET_TOKEN_KIND, TicketQuestion, build_plan, draw_ticket, proportional_quotas, restore_ticket, score_ticket,
+)
+from app.tokens import InvalidToken, sign_token
+
+
+def make_bank(topic_sizes: dict) -> ExamBank:
+    """Банк без БД: темы по алфавиту, id подряд с 1."""
+    topics = sorted(topic_sizes)
+    topic_idx = np.concatenate([np.full(topic_sizes[t], i, dtype=np.int32) for i, t in enumerate(topics)])
+    ids = np.arange(1, len(topic_idx) + 1, dtype=np.int64)
+    return ExamBank(
+        ids=ids,
+        topic_idx=topic_idx,
+        topics=topics,
+        topic_ids=[ids[topic_idx == i] for i in range(len(topics))],
+        encoded={},
+    )
+
+
+@pytest.mark.parametrize("counts, size, expected", [
+    ([10, 10], 4, [2, 2]),
+    ([30, 10], 4, [3, 1]),
+    ([1, 1, 1], 2, [1, 1, 0]),
+    ([5, 0, 5], 20, [5, 0, 5]),   # больше, чем вопросов — берём все
+    ([0, 0], 5, [0, 0]),
+    ([3, 4], 0, [0, 0]),
+])
+def test_proportional_quotas(counts, size, expected):
+    assert proportional_quotas(counts, size) == expected
+
+
+def test_proportional_quotas_sum_and_bounds():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        counts = rng.integers(0, 50, size=rng.integers(1, 8)).tolist()
+        size = int(rng.integers(0, 60))
+        quotas = proportional_quotas(counts, size)
+        assert sum(quotas) == min(size, sum(counts))
+        assert all(0 <= q <= c for q, c in zip(quotas, counts))
+
+
+def test_build_plan_configured_topics_and_rest():
+    bank = make_bank({"a": 10, "b": 30, "c": 10})
+    plan = build_plan(bank, {"size": 10, "max_errors": 1, "topics": {"a": 4, "unknown": 3}})
+    assert plan.size == 10 and plan.max_errors == 1
+    assert dict(plan.quotas) == {0: 4, 1: 5, 2: 1}
+
+
+def test_build_plan_caps_quota_by_topic_size():
+    bank = make_bank({"a": 2, "b": 3})
+    plan = build_plan(bank, {"size": 20, "topics": {"a": 5}})
+    assert dict(plan.quotas) == {0: 2, 1: 3}
+    assert plan.size == 5
+
+
+def test_draw_ticket_is_deterministic_and_follows_quotas():
+    bank = make_bank({"a": 10, "b": 30, "c": 10})
+    plan = build_plan(bank, {"size": 10, "topics": {"a": 4}})
+    ticket = draw_ticket(bank, plan, seed=123)
+    assert ticket == draw_ticket(bank, plan, seed=123)
+    assert ticket != draw_ticket(bank, plan, seed=124)
+    assert len(ticket) == len(set(ticket)) == 10
+    topics = bank.topic_idx[np.searchsorted(bank.ids, ticket)]
+    assert np.bincount(topics, minlength=3).tolist() == [4, 5, 1]
+
+
+def test_draw_ticket_fills_shortfall_from_other_questions():
+    bank = make_bank({"a": 3, "b": 5})
+    plan = build_plan(bank, {"size": 6, "topics": {"a": 3, "b": 1}})
+    ticket = draw_ticket(bank, plan, seed=7)
+    assert len(ticket) == len(set(ticket)) == 6
+    assert set(ticket) <= set(bank.ids.tolist())
+
+
+
+def _token(user_id, **overrides):
+    payload = {"u": str(user_id), "c": "am", "l": "ru", "q": [5, 3, 8], "e": 1, "v": 4, "t": int(time.time())}
+    return sign_token(TICKET_TOKEN_KIND, {**payload, **overrides})
+
+
+def test_restore_ticket():
+    user_id = uuid.uuid4()
+    assert restore_ticket(user_id, _token(user_id)) == ([5, 3, 8], 1, 4)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"u": "someone-else"},
+    {"t": 0},                 # просрочен
+    {"q": None},
+    {"q": [1, "2"]},
+])
+def test_restore_ticket_rejects(overrides):
+    user_id = uuid.uuid4()
+    with pytest.raises(InvalidToken):
+        restore_ticket(user_id, _token(user_id, **overrides))
+
+
+def test_answers_are_graded_by_answer_key():
+    question = TicketQuestion(topic="signs", correct=2)
+    assert question.is_correct(2) and not question.is_correct(0)
+    assert not TicketQuestion(topic="signs", correct=None).is_correct(0)
+
+
+def test_score_ticket():
+    questions = {
+        1: TicketQuestion("a", 0), 2: TicketQuestion("a", 1),
+        3: TicketQuestion("b", 2), 4: TicketQuestion("b", 0),
+    }
+    result = score_ticket(questions, [3, 1, 4, 2], max_errors=1, answers={1: True, 3: True, 4: False})
+    assert result["answered"] == 3
+    assert (result["correct"], result["errors"], result["passed"]) == (2, 2, False)
+    assert result["by_topic"] == [
+        {"topic": "b", "total": 2, "correct": 1},
+        {"topic": "a", "total": 2, "correct": 1},
+    ]
@@ -0,0 +1,119 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.sql.dml import Insert, Update
+from sqlalchemy.sql.selectable import Select
+
+from app import invalidation, scheduler
+from app.crud.user_progress import ingest_answers
+from app.schemas import BatchAnswerItem
+
+USER_ID = uuid.uuid4()
+
+
+class FakeResult:
+    def __init__(self, rows=(), scalars=()):
+        self._rows = list(rows)
+        self._scalars = list(scalars)
+
+    def all(self):
+        return self._rows
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: self._scalars)
+
+
+class FakeSession:
+    """Отвечает на запросы ingest_answers заготовками и запоминает записи."""
+
+    def __init__(self, progress=(), duplicates=()):
+        self.info = {}
+        self.progress = list(progress)
+        self.duplicates = set(duplicates)
+        self.writes = []
+
+    async def execute(self, stmt, params=None):
+        if "DISTINCT v.idx" in str(stmt):
+            return FakeResult(scalars=[i for i in params["idx"] if i in self.duplicates])
+        if isinstance(stmt, Select):
+            return FakeResult(rows=self.progress)
+        self.writes.append((stmt, params))
+        return FakeResult()
+
+    def rows(self, kind, table):
+        return [
+            row
+            for stmt, params in self.writes
+            if isinstance(stmt, kind) and stmt.table.name == table
+            for row in params
+        ]
+
+
+@pytest.fixture(autouse=True)
+def fibonacci(monkeypatch):
+    monkeypatch.setattr(scheduler, "_scheduler", scheduler.make_scheduler("fibonacci"))
+
+
+def ingest(db, *answers):
+    items = [BatchAnswerItem(question_id=q, is_correct=c, timestamp=t) for q, c, t in answers]
+    return asyncio.run(ingest_answers(db, USER_ID, items))
+
+
+def test_empty_batch_touches_nothing():
+    db = FakeSession()
+    result = ingest(db)
+    assert (result.processed, result.skipped, db.writes) == (0, 0, [])
+
+
+def test_duplicates_are_skipped():
+    db = FakeSession(duplicates={1})
+    result = ingest(db, (10, True, 1000), (11, True, 2000), (10, True, 1000), (12, False, None), (12, False, None))
+    # idx 1 уже в answer_history, idx 2 — повтор (вопрос, timestamp) в пакете; без timestamp не дедуплицируем
+    assert (result.processed, result.skipped) == (3, 2)
+    assert [h["question_id"] for h in db.rows(Insert, "answer_history")] == [10, 12, 12]
+    assert result.question_ids == [10, 12]
+
+
+def test_repeated_answers_are_applied_in_rounds():
+    db = FakeSession()
+    result = ingest(db, (1, True, None), (2, True, None), (1, True, None), (2, True, None), (2, False, None))
+    assert len(db.rows(Insert, "answer_history")) == 5
+    new_rows = {row["question_id"]: row for row in db.rows(Insert, "user_progress")}
+    assert set(new_rows) == {1, 2}
+
+    # Вопрос 1: два правильных подряд — уровень 2, интервал FIB_SEQUENCE[2] дней
+    q1 = new_rows[1]
+    assert q1["repetition_count"] == 2 and q1["is_correct"] is True
+    assert q1["next_due_at"] - q1["last_answered_at"] == timedelta(days=2)
+    # Вопрос 2: последняя ошибка сбрасывает уровень
+    q2 = new_rows[2]
+    assert (q2["repetition_count"], q2["is_correct"]) == (0, False)
+    assert q2["next_due_at"] == q2["last_answered_at"]
+
+    change = result.changes[2]
+    assert (change.before_is_correct, change.before_next_due_at, change.is_correct) == (None, None, False)
+
+
+def test_existing_progress_is_updated():
+    last = datetime.utcnow() - timedelta(days=3)
+    progress_id = uuid.uuid4()
+    db = FakeSession(progress=[SimpleNamespace(
+        id=progress_id, question_id=7, repetition_count=3, is_correct=True,
+        last_answered_at=last, next_due_at=last + timedelta(days=3),
+    )])
+    result = ingest(db, (7, True, None))
+    assert db.rows(Insert, "user_progress") == []
+    [row] = db.rows(Update, "user_progress")
+    assert row["id"] == progress_id and row["repetition_count"] == 4
+    assert row["next_due_at"] - row["last_answered_at"] == timedelta(days=5)
+    change = result.changes[7]
+    assert (change.before_is_correct, change.before_next_due_at) == (True, last + timedelta(days=3))
+
+
+def test_invalidation_is_queued_until_commit():
+    db = FakeSession()
+    ingest(db, (1, True, None))
+    assert invalidation.user_event(USER_ID) in db.info[invalidation._PENDING_KEY]
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import scheduler
+from app.scheduler import ReviewStates, advance_repetitions, datetime_array, make_scheduler, schedule_one
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+
+# (repetition_count, last_answered_at, next_due_at, is_correct)
+CASES = [
+    (0, None, None, True),
+    (0, None, None, False),
+    (1, NOW - timedelta(days=1), NOW, True),
+    (3, NOW - timedelta(days=5), NOW - timedelta(days=2), True),
+    (3, NOW - timedelta(days=5), NOW - timedelta(days=2), False),
+    (7, NOW - timedelta(days=40), NOW - timedelta(days=19), True),
+    (25, NOW - timedelta(days=400), NOW + timedelta(days=10), True),
+    (2, NOW - timedelta(hours=3), NOW + timedelta(days=2), False),
+]
+
+
+@pytest.fixture(params=["fibonacci", "fsrs"])
+def active(request, monkeypatch):
+    sched = make_scheduler(request.param)
+    monkeypatch.setattr(scheduler, "_scheduler", sched)
+    return sched
+
+
+def _batch(cases):
+    reps, last, due, outcomes = zip(*cases)
+    states = ReviewStates.from_columns(list(reps), datetime_array(last), datetime_array(due), NOW)
+    return states, np.array(outcomes, dtype=bool)
+
+
+def test_batch_matches_schedule_one(active):
+    states, outcomes = _batch(CASES)
+    batch = active.schedule(states, outcomes, NOW).tolist()
+    assert batch == [schedule_one(*case, now=NOW) for case in CASES]
+
+
+def test_fibonacci_intervals():
+    states, outcomes = _batch(CASES)
+    due = make_scheduler("fibonacci").schedule(states, outcomes, NOW).tolist()
+    days = [(d - NOW) / timedelta(days=1) for d in due]
+    # Правильный ответ — следующий уровень FIB_SEQUENCE, ошибка — интервал 0
+    assert days == [1, 0, 2, 5, 0, 34, 6765, 0]
+
+
+def test_fsrs_correct_answers_grow_interval():
+    sched = make_scheduler("fsrs")
+    states, _ = _batch(CASES)
+    good = sched.interval_days(states, np.ones(len(CASES), dtype=bool))
+    again = sched.interval_days(states, np.zeros(len(CASES), dtype=bool))
+    assert (good > again).all()
+    assert (good <= sched.max_interval_days).all() and (again >= 0).all()
+
+
+def test_aware_datetimes_are_treated_as_utc(active):
+    from datetime import timezone
+    aware = [(r, l and l.replace(tzinfo=timezone.utc), d and d.replace(tzinfo=timezone.utc), c) for r, l, d, c in CASES]
+    states, outcomes = _batch(CASES)
+    aware_states, _ = _batch(aware)
+    assert active.schedule(states, outcomes, NOW).tolist() == active.schedule(aware_states, outcomes, NOW).tolist()
+
+
+def test_advance_repetitions():
+    assert advance_repetitions(np.array([0, 4, 9]), np.array([True, False, True])).tolist() == [1, 0, 10]
+
+
+def test_unknown_scheduler():
+    with pytest.raises(ValueError):
+        make_scheduler("sm2")
@@ -0,0 +1,54 @@
+import numpy as np
+
+from app.crud.adaptive import ExamBank
+from app.crud.session_cursor import candidate_ids, pack_mask, session_order, unpack_mask
+
+
+def make_bank(topic_sizes: dict) -> ExamBank:
+    topics = sorted(topic_sizes)
+    topic_idx = np.concatenate([np.full(topic_sizes[t], i, dtype=np.int32) for i, t in enumerate(topics)])
+    ids = np.arange(1, len(topic_idx) + 1, dtype=np.int64)
+    return ExamBank(
+        ids=ids,
+        topic_idx=topic_idx,
+        topics=topics,
+        topic_ids=[ids[topic_idx == i] for i in range(len(topics))],
+        encoded={},
+    )
+
+
+def test_candidates_by_topics():
+    bank = make_bank({"a": 3, "b": 2, "c": 4})
+    assert candidate_ids(bank, []).tolist() == bank.ids.tolist()
+    assert candidate_ids(bank, ["c", "a", "missing"]).tolist() == [1, 2, 3, 6, 7, 8, 9]
+    assert len(candidate_ids(bank, ["missing"])) == 0
+
+
+def test_pages_never_repeat_and_cover_all():
+    bank = make_bank({"a": 40, "b": 27})
+    order = session_order(bank, ["a", "b"], seed=99)
+    pages = [order[o:o + 10].tolist() for o in range(0, len(order), 10)]
+    # Каждый пакет пересобирает перестановку по seed заново
+    assert all((session_order(bank, ["a", "b"], seed=99) == order).all() for _ in pages)
+    seen = [qid for page in pages for qid in page]
+    assert len(seen) == len(set(seen)) == 67
+    assert sorted(seen) == bank.ids.tolist()
+
+
+def test_seed_changes_order():
+    bank = make_bank({"a": 50})
+    assert session_order(bank, [], 1).tolist() != session_order(bank, [], 2).tolist()
+
+
+def test_marked_questions_go_first():
+    bank = make_bank({"a": 20, "b": 20})
+    candidates = candidate_ids(bank, ["b"])
+    first = np.isin(candidates, [22, 30, 39])
+    order = session_order(bank, ["b"], seed=5, first=first).tolist()
+    assert set(order[:3]) == {22, 30, 39}
+    assert sorted(order) == candidates.tolist()
+
+
+def test_mask_round_trip():
+    mask = np.random.default_rng(3).random(37) < 0.3
+    assert (unpack_mask(pack_mask(mask), 37) == mask).all()
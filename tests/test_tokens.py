@@ -0,0 +1,44 @@
+import dataclasses
+
+import pytest
+
+from app import tokens
+from app.tokens import InvalidToken, sign_token, verify_token
+
+PAYLOAD = {"u": "user", "s": 42, "v": 3}
+
+
+def test_round_trip():
+    assert verify_token("exam_ticket", sign_token("exam_ticket", PAYLOAD)) == PAYLOAD
+
+
+def test_kind_is_part_of_signature():
+    with pytest.raises(InvalidToken):
+        verify_token("session_cursor", sign_token("exam_ticket", PAYLOAD))
+
+
+def test_tampered_payload():
+    body, signature = sign_token("exam_ticket", PAYLOAD).split(".")
+    forged = sign_token("exam_ticket", {**PAYLOAD, "s": 43}).split(".")[0]
+    with pytest.raises(InvalidToken):
+        verify_token("exam_ticket", f"{forged}.{signature}")
+
+
+def test_tampered_signature():
+    body, signature = sign_token("exam_ticket", PAYLOAD).split(".")
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+    with pytest.raises(InvalidToken):
+        verify_token("exam_ticket", f"{body}.{flipped}")
+
+
+@pytest.mark.parametrize("token", ["", "no-dot", "a.b.c", "!!!.???", "e30."])
+def test_malformed(token):
+    with pytest.raises(InvalidToken):
+        verify_token("exam_ticket", token)
+
+
+def test_secret_changes_signature(monkeypatch):
+    token = sign_token("exam_ticket", PAYLOAD)
+    monkeypatch.setattr(tokens, "settings", dataclasses.replace(tokens.settings, token_secret="another-secret"))
+    with pytest.raises(InvalidToken):
+        verify_token("exam_ticket", token)